@@ -0,0 +1,12 @@
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+application = get_asgi_application()
+
+# Start the CPU pool processes before the first request, unless the server
+# starts them after forking its workers (see gunicorn.conf.py)
+if os.environ.get('CPU_POOL_WARMUP_ON_LOAD', 'True') == 'True':
+    from equipment.pool import warm_up
+    warm_up()
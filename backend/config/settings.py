@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 import dj_database_url
+from corsheaders.defaults import default_headers
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -29,7 +30,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Necessary for serving CSS/JS on Railway
+    'equipment.middleware.ResponseCompressionMiddleware',
+    'equipment.middleware.RequestDecompressionMiddleware',
+    'equipment.middleware.AsyncWhiteNoiseMiddleware',  # Necessary for serving CSS/JS on Railway
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,6 +61,10 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
+
+# Serve the read-heavy dataset endpoints from async views (run under ASGI)
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'False') == 'True'
 
 # Database configuration handles SQLite locally and PostgreSQL on Railway
 DATABASES = {
@@ -68,6 +75,41 @@ DATABASES = {
     )
 }
 
+# Read replicas: DATABASE_REPLICA_URLS is a comma separated list of database
+# URLs, added as replica_1, replica_2, ... The read-only dataset endpoints
+# query one of them at random (equipment.routers); writes and everything else
+# use the primary. After a user changes datasets their reads stay on the
+# primary for DATABASE_REPLICA_PIN_SECONDS, the replication lag to allow for.
+DATABASE_REPLICAS = []
+for _index, _url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')), 1):
+    DATABASES[f'replica_{_index}'] = {
+        **dj_database_url.parse(_url.strip(), conn_max_age=600, conn_health_checks=True),
+        # Tests read the test primary through the replica aliases
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{_index}')
+DATABASE_ROUTERS = ['equipment.routers.ReplicaRouter']
+DATABASE_REPLICA_PIN_SECONDS = int(os.environ.get('DATABASE_REPLICA_PIN_SECONDS', 30))
+
+# PRAGMAs applied to every SQLite connection (equipment.sqlite). WAL lets
+# readers in other server processes run while an upload writes, and
+# synchronous=NORMAL syncs at checkpoints instead of at every commit (a power
+# loss may drop the last commits, never corrupt the file). Writers wait up to
+# busy_timeout ms for the write lock instead of failing with "database is
+# locked". Set SQLITE_TUNING=False for SQLite's defaults.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 10000,  # ms
+    'mmap_size': 268435456,  # 256MB
+    'cache_size': -16384,  # KiB, per connection
+    'journal_size_limit': 67108864,  # WAL file kept after checkpoints, 64MB
+} if os.environ.get('SQLITE_TUNING', 'True') == 'True' else {}
+
+# Planner statistics are refreshed after retention deletes at most once per
+# interval (seconds) per server process; 0 disables it
+SQLITE_OPTIMIZE_INTERVAL = int(os.environ.get('SQLITE_OPTIMIZE_INTERVAL', 3600))
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -92,24 +134,196 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # CORS Settings - Allow your frontend to talk to this backend
 CORS_ALLOW_ALL_ORIGINS = True  
 CORS_ALLOW_CREDENTIALS = True
+# The web app gzips upload bodies (equipment.middleware.RequestDecompressionMiddleware)
+CORS_ALLOW_HEADERS = (*default_headers, 'content-encoding')
 
 # REST Framework Settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES':   [
-        'rest_framework.authentication.TokenAuthentication',
+        'equipment.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES':   [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # orjson when installed, for record-heavy responses
+    'DEFAULT_RENDERER_CLASSES': [
+        'equipment.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 100
 }
 
+# Per-process token -> user cache of CachedTokenAuthentication. Logging out
+# or changing a user stores a revocation marker in TOKEN_REVOCATION_CACHE,
+# which every cache hit checks. The local memory cache only reaches this
+# server process; TOKEN_REVOCATION_SHARED=True (the gunicorn.conf.py default
+# with several workers) keeps the markers in a table on the primary (created
+# by createcachetable), costing one query per hit
+TOKEN_CACHE_SIZE = 4096
+TOKEN_CACHE_TIMEOUT = int(os.environ.get('TOKEN_CACHE_TIMEOUT', 60))  # seconds
+TOKEN_REVOCATION_CACHE = 'token-revocations'
+TOKEN_REVOCATION_SHARED = os.environ.get('TOKEN_REVOCATION_SHARED', 'False') == 'True'
+
+# Cache used for per-dataset aggregation results
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'equipment-visualizer',
+    }
+}
+
+if TOKEN_REVOCATION_SHARED:
+    CACHES['token-revocations'] = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'token_revocations',
+        # Culling a marker early would let a revoked token through
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    }
+else:
+    CACHES['token-revocations'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'token-revocations',
+    }
+
+# Users pinned to the primary database after a write; shared by every server
+# process through a table on the primary (created by createcachetable)
+if DATABASE_REPLICAS:
+    CACHES['replica-pins'] = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'replica_pins',
+    }
+
+# Aggregation Settings
+AGGREGATE_CACHE_TIMEOUT = int(os.environ.get('AGGREGATE_CACHE_TIMEOUT', 3600))
+RECORD_FRAME_CACHE_SIZE = int(os.environ.get('RECORD_FRAME_CACHE_SIZE', 4))
+
+# Ingest pipeline stages run on every parsed upload, in order. Each entry is
+# the dotted path of a callable that takes and returns a DataFrame.
+INGEST_STAGES = [
+    'equipment.anomalies.detect_anomalies',
+]
+
+# CSV validation runs on every parsed upload before the ingest stages. Rows
+# with blank fields, non-numeric parameters, parameters outside RANGES or a
+# type outside ALLOWED_TYPES (None allows any) are dropped and reported, or
+# the whole upload is rejected with ON_ERROR='reject'. DUPLICATE_NAMES is
+# 'warn', 'drop' (keep the first row of each name) or 'ignore'. Reports list
+# the first MAX_ROW_NUMBERS row numbers per rule (data rows counted from 1).
+CSV_VALIDATION = {
+    'ON_ERROR': os.environ.get('CSV_VALIDATION_ON_ERROR', 'drop'),
+    'RANGES': {
+        'Flowrate': (None, None),
+        'Pressure': (None, None),
+        'Temperature': (None, None),
+    },
+    'ALLOWED_TYPES': None,
+    'DUPLICATE_NAMES': os.environ.get('CSV_DUPLICATE_NAMES', 'warn'),
+    'MAX_ROW_NUMBERS': 10,
+}
+
+# Anomaly detection: METHOD is 'zscore' or 'iqr'. Records scoring above
+# THRESHOLD or outside a (min, max) hard limit per column are flagged.
+ANOMALY_DETECTION = {
+    'METHOD': os.environ.get('ANOMALY_METHOD', 'zscore'),
+    'THRESHOLD': float(os.environ.get('ANOMALY_THRESHOLD', 3.0)),
+    'IQR_FACTOR': 1.5,
+    'LIMITS': {
+        'Flowrate': (0, None),
+        'Pressure': (0, None),
+        'Temperature': (None, None),
+    },
+}
 
 # File Upload Settings
+FILE_UPLOAD_HANDLERS = [
+    'equipment.uploads.ContentHashUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
 
+# Request bodies sent with Content-Encoding are decompressed up to this size
+MAX_DECOMPRESSED_REQUEST_SIZE = 536870912  # 512MB
+
+# Response compression for large API bodies (gzip, or zstd when installed)
+RESPONSE_COMPRESSION_MIN_SIZE = int(os.environ.get('RESPONSE_COMPRESSION_MIN_SIZE', 1024))
+RESPONSE_COMPRESSION_TYPES = ['application/json', 'text/csv', 'application/pdf']
+
+# Resumable chunked uploads: chunks are stored on disk until finalized
+CHUNKED_UPLOAD_DIR = os.environ.get('CHUNKED_UPLOAD_DIR', os.path.join(BASE_DIR, 'chunked_uploads'))
+CHUNKED_UPLOAD_CHUNK_SIZE = 4194304  # 4MB, must stay below DATA_UPLOAD_MAX_MEMORY_SIZE
+CHUNKED_UPLOAD_MAX_SIZE = 2147483648  # 2GB
+CHUNKED_UPLOAD_EXPIRY_HOURS = 24
+
+# Server-Sent Events (/api/events/). Events fan out to the subscribers of
+# the process that published them; with EVENTS_DB_BRIDGE they are stored
+# and every server process relays them (needed with more than one worker).
+EVENTS_DB_BRIDGE = os.environ.get('EVENTS_DB_BRIDGE', 'False') == 'True'
+EVENTS_POLL_INTERVAL = 1.0  # seconds between bridge polls
+EVENTS_RETENTION_MINUTES = 60
+EVENTS_QUEUE_SIZE = 256  # per connected client
+EVENTS_HEARTBEAT = 15  # seconds
+EVENTS_RETRY_MS = 2000  # client reconnect delay
+EVENTS_STREAM_DURATION = 25  # seconds; below the gunicorn sync worker timeout
+EVENTS_ASYNC_STREAM_DURATION = 300  # seconds, under ASGI
+# Under WSGI a stream holds a worker thread; beyond this many per process
+# clients get 503 and retry, so streams leave threads for the API.
+# gunicorn.conf.py defaults it to half of GUNICORN_THREADS
+EVENTS_SYNC_STREAMS = int(os.environ.get('EVENTS_SYNC_STREAMS', 1))
+EVENTS_TICKET_MAX_AGE = 60  # seconds a stream ticket (POST /api/events/ticket/) is valid
+
+# PDF reports list every record, streamed a page at a time. Setting
+# PDF_REPORT_MAX_RECORDS stops the record tables after that many rows, with
+# a note pointing to the CSV export; chart drawings are cached per process
+# for this many datasets
+_pdf_max_records = os.environ.get('PDF_REPORT_MAX_RECORDS', 'none')
+PDF_REPORT_MAX_RECORDS = None if _pdf_max_records.lower() == 'none' else int(_pdf_max_records)
+PDF_CHART_CACHE_SIZE = 8
+
+# Process pool for CPU-heavy work (ingest analysis, PDF reports), one per
+# server process. Beyond WORKERS running and MAX_QUEUE waiting tasks requests
+# are answered with 503 and Retry-After. 0 workers runs the work inline.
+CPU_POOL_WORKERS = int(os.environ.get('CPU_POOL_WORKERS', min(2, os.cpu_count() or 1)))
+CPU_POOL_MAX_QUEUE = int(os.environ.get('CPU_POOL_MAX_QUEUE', 4))
+CPU_POOL_RETRY_AFTER = 5  # seconds
+CPU_POOL_TIMEOUT = 300  # seconds
+CPU_POOL_START_METHOD = 'forkserver'
+CPU_POOL_WARMUP = os.environ.get('CPU_POOL_WARMUP', 'True') == 'True'
+
+# Admission control for heavy requests (uploads, appends, chunked upload
+# finalize, PDF reports). Each server process runs at most MAX_CONCURRENT of
+# them, below the gunicorn threads per worker so cheap reads keep a thread;
+# MAX_QUEUE more wait up to QUEUE_TIMEOUT for a slot, beyond that 503. Per
+# user and class: at most user_concurrency at once and rate per minute after
+# a burst, beyond that 429. Both answers carry Retry-After.
+ADMISSION_CONTROL = os.environ.get('ADMISSION_CONTROL', 'True') == 'True'
+ADMISSION_MAX_CONCURRENT = int(os.environ.get('ADMISSION_MAX_CONCURRENT', 2))
+ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', 1))
+ADMISSION_QUEUE_TIMEOUT = 2  # seconds
+ADMISSION_RETRY_AFTER = 5  # seconds
+ADMISSION_USER_SLOT_TIMEOUT = CPU_POOL_TIMEOUT + 60  # seconds
+ADMISSION_CLASSES = {
+    'upload': {'user_concurrency': 1, 'rate': 30, 'burst': 5},
+    'report': {'user_concurrency': 2, 'rate': 60, 'burst': 10},
+}
+
+# Per-user counters of admission control. The local memory cache keeps them
+# per server process; ADMISSION_SHARED_CACHE=True shares them between
+# processes through a table on the primary (created by createcachetable)
+ADMISSION_CACHE = 'admission'
+if os.environ.get('ADMISSION_SHARED_CACHE', 'False') == 'True':
+    CACHES['admission'] = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'admission_counters',
+    }
+else:
+    CACHES['admission'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'admission',
+    }
+
 # Security Settings for Production
 if not DEBUG:
     # Set to False to resolve the ERR_TOO_MANY_REDIRECTS on Railway
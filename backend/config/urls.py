@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.urls import path, include
-from equipment.views import signup, login
+from equipment.views import signup, login, logout
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -8,4 +8,5 @@ urlpatterns = [
     # Authentication endpoints
     path('api/signup/', signup, name='api_signup'),
     path('api/login/', login, name='api_login'),  # Use custom login, not obtain_auth_token
+    path('api/logout/', logout, name='api_logout'),
 ]
\ No newline at end of file
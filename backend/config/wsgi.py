@@ -3,4 +3,10 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+
+# Start the CPU pool processes before the first request, unless the server
+# starts them after forking its workers (see gunicorn.conf.py)
+if os.environ.get('CPU_POOL_WARMUP_ON_LOAD', 'True') == 'True':
+    from equipment.pool import warm_up
+    warm_up()
@@ -1,17 +1,181 @@
 from django.contrib import admin
-from .models import Dataset, EquipmentRecord
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.urls import reverse
+from django.utils.html import format_html
+from .models import Dataset, EquipmentName, EquipmentRecord, EquipmentType
+
+# Query string parameter of the keyset changelist: show rows below this id
+AFTER_VAR = 'after'
+# Filtered changelists count matching rows up to this many
+COUNT_LIMIT = 10000
+
+
+def prefix_filter(field, term):
+    """
+    Case-sensitive prefix match on a column, written as a range so a plain
+    B-tree index on the column is used (LIKE 'term%' only uses one under
+    some collations); startswith keeps the exact meaning under any collation
+    """
+    upper = term[:-1] + chr(ord(term[-1]) + 1)
+    return Q(**{f'{field}__gte': term, f'{field}__lt': upper, f'{field}__startswith': term})
+
+
+def estimated_table_rows(model, using):
+    """The planner's row estimate for a table, or None if the database has none"""
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            elif connection.vendor == 'sqlite':
+                # Filled by ANALYZE (see equipment.sqlite.optimize)
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+            else:
+                return None
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    # PostgreSQL reports -1 for tables that were never analyzed
+    return estimate if estimate >= 0 else None
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Changelist paged by primary key, newest first: each page continues
+    below the last id of the previous one (?after=<id>), so a deep page
+    costs as little as the first. Rows are counted only up to COUNT_LIMIT,
+    and the unfiltered list shows the planner's estimate instead.
+    """
+
+    def get_filters_params(self, params=None):
+        params = super().get_filters_params(params)
+        params.pop(AFTER_VAR, None)
+        return params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Changing a filter or the search starts again from the first page
+        if AFTER_VAR not in (new_params or {}):
+            remove = [*(remove or []), AFTER_VAR]
+        return super().get_query_string(new_params, remove)
+
+    def get_ordering(self, request, queryset):
+        return ['-pk']
+
+    def get_results(self, request):
+        after = self.params.get(AFTER_VAR)
+        if after is not None and not after.isdigit():
+            raise IncorrectLookupParameters
+        queryset = self.queryset.filter(pk__lt=int(after)) if after else self.queryset
+        # Pick the page's ids without the list_select_related joins, which
+        # can lead SQLite's planner away from the primary key order
+        ids = list(queryset.values_list('pk', flat=True)[:self.list_per_page + 1])
+        self.result_list = list(self.queryset.filter(pk__in=ids[:self.list_per_page]))
+        self.next_after = ids[self.list_per_page - 1] if len(ids) > self.list_per_page else None
+        self.is_first_page = after is None
+
+        self.result_count, self.count_label = self.count_results()
+        # The count label replaces the search form's "N results (M total)"
+        self.full_result_count = self.result_count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.can_show_all = False
+        self.multi_page = self.next_after is not None or not self.is_first_page
+        self.paginator = None
+
+    @property
+    def next_page_query_string(self):
+        return self.get_query_string({AFTER_VAR: self.next_after})
+
+    def count_results(self):
+        """Number of matching rows and how to describe it"""
+        if not self.queryset.query.where:
+            estimate = estimated_table_rows(self.model, self.queryset.db)
+            if estimate is not None:
+                return estimate, f'about {estimate:,}'
+        count = self.queryset.order_by()[:COUNT_LIMIT + 1].count()
+        if count > COUNT_LIMIT:
+            return COUNT_LIMIT, f'more than {COUNT_LIMIT:,}'
+        return count, f'{count:,}'
+
+
+class RecentDatasetFilter(admin.SimpleListFilter):
+    """Dataset filter offering only the newest datasets, not every one stored"""
+    title = 'dataset'
+    parameter_name = 'dataset'
+    limit = 10
+
+    def lookups(self, request, model_admin):
+        datasets = list(Dataset.objects.order_by('-id').values_list('id', 'filename')[:self.limit])
+        # Keep the selected dataset listed when it is older
+        if self.value() and self.value().isdigit() and int(self.value()) not in dict(datasets):
+            datasets += Dataset.objects.filter(pk=self.value()).values_list('id', 'filename')
+        return [(str(pk), f'#{pk} {filename}') for pk, filename in datasets]
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        if not self.value().isdigit():
+            raise IncorrectLookupParameters
+        return queryset.filter(dataset_id=self.value())
 
 
 @admin.register(Dataset)
 class DatasetAdmin(admin.ModelAdmin):
-    list_display = ['filename', 'row_count', 'upload_date']
+    list_display = ['filename', 'row_count', 'upload_date', 'records']
     list_filter = ['upload_date']
     search_fields = ['filename']
     readonly_fields = ['upload_date']
 
+    @admin.display(description='Records')
+    def records(self, obj):
+        url = reverse('admin:equipment_equipmentrecord_changelist')
+        return format_html('<a href="{}?dataset={}">View records</a>', url, obj.pk)
+
 
 @admin.register(EquipmentRecord)
 class EquipmentRecordAdmin(admin.ModelAdmin):
     list_display = ['equipment_name', 'equipment_type', 'flowrate', 'pressure', 'temperature', 'dataset']
-    list_filter = ['equipment_type', 'dataset']
-    search_fields = ['equipment_name', 'equipment_type']
\ No newline at end of file
+    list_filter = ['equipment_type', RecentDatasetFilter]
+    list_select_related = ['equipment_name', 'equipment_type', 'dataset']
+    autocomplete_fields = ['dataset', 'equipment_name', 'equipment_type']
+    search_fields = ['equipment_name__name', 'equipment_type__name']
+    search_help_text = 'Equipment names or types starting with the given text (case-sensitive)'
+    sortable_by = []
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        """Prefix search through the unique name indexes of the dimension tables"""
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        condition = Q(equipment_name__in=EquipmentName.objects.filter(prefix_filter('name', term)).values('id'))
+        # Types are few; an OR with an empty type list would still make SQLite scan every record
+        type_ids = list(EquipmentType.objects.filter(prefix_filter('name', term)).values_list('id', flat=True))
+        if type_ids:
+            condition |= Q(equipment_type__in=type_ids)
+        return queryset.filter(condition), False
+
+
+@admin.register(EquipmentType, EquipmentName)
+class DimensionAdmin(admin.ModelAdmin):
+    list_display = ['name']
+    search_fields = ['name']
+    ordering = ['name']
+    search_help_text = 'Names starting with the given text (case-sensitive)'
+
+    def get_search_results(self, request, queryset, search_term):
+        # Also serves the record form's autocomplete widgets
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        return queryset.filter(prefix_filter('name', term)), False
@@ -0,0 +1,182 @@
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+_slots = None
+_slots_lock = threading.Lock()
+_gauges = {'running': 0, 'waiting': 0}
+_counters = {}
+_lock = threading.Lock()
+
+COUNTERS = ('admitted', 'queued', 'rejected_rate', 'rejected_user', 'rejected_busy')
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a heavy request is turned away: status is 429 when the user
+    exceeded their own limits and 503 when the server process is busy
+    """
+
+    def __init__(self, message, status, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """An admitted request; release() hands back its slot once it is done"""
+
+    def __init__(self, user_key):
+        self.user_key = user_key
+        self.released = False
+
+    def release(self):
+        if self.released:
+            return
+        self.released = True
+        _slots.release()
+        _change('running', -1)
+        _leave_user(self.user_key)
+
+
+def _get_slots():
+    global _slots
+    with _slots_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(settings.ADMISSION_MAX_CONCURRENT)
+        return _slots
+
+
+def _count(name, counter):
+    with _lock:
+        _counters.setdefault(name, dict.fromkeys(COUNTERS, 0))[counter] += 1
+
+
+def _change(gauge, delta):
+    with _lock:
+        _gauges[gauge] += delta
+
+
+def _cache():
+    return caches[settings.ADMISSION_CACHE]
+
+
+def _enter_user(key):
+    """Count one more running request for a user; return how many are running"""
+    cache = _cache()
+    # Expires so slots of a server process that died are not held forever
+    cache.add(key, 0, settings.ADMISSION_USER_SLOT_TIMEOUT)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Expired between add and incr
+        cache.set(key, 1, settings.ADMISSION_USER_SLOT_TIMEOUT)
+        return 1
+
+
+def _leave_user(key):
+    try:
+        _cache().decr(key)
+    except ValueError:
+        pass
+
+
+def _take_token(key, rate, burst):
+    """
+    Take a token from a user's bucket, which holds up to burst tokens and
+    gains rate per minute. Returns 0, or the seconds until a token is due.
+    Concurrent requests may read the same bucket, so a burst can exceed the
+    limit by a request or two.
+    """
+    per_second = rate / 60
+    now = time.time()
+    tokens, updated = _cache().get(key, (burst, now))
+    tokens = min(burst, tokens + (now - updated) * per_second)
+    if tokens < 1:
+        return math.ceil((1 - tokens) / per_second)
+    _cache().set(key, (tokens - 1, now), math.ceil(burst / per_second) + 1)
+    return 0
+
+
+def _acquire_slot(name):
+    """Take one of the process's heavy request slots, waiting briefly if there is room in the queue"""
+    slots = _get_slots()
+    if not slots.acquire(blocking=False):
+        with _lock:
+            full = _gauges['waiting'] >= settings.ADMISSION_MAX_QUEUE
+            if not full:
+                _gauges['waiting'] += 1
+        if full:
+            return False
+        _count(name, 'queued')
+        try:
+            if not slots.acquire(timeout=settings.ADMISSION_QUEUE_TIMEOUT):
+                return False
+        finally:
+            _change('waiting', -1)
+    _change('running', 1)
+    return True
+
+
+def admit(name, user):
+    """
+    Admit a request of the admission class name (a key of
+    settings.ADMISSION_CLASSES) for user, or raise AdmissionRejected.
+
+    The user may run at most user_concurrency requests of the class at once
+    and start rate per minute after a burst, both tracked in the
+    ADMISSION_CACHE (429). Each server process runs at most
+    ADMISSION_MAX_CONCURRENT heavy requests of any class; up to
+    ADMISSION_MAX_QUEUE more wait ADMISSION_QUEUE_TIMEOUT seconds for one
+    of them to finish (503 otherwise), so threads stay free for cheap reads.
+    Returns a Ticket to release when the request is done, or None when
+    ADMISSION_CONTROL is off.
+    """
+    if not settings.ADMISSION_CONTROL:
+        return None
+    limits = settings.ADMISSION_CLASSES[name]
+    user_key = f'admission:{name}:{user.pk}'
+
+    if _enter_user(user_key) > limits['user_concurrency']:
+        _leave_user(user_key)
+        _count(name, 'rejected_user')
+        raise AdmissionRejected(
+            f'Too many {name} requests in progress, please wait for one to finish',
+            429, settings.ADMISSION_RETRY_AFTER
+        )
+
+    wait = _take_token(f'{user_key}:bucket', limits['rate'], limits['burst'])
+    if wait:
+        _leave_user(user_key)
+        _count(name, 'rejected_rate')
+        raise AdmissionRejected(f'Too many {name} requests, please slow down', 429, wait)
+
+    if not _acquire_slot(name):
+        _leave_user(user_key)
+        _count(name, 'rejected_busy')
+        logger.warning('No heavy request slot free, rejecting a %s request', name)
+        raise AdmissionRejected('Server is busy, please retry shortly', 503, settings.ADMISSION_RETRY_AFTER)
+
+    _count(name, 'admitted')
+    return Ticket(user_key)
+
+
+def metrics():
+    """Heavy request slots in use and admission counters per class in this server process"""
+    with _lock:
+        return {
+            'enabled': settings.ADMISSION_CONTROL,
+            'max_concurrent': settings.ADMISSION_MAX_CONCURRENT,
+            'max_queue': settings.ADMISSION_MAX_QUEUE,
+            **_gauges,
+            'classes': {
+                name: dict(_counters.get(name, dict.fromkeys(COUNTERS, 0)))
+                for name in settings.ADMISSION_CLASSES
+            }
+        }
@@ -0,0 +1,201 @@
+import re
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Max, Min
+
+from .models import EquipmentRecord
+
+GROUP_BY_FIELDS = ['equipment_type', 'equipment_name']
+VALUE_FIELDS = ['flowrate', 'pressure', 'temperature']
+DEFAULT_AGGREGATES = ['count', 'mean', 'min', 'max']
+DEFAULT_QUANTILES = [0.5, 0.95, 0.99]
+
+SQL_AGGREGATES = {
+    'mean': Avg,
+    'min': Min,
+    'max': Max,
+}
+PANDAS_AGGREGATES = {
+    'mean': 'mean',
+    'min': 'min',
+    'max': 'max',
+    'std': 'std',
+}
+PERCENTILE_RE = re.compile(r'^p(\d{1,2}(?:\.\d+)?)$')
+
+_frame_cache = OrderedDict()
+_frame_lock = threading.Lock()
+
+
+def parse_aggregates(value):
+    """Parse a comma separated list of aggregate names such as 'count,mean,p95'"""
+    if not value:
+        return list(DEFAULT_AGGREGATES)
+    aggregates = []
+    for name in (part.strip().lower() for part in value.split(',')):
+        if not name or name in aggregates:
+            continue
+        if name != 'count' and name not in PANDAS_AGGREGATES and not PERCENTILE_RE.match(name):
+            raise ValueError(f"Unsupported aggregate: {name}")
+        aggregates.append(name)
+    return aggregates
+
+
+def parse_fields(value):
+    """Parse a comma separated list of numeric fields to aggregate"""
+    if not value:
+        return list(VALUE_FIELDS)
+    fields = [part.strip().lower() for part in value.split(',') if part.strip()]
+    unknown = [field for field in fields if field not in VALUE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unsupported fields: {', '.join(unknown)}")
+    return fields
+
+
+def parse_group_by(value):
+    """Validate the field records are grouped by, equipment_type by default"""
+    if not value:
+        return GROUP_BY_FIELDS[0]
+    if value not in GROUP_BY_FIELDS:
+        raise ValueError(f"group_by must be one of: {', '.join(GROUP_BY_FIELDS)}")
+    return value
+
+
+def parse_quantiles(value):
+    """Parse a comma separated list of quantiles between 0 and 1 such as '0.5,0.99'"""
+    if not value:
+        return list(DEFAULT_QUANTILES)
+    quantiles = []
+    for part in (part.strip() for part in value.split(',')):
+        if not part:
+            continue
+        try:
+            q = float(part)
+        except ValueError:
+            q = None
+        # Also rejects nan, which compares false with everything
+        if q is None or not 0 <= q <= 1:
+            raise ValueError('q must be a comma separated list of numbers between 0 and 1')
+        quantiles.append(q)
+    if not quantiles:
+        raise ValueError('q must be a comma separated list of numbers between 0 and 1')
+    return quantiles
+
+
+def _group_names(dataset, group_by):
+    """Map the dimension keys used by a dataset's records to their names"""
+    dimension = EquipmentRecord._meta.get_field(group_by).related_model
+    keys = dataset.records.values(group_by)
+    return dict(dimension.objects.filter(id__in=keys).values_list('id', 'name'))
+
+
+def get_record_frame(dataset):
+    """Return a columnar DataFrame copy of a dataset's records, cached per process"""
+    key = dataset.cache_key('frame')
+    with _frame_lock:
+        if key in _frame_cache:
+            _frame_cache.move_to_end(key)
+            return _frame_cache[key]
+
+    columns = GROUP_BY_FIELDS + VALUE_FIELDS
+    rows = dataset.records.values_list(*[f'{field}__name' for field in GROUP_BY_FIELDS], *VALUE_FIELDS)
+    df = pd.DataFrame.from_records(list(rows), columns=columns)
+    for field in GROUP_BY_FIELDS:
+        df[field] = df[field].astype('category')
+
+    with _frame_lock:
+        _frame_cache[key] = df
+        while len(_frame_cache) > settings.RECORD_FRAME_CACHE_SIZE:
+            _frame_cache.popitem(last=False)
+    return df
+
+
+def _sql_aggregate(dataset, group_by, aggregates, fields):
+    annotations = {'count': Count('id')}
+    for field in fields:
+        for name in aggregates:
+            if name in SQL_AGGREGATES:
+                annotations[f'{field}__{name}'] = SQL_AGGREGATES[name](field)
+
+    # Grouping runs on the integer dimension keys; names are looked up after
+    rows = list(dataset.records.values(group_by)
+                .annotate(**annotations)
+                .order_by())
+    names = _group_names(dataset, group_by)
+
+    groups = []
+    for row in sorted(rows, key=lambda row: names[row[group_by]]):
+        group = {group_by: names[row[group_by]]}
+        if 'count' in aggregates:
+            group['count'] = row['count']
+        for field in fields:
+            group[field] = {
+                name: _round(row[f'{field}__{name}'])
+                for name in aggregates if name in SQL_AGGREGATES
+            }
+        groups.append(group)
+    return groups
+
+
+def _pandas_aggregate(dataset, group_by, aggregates, fields):
+    df = get_record_frame(dataset)
+    grouped = df.groupby(group_by, observed=True, sort=True)[fields]
+
+    results = {}
+    for name in aggregates:
+        if name == 'count':
+            results[name] = grouped.size()
+        elif name in PANDAS_AGGREGATES:
+            results[name] = grouped.agg(PANDAS_AGGREGATES[name])
+        else:
+            q = float(PERCENTILE_RE.match(name).group(1)) / 100
+            results[name] = grouped.quantile(q)
+
+    groups = []
+    for key in grouped.size().index:
+        group = {group_by: key}
+        if 'count' in aggregates:
+            group['count'] = int(results['count'][key])
+        for field in fields:
+            group[field] = {
+                name: _round(results[name].at[key, field])
+                for name in aggregates if name != 'count'
+            }
+        groups.append(group)
+    return groups
+
+
+def _round(value):
+    if value is None or pd.isna(value):
+        return None
+    return round(float(value), 2)
+
+
+def compute_aggregates(dataset, group_by, aggregates, fields=None):
+    """
+    Aggregate a dataset's records grouped by equipment type or name.
+
+    Plain aggregates run as a single GROUP BY query. Percentiles and the
+    sample standard deviation are not portable across database backends
+    (SQLite's STDDEV_SAMP fails on single-row groups), so requests that
+    include them are answered from a cached columnar copy of the records
+    with pandas, where std is null for groups of one.
+    Results are cached per dataset.
+    """
+    if group_by not in GROUP_BY_FIELDS:
+        raise ValueError(f"group_by must be one of: {', '.join(GROUP_BY_FIELDS)}")
+    fields = fields or list(VALUE_FIELDS)
+
+    key = dataset.cache_key('aggregate', group_by, ','.join(aggregates), ','.join(fields))
+    groups = cache.get(key)
+    if groups is None:
+        if all(name == 'count' or name in SQL_AGGREGATES for name in aggregates):
+            groups = _sql_aggregate(dataset, group_by, aggregates, fields)
+        else:
+            groups = _pandas_aggregate(dataset, group_by, aggregates, fields)
+        cache.set(key, groups, settings.AGGREGATE_CACHE_TIMEOUT)
+    return groups
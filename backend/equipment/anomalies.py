@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+PARAMETER_COLUMNS = ['Flowrate', 'Pressure', 'Temperature']
+SCORE_COLUMN = 'Anomaly Score'
+FLAG_COLUMN = 'Is Anomaly'
+
+
+def detect_anomalies(df, method=None, threshold=None, limits=None):
+    """
+    Ingest stage that flags records running out of range for their
+    equipment type.
+
+    Every parameter is scored against the other records of the same type,
+    either as an absolute z-score or as the distance beyond the Tukey IQR
+    fences measured in IQRs. The record score is the largest parameter
+    score; records scoring above the threshold, or outside a configured
+    hard limit, are flagged. All work is vectorized over the whole frame.
+    """
+    config = settings.ANOMALY_DETECTION
+    method = method or config['METHOD']
+    threshold = config['THRESHOLD'] if threshold is None else threshold
+    limits = config['LIMITS'] if limits is None else limits
+
+    if method not in ('zscore', 'iqr'):
+        raise ValueError(f"Unknown anomaly detection method: {method}")
+
+    codes, groups = _type_codes(df['Type'])
+    counts = np.bincount(codes, minlength=groups)
+    order = np.argsort(codes, kind='stable') if method == 'iqr' else None
+
+    # z-scores are compared squared and only rooted once at the end
+    score = np.zeros(len(df))
+    flag = np.zeros(len(df), dtype=bool)
+    for column in PARAMETER_COLUMNS:
+        values = df[column].to_numpy(dtype=float)
+        if method == 'zscore':
+            column_score = _squared_zscore(codes, counts, values)
+        else:
+            column_score = _iqr_distance(codes, counts, order, values, config['IQR_FACTOR'])
+        np.maximum(score, column_score, out=score)
+        _flag_limits(flag, column, values, limits)
+    if method == 'zscore':
+        np.sqrt(score, out=score)
+
+    flag |= score > threshold
+
+    return df.assign(**{SCORE_COLUMN: np.round(score, 4), FLAG_COLUMN: flag})
+
+
+def score_against_totals(df, totals, threshold=None, limits=None):
+    """
+    Flag records by their z-score against running per-type totals rather
+    than against the other records of the frame, for rows appended to a
+    dataset whose stored records are not in the frame.
+
+    `totals` maps every type in the frame to its stored aggregates: the
+    count, and the sum and sum of squares of every parameter keyed by the
+    lowercase column name.
+    """
+    config = settings.ANOMALY_DETECTION
+    threshold = config['THRESHOLD'] if threshold is None else threshold
+    limits = config['LIMITS'] if limits is None else limits
+
+    codes, uniques = pd.factorize(df['Type'].astype(str))
+    counts = np.array([totals[key]['count'] for key in uniques], dtype=float)
+
+    score = np.zeros(len(df))
+    flag = np.zeros(len(df), dtype=bool)
+    for column in PARAMETER_COLUMNS:
+        field = column.lower()
+        values = df[column].to_numpy(dtype=float)
+        sums = np.array([totals[key][field]['sum'] for key in uniques], dtype=float)
+        squares = np.array([totals[key][field]['sumsq'] for key in uniques], dtype=float)
+        means = sums / np.maximum(counts, 1)
+        variances = ((squares - sums * means) / np.maximum(counts - 1, 1)).clip(min=0)
+        inverse = np.divide(1.0, variances, out=np.zeros(len(counts)), where=variances > 0)
+        squared = values - means[codes]
+        np.multiply(squared, squared, out=squared)
+        np.multiply(squared, inverse[codes], out=squared)
+        np.maximum(score, squared, out=score)
+        _flag_limits(flag, column, values, limits)
+    np.sqrt(score, out=score)
+
+    flag |= score > threshold
+
+    return df.assign(**{SCORE_COLUMN: np.round(score, 4), FLAG_COLUMN: flag})
+
+
+def _flag_limits(flag, column, values, limits):
+    """Flag values outside the column's configured hard limits, in place"""
+    low, high = limits.get(column, (None, None))
+    if low is not None:
+        flag |= values < low
+    if high is not None:
+        flag |= values > high
+
+
+def _type_codes(types):
+    """Integer group code per row, reusing categorical codes when available"""
+    if isinstance(types.dtype, pd.CategoricalDtype):
+        return types.cat.codes.to_numpy().astype(np.intp), len(types.cat.categories)
+    codes, uniques = pd.factorize(types)
+    return codes, len(uniques)
+
+
+def _squared_zscore(codes, counts, values):
+    """Squared z-score of every value against its group"""
+    means = np.bincount(codes, weights=values, minlength=len(counts)) / np.maximum(counts, 1)
+    squared = values - means[codes]
+    np.multiply(squared, squared, out=squared)
+    variances = np.bincount(codes, weights=squared, minlength=len(counts)) / np.maximum(counts - 1, 1)
+    inverse = np.divide(1.0, variances, out=np.zeros(len(counts)), where=variances > 0)
+    np.multiply(squared, inverse[codes], out=squared)
+    return squared
+
+
+def _iqr_distance(codes, counts, order, values, factor):
+    """Distance beyond the group's IQR fences, in units of the group's IQR"""
+    q1, q3 = _group_quartiles(counts, values[order])
+    iqr = (q3 - q1)[codes]
+    lower = q1[codes] - factor * iqr
+    upper = q3[codes] + factor * iqr
+    distance = np.maximum(lower - values, values - upper).clip(min=0)
+    return np.divide(distance, iqr, out=np.zeros(len(values)), where=iqr > 0)
+
+
+def _group_quartiles(counts, grouped_values):
+    """First and third quartile of every group of values sorted by group code"""
+    q1 = np.zeros(len(counts))
+    q3 = np.zeros(len(counts))
+    start = 0
+    for group, count in enumerate(counts):
+        if count:
+            q1[group], q3[group] = np.quantile(grouped_values[start:start + count], [0.25, 0.75])
+        start += count
+    return q1, q3
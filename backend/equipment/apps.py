@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class EquipmentConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'equipment'
+
+    def ready(self):
+        # Connects the token cache invalidation signals
+        from . import authentication
+        # Connects the SQLite connection tuning signal
+        from . import sqlite
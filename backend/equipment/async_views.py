@@ -0,0 +1,142 @@
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+
+from .authentication import aauthenticate_stream, aauthenticate_token, request_token
+from .events import astream_events, last_event_id, latest_event_id, replay
+from .models import Dataset
+from .routers import use_replica
+from .serializers import DatasetSerializer
+from .utils import format_csv_rows, rollup_statistics, EXPORT_FIELDS
+from .views import DatasetViewSet
+
+# Async versions of the read-heavy dataset endpoints, served when
+# ASYNC_VIEWS is enabled and the app runs under ASGI (config.asgi). They
+# answer with the same payloads as DatasetViewSet. CPU-bound work such as
+# serialization and CSV formatting runs in worker threads so the event loop
+# keeps serving other requests.
+
+EXPORT_BATCH_SIZE = 2000
+
+sync_dataset_list = DatasetViewSet.as_view({'get': 'list', 'post': 'create'})
+
+
+async def authenticate(request):
+    """Resolve the request's token to a user, like TokenAuthentication"""
+    key = request_token(request)
+    return await aauthenticate_token(key) if key else None
+
+
+def unauthorized():
+    return JsonResponse(
+        {'detail': 'Authentication credentials were not provided.'},
+        status=401,
+        headers={'WWW-Authenticate': 'Token'}
+    )
+
+
+def not_found():
+    return JsonResponse({'detail': 'Not found.'}, status=404)
+
+
+def serialize_datasets(datasets):
+    return DatasetSerializer(datasets, many=True).data
+
+
+async def dataset_list(request):
+    """GET /api/datasets/ - the five most recent datasets"""
+    if request.method != 'GET':
+        return await sync_to_async(sync_dataset_list)(request)
+
+    user = await authenticate(request)
+    if user is None:
+        return unauthorized()
+    await sync_to_async(use_replica)(user)
+
+    datasets = [d async for d in Dataset.objects.filter(user=user).defer(*Dataset.BLOB_FIELDS).order_by('-id')[:5]]
+    results = await sync_to_async(serialize_datasets, thread_sensitive=False)(datasets)
+    return JsonResponse({
+        'count': len(results),
+        'next': None,
+        'previous': None,
+        'results': results
+    })
+
+
+async def dataset_summary(request, pk):
+    """GET /api/datasets/{id}/summary/"""
+    user = await authenticate(request)
+    if user is None:
+        return unauthorized()
+    await sync_to_async(use_replica)(user)
+
+    dataset = await Dataset.objects.filter(user=user, pk=pk).defer(*Dataset.BLOB_FIELDS).afirst()
+    if dataset is None:
+        return not_found()
+    data = await sync_to_async(lambda: DatasetSerializer(dataset).data, thread_sensitive=False)()
+    return JsonResponse(data)
+
+
+async def dataset_statistics(request):
+    """GET /api/datasets/statistics/"""
+    user = await authenticate(request)
+    if user is None:
+        return unauthorized()
+    await sync_to_async(use_replica)(user)
+
+    summaries = [
+        (row_count, json.loads(summary)) async for row_count, summary in
+        Dataset.objects.filter(user=user).values_list('row_count', 'summary_stats')
+    ]
+    return JsonResponse(rollup_statistics(summaries))
+
+
+async def dataset_export(request, pk):
+    """GET /api/datasets/{id}/export/ - stream records as CSV"""
+    user = await authenticate(request)
+    if user is None:
+        return unauthorized()
+    await sync_to_async(use_replica)(user)
+
+    dataset = await Dataset.objects.filter(user=user, pk=pk).defer(*Dataset.BLOB_FIELDS).afirst()
+    if dataset is None:
+        return not_found()
+
+    rows = dataset.records.order_by('id').values_list(*EXPORT_FIELDS).iterator(
+        chunk_size=EXPORT_BATCH_SIZE
+    )
+    # The cursor stays on the database thread; formatting runs elsewhere
+    next_batch = sync_to_async(lambda: list(islice(rows, EXPORT_BATCH_SIZE)))
+    format_batch = sync_to_async(format_csv_rows, thread_sensitive=False)
+
+    async def stream():
+        yield await format_batch([], header=True)
+        while batch := await next_batch():
+            yield await format_batch(batch)
+
+    response = StreamingHttpResponse(stream(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="dataset_{dataset.id}.csv"'
+    return response
+
+
+async def event_stream(request):
+    """GET /api/events/ - Server-Sent Events held open on the event loop"""
+    user = await aauthenticate_stream(request)
+    if user is None:
+        return unauthorized()
+
+    last_id = last_event_id(request)
+    if last_id is None:
+        start_id, replayed = await sync_to_async(latest_event_id)(), []
+    else:
+        start_id, replayed = None, await sync_to_async(replay)(user.pk, last_id)
+    response = StreamingHttpResponse(
+        astream_events(user, settings.EVENTS_ASYNC_STREAM_DURATION, start_id, replayed),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
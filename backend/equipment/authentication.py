@@ -0,0 +1,225 @@
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+class TokenCache:
+    """
+    Bounded per-process LRU of token key -> (user, token, revocation marker)
+    with a TTL
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, user, token, revocation):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + settings.TOKEN_CACHE_TIMEOUT, (user, token, revocation))
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.TOKEN_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in [k for k, (_, (user, _, _)) in self._entries.items() if user.pk == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
+
+
+def _revocation_key(user_id):
+    return f'token-revocation:{user_id}'
+
+
+def revocation_marker(user_id):
+    """The user's latest revocation marker, None if their tokens were not revoked lately"""
+    return caches[settings.TOKEN_REVOCATION_CACHE].get(_revocation_key(user_id))
+
+
+async def arevocation_marker(user_id):
+    """Async counterpart of revocation_marker"""
+    return await caches[settings.TOKEN_REVOCATION_CACHE].aget(_revocation_key(user_id))
+
+
+def revoke_cached_tokens(user_id):
+    """
+    Make every server process look the user's tokens up again. The marker
+    only has to outlive the cache entries taken before it, so it expires
+    after TOKEN_CACHE_TIMEOUT.
+    """
+    token_cache.invalidate_user(user_id)
+    caches[settings.TOKEN_REVOCATION_CACHE].set(
+        _revocation_key(user_id), uuid.uuid4().hex, settings.TOKEN_CACHE_TIMEOUT
+    )
+
+
+def _cached_credentials(key, revocation):
+    """
+    Copies of the cached user and token when the entry is still current.
+    Requests on other threads get their own instances, so attributes one
+    request sets on its user never show up in another.
+    """
+    cached = token_cache.get(key)
+    if cached is None:
+        return None
+    user, token, cached_revocation = cached
+    if cached_revocation != revocation(user.pk):
+        token_cache.invalidate(key)
+        return None
+    return _copies(user, token)
+
+
+def _copies(user, token):
+    user = copy.copy(user)
+    token = copy.copy(token)
+    token.user = user
+    return user, token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that remembers token to user lookups.
+
+    Hits are answered without querying the token and user tables. Entries
+    are dropped when the token is deleted (logout) or its user changes, in
+    other server processes through the revocation marker checked on every
+    hit, and expire after TOKEN_CACHE_TIMEOUT seconds.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = _cached_credentials(key, revocation_marker)
+        if cached is not None:
+            return cached
+
+        user_id = self.get_model().objects.filter(key=key).values_list('user_id', flat=True).first()
+        # Read before the lookup, so a revocation during it is not missed
+        revocation = revocation_marker(user_id) if user_id is not None else None
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user, token, revocation)
+        return _copies(user, token)
+
+
+def request_token(request):
+    """Token key from 'Authorization: Token <key>'"""
+    auth = request.headers.get('Authorization', '').split()
+    if len(auth) == 2 and auth[0].lower() == 'token':
+        return auth[1]
+    return None
+
+
+STREAM_TICKET_SALT = 'equipment.events.stream-ticket'
+
+
+def issue_stream_ticket(user):
+    """
+    Signed ticket that opens the user's event stream for
+    EVENTS_TICKET_MAX_AGE seconds. EventSource cannot set headers, so
+    browsers pass it as ?ticket= instead of their token, which would
+    otherwise end up in access logs.
+    """
+    return signing.dumps(user.pk, salt=STREAM_TICKET_SALT)
+
+
+def stream_ticket_user_id(ticket):
+    """User id of a valid, unexpired stream ticket, or None"""
+    try:
+        return signing.loads(ticket, salt=STREAM_TICKET_SALT, max_age=settings.EVENTS_TICKET_MAX_AGE)
+    except signing.BadSignature:
+        return None
+
+
+def authenticate_token(key):
+    """Sync cached token lookup for plain Django views; returns the user or None"""
+    try:
+        return CachedTokenAuthentication().authenticate_credentials(key)[0]
+    except exceptions.AuthenticationFailed:
+        return None
+
+
+async def aauthenticate_token(key):
+    """Async counterpart of CachedTokenAuthentication; returns the user or None"""
+    cached = token_cache.get(key)
+    if cached is not None:
+        user, token, cached_revocation = cached
+        if cached_revocation == await arevocation_marker(user.pk):
+            return _copies(user, token)[0]
+        token_cache.invalidate(key)
+    user_id = await Token.objects.filter(key=key).values_list('user_id', flat=True).afirst()
+    if user_id is None:
+        return None
+    revocation = await arevocation_marker(user_id)
+    try:
+        token = await Token.objects.select_related('user').aget(key=key)
+    except Token.DoesNotExist:
+        return None
+    if not token.user.is_active:
+        return None
+    token_cache.set(key, token.user, token, revocation)
+    return _copies(token.user, token)[0]
+
+
+def authenticate_stream(request):
+    """User opening an event stream, from the Authorization token or ?ticket=; None if neither is valid"""
+    key = request_token(request)
+    if key:
+        return authenticate_token(key)
+    user_id = stream_ticket_user_id(request.GET.get('ticket', ''))
+    if user_id is None:
+        return None
+    return User.objects.filter(pk=user_id, is_active=True).first()
+
+
+async def aauthenticate_stream(request):
+    """Async counterpart of authenticate_stream"""
+    key = request_token(request)
+    if key:
+        return await aauthenticate_token(key)
+    user_id = stream_ticket_user_id(request.GET.get('ticket', ''))
+    if user_id is None:
+        return None
+    return await User.objects.filter(pk=user_id, is_active=True).afirst()
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+    revoke_cached_tokens(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_user_tokens(sender, instance, **kwargs):
+    revoke_cached_tokens(instance.pk)
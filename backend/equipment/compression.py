@@ -0,0 +1,83 @@
+import gzip
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zstd support is optional
+    zstandard = None
+
+CSV_COMPRESSIONS = {
+    '.csv': None,
+    '.csv.gz': 'gzip',
+    '.csv.zst': 'zstd',
+}
+
+
+def is_csv_filename(filename):
+    """Whether a file name is a plain or compressed CSV we can ingest"""
+    return any(filename.lower().endswith(ext) for ext in CSV_COMPRESSIONS)
+
+
+def csv_compression(filename):
+    """Return the pandas compression name matching a CSV file name"""
+    name = filename.lower()
+    for ext, compression in CSV_COMPRESSIONS.items():
+        if name.endswith(ext):
+            if compression == 'zstd' and zstandard is None:
+                raise ValueError('Zstandard compressed uploads are not supported on this server')
+            return compression
+    raise ValueError('Only CSV files are allowed')
+
+
+def open_decompressed(file, compression):
+    """Wrap a binary file object so that reads return decompressed bytes"""
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=file, mode='rb')
+    if compression == 'zstd':
+        return zstandard.ZstdDecompressor().stream_reader(file)
+    return file
+
+
+def supported_encodings():
+    """Content encodings this server can decode and produce, best first"""
+    return ['zstd', 'gzip'] if zstandard is not None else ['gzip']
+
+
+def new_decompressor(encoding):
+    """Incremental decompressor for a Content-Encoding value"""
+    if encoding == 'gzip':
+        return zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    if encoding == 'zstd' and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompressobj()
+    return None
+
+
+def new_compressor(encoding):
+    """Incremental compressor for a Content-Encoding value"""
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    return zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+def zstd_compress(data):
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+
+def zstd_compress_sequence(sequence):
+    """Compress an iterable of byte strings into a zstd frame, chunk by chunk"""
+    compressor = zstandard.ZstdCompressor(level=3).compressobj()
+    for item in sequence:
+        data = compressor.compress(item)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def compress_async_sequence(sequence, encoding):
+    """Compress an async iterable of byte strings into a single stream"""
+    compressor = new_compressor(encoding)
+    async for item in sequence:
+        data = compressor.compress(item)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,265 @@
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import sqlite
+from .models import Event
+
+logger = logging.getLogger(__name__)
+
+DATASET_CREATED = 'dataset.created'
+DATASET_DELETED = 'dataset.deleted'
+DATASET_UPDATED = 'dataset.updated'
+JOB_PROGRESS = 'job.progress'
+
+RESYNC = 'event: resync\ndata: {}\n\n'
+KEEPALIVE = ': keepalive\n\n'
+
+_subscribers = set()
+_subscribers_lock = threading.Lock()
+_bridge = None
+_stream_slots = None
+
+
+class Subscription:
+    """Bounded queue of events for one connected client"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.overflowed = False
+        self.queue = queue.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class AsyncSubscription(Subscription):
+    """Subscription read from an event loop; events may be put from any thread"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.overflowed = False
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+
+    def put(self, event):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+def subscribe(subscription):
+    with _subscribers_lock:
+        _subscribers.add(subscription)
+    if settings.EVENTS_DB_BRIDGE:
+        _start_bridge()
+    return subscription
+
+
+def unsubscribe(subscription):
+    with _subscribers_lock:
+        _subscribers.discard(subscription)
+
+
+def fan_out(event):
+    """Hand an event to every subscription of its user in this process"""
+    with _subscribers_lock:
+        targets = [s for s in _subscribers if s.user_id == event['user']]
+    for subscription in targets:
+        subscription.put(event)
+
+
+def publish(user, kind, data):
+    """
+    Publish an event to the user's subscribers once the current transaction
+    commits. With EVENTS_DB_BRIDGE the event is stored instead and every
+    server process, this one included, relays it from the table, which
+    keeps events in one order across processes.
+    """
+    if user is None:
+        return
+    payload = json.dumps(data, cls=DjangoJSONEncoder)
+    transaction.on_commit(lambda: _publish(user.pk, kind, payload))
+
+
+def publish_progress(user, job, filename, stage, **extra):
+    """Publish a job.progress event for an upload or ingest job"""
+    publish(user, JOB_PROGRESS, {'job': job, 'filename': filename, 'stage': stage, **extra})
+
+
+def _publish(user_id, kind, payload):
+    if settings.EVENTS_DB_BRIDGE:
+        Event.objects.create(user_id=user_id, kind=kind, payload=payload)
+    else:
+        fan_out({'id': None, 'user': user_id, 'kind': kind, 'payload': payload})
+
+
+def replay(user_id, last_id):
+    """
+    Stored events of a user after last_id, for clients resuming a stream.
+    New connections (last_id None) get none, only what happens next.
+    """
+    if not settings.EVENTS_DB_BRIDGE or last_id is None:
+        return []
+    return [
+        {'id': pk, 'user': user_id, 'kind': kind, 'payload': payload}
+        for pk, kind, payload in Event.objects.filter(user_id=user_id, id__gt=last_id)
+        .order_by('id').values_list('id', 'kind', 'payload')[:settings.EVENTS_QUEUE_SIZE]
+    ]
+
+
+def latest_event_id():
+    """Id of the newest stored event, where a new connection starts; None without the bridge"""
+    if not settings.EVENTS_DB_BRIDGE:
+        return None
+    return Event.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def format_event(event):
+    """Encode an event in the text/event-stream format"""
+    lines = []
+    if event['id'] is not None:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['kind']}")
+    lines.append(f"data: {event['payload']}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def _start_bridge():
+    global _bridge
+    with _subscribers_lock:
+        if _bridge is None or not _bridge.is_alive():
+            _bridge = threading.Thread(target=_run_bridge, name='event-bridge', daemon=True)
+            _bridge.start()
+
+
+def _run_bridge():
+    """
+    Relay stored events to this process's subscribers. Polls the event
+    table for rows newer than the last one seen and prunes old rows.
+    """
+    last_id = None
+    next_prune = 0
+    while True:
+        close_old_connections()
+        try:
+            if last_id is None:
+                last_id = Event.objects.order_by('-id').values_list('id', flat=True).first() or 0
+            rows = list(
+                Event.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', 'user_id', 'kind', 'payload')[:500]
+            )
+            for pk, user_id, kind, payload in rows:
+                last_id = pk
+                fan_out({'id': pk, 'user': user_id, 'kind': kind, 'payload': payload})
+
+            if time.monotonic() >= next_prune:
+                cutoff = timezone.now() - timedelta(minutes=settings.EVENTS_RETENTION_MINUTES)
+                if Event.objects.filter(created_at__lt=cutoff).delete()[0]:
+                    sqlite.optimize()
+                next_prune = time.monotonic() + 60
+        except Exception:
+            logger.exception('Event bridge poll failed')
+        time.sleep(settings.EVENTS_POLL_INTERVAL)
+
+
+def acquire_stream_slot():
+    """
+    Take one of the EVENTS_SYNC_STREAMS slots of this process for a stream
+    that holds a worker thread; returns the semaphore to release, or None
+    when every slot is taken
+    """
+    global _stream_slots
+    with _subscribers_lock:
+        if _stream_slots is None:
+            _stream_slots = threading.BoundedSemaphore(settings.EVENTS_SYNC_STREAMS)
+        slots = _stream_slots
+    return slots if slots.acquire(blocking=False) else None
+
+
+def last_event_id(request):
+    """Id of the last event a reconnecting EventSource received; None for a new connection"""
+    value = request.headers.get('Last-Event-ID') or request.GET.get('lastEventId', '')
+    return int(value) if value.isdigit() else None
+
+
+def _preamble(start_id):
+    # An id without data sets the client's last event id without dispatching
+    # an event, so a reconnect resumes from where this connection started
+    preamble = f'retry: {settings.EVENTS_RETRY_MS}\n'
+    if start_id is not None:
+        preamble += f'id: {start_id}\n'
+    return preamble + '\n'
+
+
+def stream_events(request, user, duration):
+    """
+    text/event-stream generator for a user. Ends after `duration` seconds;
+    EventSource reconnects by itself and resumes from Last-Event-ID when
+    events are stored. A resync event tells the client it missed events and
+    should reload the dataset list.
+    """
+    last_id = last_event_id(request)
+    subscription = subscribe(Subscription(user.pk))
+    try:
+        yield _preamble(latest_event_id() if last_id is None else None)
+        for event in replay(user.pk, last_id):
+            yield format_event(event)
+        deadline = time.monotonic() + duration
+        while (remaining := deadline - time.monotonic()) > 0:
+            event = subscription.get(min(settings.EVENTS_HEARTBEAT, remaining))
+            if subscription.overflowed:
+                subscription.overflowed = False
+                yield RESYNC
+            yield KEEPALIVE if event is None else format_event(event)
+    finally:
+        unsubscribe(subscription)
+
+
+async def astream_events(user, duration, start_id, replayed):
+    """
+    Async counterpart of stream_events; `start_id` is the id a new
+    connection starts at and `replayed` are the events to resend first
+    """
+    subscription = subscribe(AsyncSubscription(user.pk))
+    try:
+        yield _preamble(start_id)
+        for event in replayed:
+            yield format_event(event)
+        deadline = time.monotonic() + duration
+        while (remaining := deadline - time.monotonic()) > 0:
+            event = await subscription.get(min(settings.EVENTS_HEARTBEAT, remaining))
+            if subscription.overflowed:
+                subscription.overflowed = False
+                yield RESYNC
+            yield KEEPALIVE if event is None else format_event(event)
+    finally:
+        unsubscribe(subscription)
@@ -0,0 +1,237 @@
+import io
+
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from . import pool, sqlite
+from .anomalies import PARAMETER_COLUMNS, SCORE_COLUMN, FLAG_COLUMN, detect_anomalies, score_against_totals
+from .events import publish, publish_progress, DATASET_CREATED, DATASET_DELETED, DATASET_UPDATED
+from .models import Dataset, EquipmentName, EquipmentRecord, EquipmentType
+from .serializers import DatasetSerializer
+from .compression import csv_compression
+from .utils import (
+    parse_csv_file, run_ingest_stages, calculate_summary_stats, build_sketches,
+    serialize_sketches, deserialize_sketches, merge_sketches, calculate_group_aggregates,
+    merge_group_aggregates, summary_from_aggregates, SKETCH_COLUMNS
+)
+
+# Datasets retained per user; uploading another deletes the oldest
+DATASETS_PER_USER = 5
+
+# DataFrame columns stored in EquipmentRecord rows
+RECORD_COLUMNS = ['Equipment Name', 'Type', *PARAMETER_COLUMNS, SCORE_COLUMN, FLAG_COLUMN]
+
+
+def find_duplicate(content_hash, user):
+    """Return the user's retained dataset with the same content hash, if any"""
+    if not content_hash:
+        return None
+    return Dataset.objects.filter(user=user, content_hash=content_hash).first()
+
+
+def prune_datasets(user, keep):
+    """Delete the user's datasets beyond the newest `keep`; returns how many were deleted"""
+    old_datasets = Dataset.objects.filter(user=user).order_by('-id')[keep:]
+    for old in old_datasets:
+        old_id = old.id
+        old.delete()
+        publish(user, DATASET_DELETED, {'id': old_id})
+    if old_datasets:
+        sqlite.optimize()
+    return len(old_datasets)
+
+
+def encode_column(dimension, values):
+    """Dictionary-encode a column: the dimension key of every value"""
+    codes, uniques = pd.factorize(values)
+    ids = dimension.get_ids(str(value) for value in uniques)
+    keys = [ids[str(value)] for value in uniques]
+    return [keys[code] for code in codes]
+
+
+def build_records(dataset, df):
+    """Build unsaved EquipmentRecord instances for every row of a DataFrame"""
+    scores = df[SCORE_COLUMN] if SCORE_COLUMN in df.columns else [0] * len(df)
+    flags = df[FLAG_COLUMN] if FLAG_COLUMN in df.columns else [False] * len(df)
+    names = encode_column(EquipmentName, df['Equipment Name'])
+    types = encode_column(EquipmentType, df['Type'])
+    return [
+        EquipmentRecord(
+            dataset=dataset,
+            equipment_name_id=name,
+            equipment_type_id=eq_type,
+            flowrate=flowrate,
+            pressure=pressure,
+            temperature=temperature,
+            anomaly_score=score,
+            is_anomaly=flag
+        )
+        for name, eq_type, flowrate, pressure, temperature, score, flag in zip(
+            names, types, df['Flowrate'], df['Pressure'],
+            df['Temperature'], scores, flags
+        )
+    ]
+
+
+def upload_source(file):
+    """A picklable handle on an uploaded file: its path on disk or its bytes"""
+    path = getattr(file, 'temporary_file_path', None)
+    if path is not None:
+        return path()
+    if isinstance(file, io.BufferedReader):
+        return file.name
+    return file.read()
+
+
+def analyze_csv(source, compression):
+    """Parse a CSV and compute everything stored with the dataset (runs in the CPU pool)"""
+    if isinstance(source, bytes):
+        df, report = parse_csv_file(io.BytesIO(source), compression)
+    else:
+        with open(source, 'rb') as f:
+            df, report = parse_csv_file(f, compression)
+    df = run_ingest_stages(df)
+    sketches = build_sketches(df)
+    summary = calculate_summary_stats(df, sketches)
+    aggregates = calculate_group_aggregates(df)
+    # Only the columns build_records reads are pickled back to the web
+    # process, with names dictionary-encoded so each one is sent once
+    records = df[[column for column in RECORD_COLUMNS if column in df.columns]]
+    records = records.astype({'Equipment Name': 'category', 'Type': 'category'})
+    return records, report, sketches, summary, aggregates
+
+
+def ingest_csv(file, filename, user, content_hash='', job=None):
+    """
+    Parse, analyze and store an uploaded CSV file as a new Dataset. Progress
+    is published as job.progress events when a job id is given.
+    """
+    if job:
+        publish_progress(user, job, filename, 'analyzing')
+    # Steps 1-2: Parsing and validating CSV, running the ingest stages and calculating
+    # summary statistics and mergeable sketches in the CPU pool
+    df, report, sketches, summary, aggregates = pool.run(
+        analyze_csv, upload_source(file), csv_compression(filename)
+    )
+    
+    if job:
+        publish_progress(user, job, filename, 'storing')
+    
+    # Step 3: Maintaining last 5 datasets of the user
+    prune_datasets(user, DATASETS_PER_USER - 1)
+    
+    # Step 4: Creating dataset in database
+    dataset = Dataset.objects.create(
+        user=user,
+        filename=filename,
+        row_count=len(df),
+        content_hash=content_hash
+    )
+    dataset.set_summary(summary)
+    dataset.set_sketches(serialize_sketches(sketches))
+    dataset.set_aggregates(aggregates)
+    dataset.set_validation(report)
+    dataset.save()
+    
+    # Step 5: Creating equipment records
+    EquipmentRecord.objects.bulk_create(build_records(dataset, df), batch_size=5000)
+    
+    publish(user, DATASET_CREATED, DatasetSerializer(dataset).data)
+    if job:
+        publish_progress(user, job, filename, 'done', dataset=dataset.id)
+    return dataset
+
+
+def rescore_appended(dataset, df, aggregates):
+    """
+    Score rows appended to a dataset against the whole dataset instead of
+    only against each other. z-scores are taken against the merged per-type
+    sums and sums of squares. The IQR method, and datasets stored without
+    sums of squares, run detection again over every record and update the
+    stored records whose score changed. Returns the rescored rows and the
+    dataset's new anomaly count.
+    """
+    by_type = aggregates['equipment_type']
+    if settings.ANOMALY_DETECTION['METHOD'] == 'zscore' and all(
+        'sumsq' in by_type[str(key)][field]
+        for key in df['Type'].unique() for field in SKETCH_COLUMNS
+    ):
+        df = score_against_totals(df, by_type)
+        return df, dataset.get_summary().get('anomaly_count', 0) + int(df[FLAG_COLUMN].sum())
+    
+    columns = ['Type', *PARAMETER_COLUMNS]
+    stored = pd.DataFrame.from_records(
+        dataset.records.order_by('id').values_list(
+            'id', 'equipment_type__name', 'flowrate', 'pressure', 'temperature', 'anomaly_score', 'is_anomaly'
+        ),
+        columns=['id', *columns, SCORE_COLUMN, FLAG_COLUMN]
+    )
+    scored = detect_anomalies(pd.concat([stored[columns], df[columns].astype({'Type': str})], ignore_index=True))
+    scores = scored[SCORE_COLUMN].to_numpy()
+    flags = scored[FLAG_COLUMN].to_numpy()
+    old = len(stored)
+    changed = (scores[:old] != stored[SCORE_COLUMN].to_numpy()) | (flags[:old] != stored[FLAG_COLUMN].to_numpy())
+    EquipmentRecord.objects.bulk_update(
+        [
+            EquipmentRecord(id=pk, anomaly_score=score, is_anomaly=flag)
+            for pk, score, flag in zip(stored['id'][changed], scores[:old][changed], flags[:old][changed])
+        ],
+        ['anomaly_score', 'is_anomaly'], batch_size=1000
+    )
+    df = df.assign(**{SCORE_COLUMN: scores[old:], FLAG_COLUMN: flags[old:]})
+    return df, int(flags.sum())
+
+
+def append_csv(dataset, file, filename, user, job=None):
+    """
+    Append the rows of an uploaded CSV file to an existing Dataset. Only the
+    new rows are analyzed; their running aggregates and sketches are merged
+    into the stored ones. The new rows' anomalies are scored against the
+    merged statistics, which reads existing records back only for the IQR
+    method (see rescore_appended).
+    """
+    if job:
+        publish_progress(user, job, filename, 'analyzing')
+    df, report, sketches, summary, aggregates = pool.run(
+        analyze_csv, upload_source(file), csv_compression(filename)
+    )
+    
+    if job:
+        publish_progress(user, job, filename, 'storing')
+    
+    with transaction.atomic():
+        # Concurrent appends to the same dataset merge one after another.
+        # SQLite ignores FOR UPDATE and fails a transaction that reads before
+        # writing when another one writes meanwhile; touching the row first
+        # takes the write lock up front, where waiting for it is safe
+        Dataset.objects.filter(pk=dataset.pk).update(version=F('version'))
+        dataset = Dataset.objects.select_for_update().get(pk=dataset.pk)
+        stored_aggregates = dataset.get_aggregates()
+        stored_sketches = dataset.get_sketches()
+        if dataset.row_count and not (stored_aggregates and stored_sketches):
+            raise ValueError('This dataset predates incremental statistics; upload it again instead')
+        
+        merged_aggregates = merge_group_aggregates(stored_aggregates, aggregates)
+        merged_sketches = merge_sketches([deserialize_sketches(stored_sketches), sketches])
+        anomaly_count = None
+        if FLAG_COLUMN in df.columns:
+            df, anomaly_count = rescore_appended(dataset, df, merged_aggregates)
+        
+        dataset.set_summary(summary_from_aggregates(merged_aggregates, merged_sketches, anomaly_count))
+        dataset.set_sketches(serialize_sketches(merged_sketches))
+        dataset.set_aggregates(merged_aggregates)
+        dataset.set_validation(report)
+        dataset.row_count += len(df)
+        dataset.version += 1
+        # The dataset no longer matches the file it was first uploaded from
+        dataset.content_hash = ''
+        dataset.save()
+        
+        EquipmentRecord.objects.bulk_create(build_records(dataset, df), batch_size=5000)
+    
+    publish(user, DATASET_UPDATED, DatasetSerializer(dataset).data)
+    if job:
+        publish_progress(user, job, filename, 'done', dataset=dataset.id)
+    return dataset
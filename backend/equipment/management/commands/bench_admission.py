@@ -0,0 +1,144 @@
+import itertools
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from urllib.error import HTTPError
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from equipment.management.commands.bench_ingest import generate_csv
+from equipment.management.commands.bench_servers import fetch, free_port, wait_until_ready
+
+MODES = {
+    'off': 'False',
+    'on': 'True',
+}
+
+
+def post_upload(url, token, content):
+    """POST a CSV upload; return the response status, also for 4xx/5xx answers"""
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="bench.csv"\r\n'
+        f'Content-Type: text/csv\r\n\r\n'
+    ).encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+    request = urllib.request.Request(url, data=body, headers={
+        'Authorization': f'Token {token}',
+        'Content-Type': f'multipart/form-data; boundary={boundary}',
+    })
+    try:
+        with urllib.request.urlopen(request, timeout=600) as response:
+            response.read()
+            return response.status
+    except HTTPError as e:
+        e.read()
+        return e.code
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[max(int(len(values) * fraction) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = 'Measure read latency during an upload storm with and without admission control'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=4, help='Users taking part in the upload storm')
+        parser.add_argument('--threads', type=int, default=3, help='Concurrent uploads per storm user')
+        parser.add_argument('--rows', type=int, default=5000, help='Rows per uploaded CSV')
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds per mode')
+        parser.add_argument('--workers', type=int, default=1, help='gunicorn workers')
+        parser.add_argument('--modes', default=','.join(MODES))
+
+    def handle(self, *args, **options):
+        try:
+            modes = {name: MODES[name] for name in options['modes'].split(',')}
+        except KeyError as e:
+            raise CommandError(f'Unknown mode: {e.args[0]}')
+
+        # Uploads are committed by the server, so they belong to throwaway users
+        prefix = f'bench-admission-{uuid.uuid4().hex[:8]}'
+        users = [User.objects.create_user(f'{prefix}-{i}') for i in range(options['users'] + 1)]
+        tokens = [Token.objects.create(user=user).key for user in users]
+        # Each storm thread cycles through files of its own, so none is answered as a duplicate
+        files = [[generate_csv(options['rows'], seed=thread * 10 + i) for i in range(8)]
+                 for thread in range(options['users'] * options['threads'])]
+        self.stdout.write(f'{options["users"]} users x {options["threads"]} concurrent uploads of '
+                          f'{options["rows"]:,} rows, {options["workers"]} gunicorn worker(s), '
+                          f'{options["duration"]:.0f} s per mode')
+        try:
+            for name, enabled in modes.items():
+                self.run_mode(name, enabled, tokens, files, options)
+        finally:
+            for user in users:
+                user.delete()
+
+    def run_mode(self, name, enabled, tokens, files, options):
+        port = free_port()
+        env = dict(os.environ, DEBUG='False', ADMISSION_CONTROL=enabled,
+                   WEB_CONCURRENCY=str(options['workers']))
+        command = [sys.executable, '-m', 'gunicorn', 'config.wsgi:application', '-c', 'gunicorn.conf.py',
+                   '--bind', f'127.0.0.1:{port}', '--log-level', 'error']
+        server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+        base = f'http://127.0.0.1:{port}'
+        reader_token, storm_tokens = tokens[0], tokens[1:]
+        statuses = []
+        reads = []
+        read_errors = []
+        try:
+            wait_until_ready(base + '/api/metrics/', timeout=120)
+            # A dataset for the reader to look at
+            post_upload(base + '/api/datasets/upload/', reader_token, files[0][0])
+            deadline = time.monotonic() + options['duration']
+
+            def storm(index):
+                token = storm_tokens[index // options['threads']]
+                for i in itertools.count():
+                    if time.monotonic() >= deadline:
+                        return
+                    try:
+                        status = post_upload(base + '/api/datasets/upload/', token, files[index][i % 8])
+                    except OSError:
+                        # The server's listen backlog overflowed
+                        status = 'connection error'
+                    statuses.append(status)
+                    if status in (429, 503):
+                        # An impatient client: retry soon, ignoring Retry-After
+                        time.sleep(0.2)
+
+            def read():
+                while time.monotonic() < deadline:
+                    try:
+                        reads.append(fetch(base + '/api/datasets/', reader_token))
+                    except OSError:
+                        read_errors.append(1)
+                    time.sleep(0.05)
+
+            threads = [threading.Thread(target=storm, args=(i,)) for i in range(len(files))]
+            threads.append(threading.Thread(target=read))
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            server.terminate()
+            server.wait()
+
+        counts = {status: statuses.count(status) for status in sorted(set(statuses), key=str)}
+        if not reads:
+            raise CommandError(f'No read completed with admission control {name}')
+        self.stdout.write(
+            f'{name:>4}: reads p50 {statistics.median(reads) * 1000:7.0f} ms  '
+            f'p95 {percentile(reads, 0.95) * 1000:7.0f} ms  max {max(reads) * 1000:7.0f} ms  '
+            f'({len(reads)} reads, {len(read_errors)} failed)'
+        )
+        self.stdout.write(f'{"":>6}uploads by status: {counts}')
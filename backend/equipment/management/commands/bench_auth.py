@@ -0,0 +1,61 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from equipment.authentication import CachedTokenAuthentication, token_cache
+
+
+class Command(BaseCommand):
+    help = 'Measure database queries and time spent authenticating API requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        user, _ = User.objects.get_or_create(username='bench-auth')
+        token, _ = Token.objects.get_or_create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        token_cache.clear()
+
+        # GET /api/metrics/ does no database work of its own
+        with CaptureQueriesContext(connection) as queries:
+            client.get('/api/metrics/')
+        self.stdout.write(f'request, cache miss:  {len(queries)} queries')
+        with CaptureQueriesContext(connection) as queries:
+            client.get('/api/metrics/')
+        self.stdout.write(f'request, cache hit:   {len(queries)} queries')
+        hit_queries = len(queries)
+
+        for name, backend in (('TokenAuthentication', TokenAuthentication()),
+                              ('CachedTokenAuthentication', CachedTokenAuthentication())):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                for _ in range(count):
+                    backend.authenticate_credentials(token.key)
+                elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'{name:26} {len(queries) / count:.3f} queries/request  '
+                f'{elapsed / count * 1e6:8.1f} us/request'
+            )
+
+        client.post('/api/logout/')
+        response = client.get('/api/metrics/')
+        if response.status_code != 401:
+            raise CommandError('Token still accepted after logout')
+        self.stdout.write('logout invalidates the cached token')
+        user.delete()
+
+        # A shared revocation marker is read from the database on every hit
+        expected = 1 if settings.TOKEN_REVOCATION_SHARED else 0
+        if hit_queries > expected:
+            raise CommandError(f'Cache hit still ran {hit_queries} queries')
+        self.stdout.write(self.style.SUCCESS('OK'))
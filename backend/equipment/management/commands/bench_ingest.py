@@ -0,0 +1,90 @@
+import io
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from equipment.utils import parse_csv_file, read_csv_file, run_ingest_stages
+
+EQUIPMENT_TYPES = ['Pump', 'Compressor', 'Valve', 'HeatExchanger', 'Reactor', 'Condenser']
+
+
+def generate_csv(rows, seed=0, invalid=0.0):
+    """
+    Generate a synthetic equipment CSV with a small fraction of outliers and
+    optionally a fraction of rows with an unparseable flowrate
+    """
+    rng = np.random.default_rng(seed)
+    types = rng.choice(EQUIPMENT_TYPES, size=rows)
+    df = pd.DataFrame({
+        'Equipment Name': [f'{t}-{i}' for i, t in enumerate(types)],
+        'Type': types,
+        'Flowrate': rng.normal(120, 20, rows).round(2),
+        'Pressure': rng.normal(6, 1, rows).round(2),
+        'Temperature': rng.normal(110, 10, rows).round(2),
+    })
+    outliers = rng.random(rows) < 0.001
+    df.loc[outliers, 'Pressure'] *= 4
+    if invalid:
+        df['Flowrate'] = df['Flowrate'].astype(object)
+        df.loc[rng.random(rows) < invalid, 'Flowrate'] = 'n/a'
+    return df.to_csv(index=False).encode()
+
+
+def best_of(repeat, func):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), statistics.median(timings), result
+
+
+class Command(BaseCommand):
+    help = 'Benchmark CSV parsing against validation and the configured ingest stages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--invalid', type=float, default=0.0,
+                            help='Fraction of rows generated with an unparseable flowrate')
+        parser.add_argument('--max-overhead', type=float, default=10.0,
+                            help='Fail if the stages add more than this percentage to parse time')
+        parser.add_argument('--max-validation-overhead', type=float, default=35.0,
+                            help='Fail if validated parsing takes this many percent longer than '
+                                 'reading the file and dropping incomplete rows')
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        self.stdout.write(f'Generating {rows:,} rows...')
+        content = generate_csv(rows, invalid=options['invalid'])
+
+        # Reading and dropping incomplete rows is what parsing did before validation
+        read_best, read_median, _ = best_of(repeat, lambda: read_csv_file(io.BytesIO(content)).dropna())
+        parse_best, parse_median, (df, report) = best_of(repeat, lambda: parse_csv_file(io.BytesIO(content)))
+        stage_best, stage_median, staged = best_of(repeat, lambda: run_ingest_stages(df))
+        validation_overhead = (parse_best - read_best) / read_best * 100
+        overhead = stage_best / parse_best * 100
+
+        self.stdout.write(f'read + dropna:     best {read_best:.3f}s  median {read_median:.3f}s')
+        self.stdout.write(f'parse_csv_file:    best {parse_best:.3f}s  median {parse_median:.3f}s')
+        self.stdout.write(f'ingest stages:     best {stage_best:.3f}s  median {stage_median:.3f}s')
+        self.stdout.write(f'dropped rows:      {report["rows_dropped"]:,}')
+        if 'Is Anomaly' in staged.columns:
+            self.stdout.write(f'flagged records:   {int(staged["Is Anomaly"].sum()):,}')
+        self.stdout.write(f'validation:        {validation_overhead:+.1f}% over read + dropna')
+        self.stdout.write(f'overhead:          {overhead:.1f}% of parse time')
+
+        if validation_overhead > options['max_validation_overhead']:
+            raise CommandError(
+                f'Validation adds {validation_overhead:.1f}% '
+                f'(limit {options["max_validation_overhead"]:.1f}%)'
+            )
+        if overhead > options['max_overhead']:
+            raise CommandError(
+                f'Ingest stages add {overhead:.1f}% (limit {options["max_overhead"]:.1f}%)'
+            )
+        self.stdout.write(self.style.SUCCESS('OK'))
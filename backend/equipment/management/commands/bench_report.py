@@ -0,0 +1,62 @@
+import io
+import time
+import tracemalloc
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from equipment.ingest import ingest_csv
+from equipment.management.commands.bench_ingest import generate_csv
+from equipment.reports import _chart_cache, generate_pdf_report
+
+
+class Command(BaseCommand):
+    help = 'Measure PDF report build time and peak memory on a synthetic dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000)
+        parser.add_argument('--max-records', type=int, default=None,
+                            help='Cap the record tables as PDF_REPORT_MAX_RECORDS does; all records by default')
+        parser.add_argument('--max-seconds', type=float, default=60.0)
+        parser.add_argument('--max-memory-mb', type=float, default=64.0)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        self.stdout.write(f'Generating {rows:,} rows...')
+        upload = SimpleUploadedFile('bench.csv', generate_csv(rows), content_type='text/csv')
+
+        overrides = {'CPU_POOL_WORKERS': 0, 'PDF_REPORT_MAX_RECORDS': options['max_records']}
+
+        # The dataset only exists inside this transaction and is rolled back
+        with override_settings(**overrides), transaction.atomic():
+            dataset = ingest_csv(upload, 'bench.csv', None)
+            _chart_cache.clear()
+
+            start = time.perf_counter()
+            size = len(generate_pdf_report(dataset, io.BytesIO()).getvalue())
+            cold = time.perf_counter() - start
+
+            start = time.perf_counter()
+            generate_pdf_report(dataset, io.BytesIO())
+            warm = time.perf_counter() - start
+
+            tracemalloc.start()
+            generate_pdf_report(dataset, io.BytesIO())
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            transaction.set_rollback(True)
+
+        peak_mb = peak / 1024 / 1024
+        self.stdout.write(f'report size:        {size / 1024 / 1024:.1f} MB')
+        self.stdout.write(f'build, cold charts: {cold:.2f}s')
+        self.stdout.write(f'build, warm charts: {warm:.2f}s')
+        self.stdout.write(f'peak Python memory: {peak_mb:.1f} MB')
+
+        if warm > options['max_seconds']:
+            raise CommandError(f'Report took {warm:.1f}s (limit {options["max_seconds"]:.0f}s)')
+        if peak_mb > options['max_memory_mb']:
+            raise CommandError(f'Report peaked at {peak_mb:.1f} MB (limit {options["max_memory_mb"]:.0f} MB)')
+        self.stdout.write(self.style.SUCCESS('OK'))
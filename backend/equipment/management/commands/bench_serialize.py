@@ -0,0 +1,63 @@
+import json
+import time
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+
+from equipment import renderers
+from equipment.ingest import ingest_csv
+from equipment.management.commands.bench_ingest import generate_csv
+from equipment.renderers import FastJSONRenderer
+from equipment.serializers import EquipmentRecordSerializer, record_rows, record_values
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = 'Compare record serialization and JSON rendering: ModelSerializer and json vs. values_list() and orjson'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', default='10000,100000,1000000', help='Comma separated dataset sizes')
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            self.stdout.write('orjson is not installed; FastJSONRenderer falls back to the stdlib encoder')
+        self.stdout.write(f'{"rows":>9}  {"serializer":>10}  {"values":>8}  {"json":>8}  {"orjson":>8}  '
+                          f'{"before":>8}  {"after":>8}  speedup')
+        for rows in [int(size) for size in options['rows'].split(',')]:
+            self.measure(rows)
+
+    def measure(self, rows):
+        upload = SimpleUploadedFile('bench.csv', generate_csv(rows), content_type='text/csv')
+
+        # The dataset only exists inside this transaction and is rolled back
+        with override_settings(CPU_POOL_WORKERS=0), transaction.atomic():
+            dataset = ingest_csv(upload, 'bench.csv', None)
+            records = dataset.records.all()
+
+            slow, serialize = timed(lambda: EquipmentRecordSerializer(
+                records.select_related('equipment_name', 'equipment_type'), many=True
+            ).data)
+            slow_json, render = timed(lambda: JSONRenderer().render(slow))
+            del slow
+
+            fast, read = timed(lambda: record_values(record_rows(records)))
+            fast_json, fast_render = timed(lambda: FastJSONRenderer().render(fast))
+            del fast
+
+            transaction.set_rollback(True)
+
+        if slow_json != fast_json and json.loads(slow_json) != json.loads(fast_json):
+            raise CommandError(f'The fast path rendered different records at {rows:,} rows')
+        before, after = serialize + render, read + fast_render
+        self.stdout.write(
+            f'{rows:>9,}  {serialize * 1000:>8.0f}ms  {read * 1000:>6.0f}ms  {render * 1000:>6.0f}ms  '
+            f'{fast_render * 1000:>6.0f}ms  {before * 1000:>6.0f}ms  {after * 1000:>6.0f}ms  {before / after:6.1f}x'
+        )
@@ -0,0 +1,110 @@
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from equipment.models import Dataset
+
+SERVERS = {
+    'wsgi': ['config.wsgi:application'],
+    'asgi': ['config.asgi:application', '-k', 'uvicorn.workers.UvicornWorker'],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1)
+            return
+        except URLError as e:
+            if getattr(e, 'code', None):
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise CommandError(f'Server at {url} did not start')
+
+
+def fetch(url, token):
+    request = urllib.request.Request(url, headers={'Authorization': f'Token {token}'})
+    start = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=60) as response:
+        while response.read(65536):
+            pass
+    return time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent-request throughput of the WSGI and ASGI servers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dataset', type=int, help='Dataset to export (defaults to the latest)')
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--servers', default='wsgi,asgi')
+        parser.add_argument('--endpoints', default='list,statistics,summary,export',
+                            help='Comma separated mix of endpoints to request round-robin')
+
+    def handle(self, *args, **options):
+        datasets = Dataset.objects.exclude(user=None)
+        dataset = (datasets.filter(pk=options['dataset']).first() if options['dataset']
+                   else datasets.order_by('-id').first())
+        if dataset is None:
+            raise CommandError('Upload a dataset before running the benchmark')
+        token, _ = Token.objects.get_or_create(user=dataset.user)
+
+        endpoints = {
+            'list': '/api/datasets/',
+            'statistics': '/api/datasets/statistics/',
+            'summary': f'/api/datasets/{dataset.id}/summary/',
+            'export': f'/api/datasets/{dataset.id}/export/',
+        }
+        try:
+            paths = [endpoints[name] for name in options['endpoints'].split(',')]
+        except KeyError as e:
+            raise CommandError(f'Unknown endpoint: {e.args[0]}')
+        self.stdout.write(f'{options["requests"]} requests, concurrency {options["concurrency"]}, '
+                          f'{options["workers"]} workers, dataset {dataset.id} ({dataset.row_count:,} rows)')
+
+        for name in options['servers'].split(','):
+            port = free_port()
+            env = dict(os.environ, ASYNC_VIEWS=str(name == 'asgi'), DEBUG='False')
+            command = [sys.executable, '-m', 'gunicorn', *SERVERS[name],
+                       '--bind', f'127.0.0.1:{port}', '--workers', str(options['workers']),
+                       '--log-level', 'warning']
+            server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+            try:
+                base = f'http://127.0.0.1:{port}'
+                wait_until_ready(base + paths[0])
+                urls = [base + paths[i % len(paths)] for i in range(options['requests'])]
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(options['concurrency']) as pool:
+                    latencies = sorted(pool.map(lambda url: fetch(url, token.key), urls))
+                elapsed = time.perf_counter() - start
+            finally:
+                server.terminate()
+                server.wait()
+
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            self.stdout.write(
+                f'{name}: {len(urls) / elapsed:8.1f} req/s  '
+                f'p50 {statistics.median(latencies) * 1000:7.1f} ms  p95 {p95 * 1000:7.1f} ms'
+            )
@@ -0,0 +1,155 @@
+import itertools
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError
+from django.db.models import Count
+
+from equipment.ingest import append_csv, ingest_csv
+from equipment.management.commands.bench_ingest import generate_csv
+from equipment.models import Dataset, EquipmentRecord
+
+PROFILES = {
+    'default': 'False',
+    'tuned': 'True',
+}
+
+
+def read_once():
+    """One request's worth of reads: the dataset list, a record page and a grouped count"""
+    latest = list(Dataset.objects.order_by('-id').values_list('id', 'filename', 'row_count')[:5])
+    if not latest:
+        return
+    dataset_id = random.choice(latest)[0]
+    list(EquipmentRecord.objects.filter(dataset_id=dataset_id)
+         .values_list('equipment_name__name', 'flowrate', 'pressure', 'temperature')[:1000])
+    list(EquipmentRecord.objects.filter(dataset_id=dataset_id)
+         .values('equipment_type').annotate(count=Count('id')))
+
+
+def upload_once(user, content):
+    return ingest_csv(SimpleUploadedFile('bench.csv', content), 'bench.csv', user)
+
+
+def append_once(content):
+    dataset = Dataset.objects.get(user__username='bench-sqlite-shared')
+    append_csv(dataset, SimpleUploadedFile('bench.csv', content), 'bench.csv', dataset.user)
+
+
+def run_worker(role, index, rows, start_at, duration):
+    """Repeat reads, or uploads and appends, between start_at and start_at + duration"""
+    if role == 'seed':
+        # Every writer starts with a full set of retained datasets to read and delete
+        for writer in range(index):
+            user = User.objects.create_user(f'bench-sqlite-{writer}')
+            for _ in range(5):
+                upload_once(user, generate_csv(rows, seed=writer))
+        # Writers also append to one dataset, whose statistics they update in turn
+        upload_once(User.objects.create_user('bench-sqlite-shared'), generate_csv(rows))
+        return {'role': role, 'latencies': [], 'locked': 0}
+    if role == 'writer':
+        user = User.objects.get(username=f'bench-sqlite-{index}')
+        content = generate_csv(rows, seed=index)
+        operations = itertools.cycle([lambda: upload_once(user, content), lambda: append_once(content)])
+        operation = lambda: next(operations)()
+    else:
+        operation = read_once
+
+    latencies = []
+    locked = 0
+    time.sleep(max(start_at - time.time(), 0))
+    while time.time() < start_at + duration:
+        start = time.perf_counter()
+        try:
+            operation()
+        except OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            locked += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+    return {'role': role, 'latencies': latencies, 'locked': locked}
+
+
+class Command(BaseCommand):
+    help = 'Compare multi-process read/write throughput on SQLite with and without the PRAGMA profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds per profile')
+        parser.add_argument('--rows', type=int, default=2000, help='Rows per upload')
+        parser.add_argument('--profiles', default=','.join(PROFILES))
+        parser.add_argument('--dir', default=settings.BASE_DIR,
+                            help='Directory of the scratch database files (same disk as db.sqlite3 by default)')
+        # Internal: run as one reader or writer process of a benchmark
+        parser.add_argument('--worker', choices=['seed', 'reader', 'writer'], help='==SUPPRESS==')
+        parser.add_argument('--index', type=int, default=0, help='==SUPPRESS==')
+        parser.add_argument('--start-at', type=float, default=0, help='==SUPPRESS==')
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            result = run_worker(options['worker'], options['index'], options['rows'],
+                                options['start_at'], options['duration'])
+            self.stdout.write(json.dumps(result))
+            return
+
+        try:
+            profiles = {name: PROFILES[name] for name in options['profiles'].split(',')}
+        except KeyError as e:
+            raise CommandError(f'Unknown profile: {e.args[0]}')
+        self.stdout.write(f'{options["readers"]} reader and {options["writers"]} writer processes, '
+                          f'{options["duration"]:.0f} s per profile, uploads of {options["rows"]:,} rows')
+        for name, tuning in profiles.items():
+            with tempfile.TemporaryDirectory(dir=options['dir']) as directory:
+                self.run_profile(name, tuning, os.path.join(directory, 'bench.sqlite3'), options)
+
+    def run_profile(self, name, tuning, path, options):
+        # A fresh database file per profile; WAL mode would persist in the file
+        env = dict(os.environ, DATABASE_URL=f'sqlite:///{path}', SQLITE_TUNING=tuning,
+                   CPU_POOL_WORKERS='0')
+        manage = [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py')]
+        subprocess.run([*manage, 'migrate', '-v0'], env=env, check=True)
+        worker = [*manage, 'bench_sqlite', '--rows', str(options['rows']),
+                  '--duration', str(options['duration'])]
+        subprocess.run([*worker, '--worker', 'seed', '--index', str(options['writers'])],
+                       env=env, check=True, stdout=subprocess.DEVNULL)
+
+        # Processes start their loops together, once all of them have set up Django
+        start_at = time.time() + 5
+        roles = ['writer'] * options['writers'] + ['reader'] * options['readers']
+        workers = [
+            subprocess.Popen([*worker, '--worker', role, '--index', str(index), '--start-at', str(start_at)],
+                             env=env, stdout=subprocess.PIPE, text=True)
+            for index, role in enumerate(roles)
+        ]
+        results = []
+        for worker in workers:
+            output, _ = worker.communicate()
+            if worker.returncode:
+                raise CommandError(f'A benchmark process failed under the {name} profile')
+            results.append(json.loads(output.strip().splitlines()[-1]))
+
+        self.stdout.write(f'{name}:')
+        for role in ('writer', 'reader'):
+            latencies = sorted(t for r in results if r['role'] == role for t in r['latencies'])
+            locked = sum(r['locked'] for r in results if r['role'] == role)
+            if not latencies:
+                self.stdout.write(f'  {role}s: no operation completed, {locked} "database is locked" errors')
+                continue
+            p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+            self.stdout.write(
+                f'  {role}s: {len(latencies) / options["duration"]:8.1f} ops/s  '
+                f'p50 {statistics.median(latencies) * 1000:7.1f} ms  p95 {p95 * 1000:7.1f} ms  '
+                f'{locked} "database is locked" errors'
+            )
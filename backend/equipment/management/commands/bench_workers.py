@@ -0,0 +1,158 @@
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from equipment.management.commands.bench_ingest import generate_csv
+from equipment.management.commands.bench_servers import free_port, wait_until_ready
+
+# Server setups compared: without gunicorn.conf.py (every worker imports the
+# application after forking and starts its pool at load), with it but
+# without preloading, and with it as shipped
+MODES = {
+    'baseline': {'config': None, 'GUNICORN_PRELOAD': 'False'},
+    'no-preload': {'config': 'gunicorn.conf.py', 'GUNICORN_PRELOAD': 'False'},
+    'preload': {'config': 'gunicorn.conf.py', 'GUNICORN_PRELOAD': 'True'},
+}
+
+
+def children(pid):
+    """Process ids whose parent is pid"""
+    found = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces; fields resume after ')'
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            found.append(int(entry))
+    return found
+
+
+def descendants(pid):
+    found = []
+    for child in children(pid):
+        found += [child, *descendants(child)]
+    return found
+
+
+def memory(pid):
+    """USS and PSS of a process in MB, from /proc/<pid>/smaps_rollup"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return values['Private_Clean'] + values['Private_Dirty'], values['Pss']
+
+
+def snapshot(master):
+    """Per-worker USS/PSS and the PSS of the pool processes and of the whole server"""
+    workers = [memory(pid) for pid in children(master)]
+    pool = [memory(pid) for worker in children(master) for pid in descendants(worker)]
+    return {
+        'uss': statistics.mean(uss for uss, _ in workers),
+        'pss': statistics.mean(pss for _, pss in workers),
+        'pool_pss': sum(pss for _, pss in pool),
+        'total_pss': memory(master)[1] + sum(pss for _, pss in workers) + sum(pss for _, pss in pool),
+    }
+
+
+def upload(url, token, content):
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="bench.csv"\r\n'
+        f'Content-Type: text/csv\r\n\r\n'
+    ).encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+    request = urllib.request.Request(url, data=body, headers={
+        'Authorization': f'Token {token}',
+        'Content-Type': f'multipart/form-data; boundary={boundary}',
+    })
+    start = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=600) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = 'Compare gunicorn worker memory, boot time and first-upload latency with and without preloading'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--rows', type=int, default=10_000, help='Rows per uploaded CSV')
+        parser.add_argument('--uploads', type=int, default=3)
+        parser.add_argument('--modes', default=','.join(MODES))
+
+    def handle(self, *args, **options):
+        if not os.path.exists('/proc/self/smaps_rollup'):
+            raise CommandError('Reading USS/PSS needs Linux /proc/<pid>/smaps_rollup')
+        try:
+            modes = {name: MODES[name] for name in options['modes'].split(',')}
+        except KeyError as e:
+            raise CommandError(f'Unknown mode: {e.args[0]}')
+
+        # Uploads are committed by the server, so they belong to a throwaway user
+        user = User.objects.create_user(f'bench-workers-{uuid.uuid4().hex[:8]}')
+        token = Token.objects.create(user=user)
+        self.stdout.write(f'{options["workers"]} workers, CPU pool of {settings.CPU_POOL_WORKERS} '
+                          f'per worker, {options["uploads"]} uploads of {options["rows"]:,} rows')
+        try:
+            with tempfile.NamedTemporaryFile('w', suffix='.py') as empty:
+                for seed, (name, mode) in enumerate(modes.items()):
+                    self.run_mode(name, mode, empty.name, token.key, options, seed)
+        finally:
+            user.delete()
+
+    def run_mode(self, name, mode, empty_config, token, options, seed):
+        port = free_port()
+        env = {key: value for key, value in os.environ.items() if key != 'CPU_POOL_WARMUP_ON_LOAD'}
+        env.update(DEBUG='False', GUNICORN_PRELOAD=mode['GUNICORN_PRELOAD'])
+        command = [sys.executable, '-m', 'gunicorn', 'config.wsgi:application',
+                   '-c', mode['config'] or empty_config, '--bind', f'127.0.0.1:{port}',
+                   '--workers', str(options['workers']), '--worker-class', 'gthread',
+                   '--log-level', 'warning']
+        # Every upload is a new file, so none is answered as a duplicate
+        files = [generate_csv(options['rows'], seed=seed * 100 + i) for i in range(options['uploads'])]
+
+        start = time.perf_counter()
+        server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+        try:
+            base = f'http://127.0.0.1:{port}'
+            wait_until_ready(base + '/api/metrics/', timeout=120)
+            ready = time.perf_counter() - start
+            # Let every worker finish starting up before measuring memory
+            while len(children(server.pid)) < options['workers']:
+                time.sleep(0.1)
+            time.sleep(2)
+            idle = snapshot(server.pid)
+
+            latencies = [upload(base + '/api/datasets/upload/', token, content) for content in files]
+            loaded = snapshot(server.pid)
+        finally:
+            server.terminate()
+            server.wait()
+
+        warm = statistics.median(latencies[1:]) if len(latencies) > 1 else float('nan')
+        self.stdout.write(
+            f'{name:>10}: ready {ready:5.2f} s  first upload {latencies[0] * 1000:7.0f} ms  '
+            f'later {warm * 1000:7.0f} ms'
+        )
+        for label, values in (('idle', idle), ('after uploads', loaded)):
+            self.stdout.write(
+                f'{"":>12}{label:>14}: worker USS {values["uss"]:6.1f} MB  PSS {values["pss"]:6.1f} MB  '
+                f'pool PSS {values["pool_pss"]:6.1f} MB  server PSS {values["total_pss"]:6.1f} MB'
+            )
@@ -0,0 +1,45 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from equipment import sqlite
+from equipment.ingest import DATASETS_PER_USER, prune_datasets
+from equipment.models import Dataset
+
+
+class Command(BaseCommand):
+    help = ('List datasets uploaded before datasets belonged to users, and assign them to a user '
+            'or delete them; no user can see them and per-user retention never removes them')
+
+    def add_arguments(self, parser):
+        action = parser.add_mutually_exclusive_group()
+        action.add_argument('--assign-to', metavar='USERNAME',
+                            help=f'Give them to this user, who then keeps the newest {DATASETS_PER_USER}')
+        action.add_argument('--delete', action='store_true', help='Delete them with their records')
+
+    def handle(self, *args, **options):
+        legacy = Dataset.objects.filter(user=None)
+        rows = list(legacy.order_by('id').values_list('id', 'filename', 'row_count'))
+        if not rows:
+            self.stdout.write('No datasets without a user')
+            return
+        for pk, filename, row_count in rows:
+            self.stdout.write(f'#{pk} {filename} ({row_count:,} records)')
+
+        if options['assign_to']:
+            try:
+                user = User.objects.get(username=options['assign_to'])
+            except User.DoesNotExist:
+                raise CommandError(f'No user named {options["assign_to"]}')
+            with transaction.atomic():
+                legacy.update(user=user)
+                pruned = prune_datasets(user, DATASETS_PER_USER)
+            self.stdout.write(f'Assigned {len(rows)} dataset(s) to {user.username}; '
+                              f'{pruned} beyond the newest {DATASETS_PER_USER} deleted')
+        elif options['delete']:
+            deleted = legacy.delete()[1].get(Dataset._meta.label, 0)
+            sqlite.optimize()
+            self.stdout.write(f'Deleted {deleted} dataset(s)')
+        else:
+            self.stdout.write(f'{len(rows)} dataset(s) without a user; '
+                              'pass --assign-to USERNAME or --delete')
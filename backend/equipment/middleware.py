@@ -0,0 +1,199 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig
+from django.http import HttpResponseBadRequest
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
+
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .compression import (
+    compress_async_sequence, new_decompressor, supported_encodings, zstd_compress,
+    zstd_compress_sequence
+)
+
+
+class DecompressingStream:
+    """File-like wrapper that decompresses a request body as it is read"""
+
+    def __init__(self, stream, decompressor, limit):
+        self.stream = stream
+        self.decompressor = decompressor
+        self.limit = limit
+        self.buffer = b''
+        self.produced = 0
+        self.eof = False
+
+    def _fill(self, size):
+        while not self.eof and (size < 0 or len(self.buffer) < size):
+            raw = self.stream.read(16384)
+            if raw:
+                data = self.decompressor.decompress(raw)
+            else:
+                data = self.decompressor.flush()
+                self.eof = True
+            self.produced += len(data)
+            if self.produced > self.limit:
+                raise RequestDataTooBig('Decompressed request body is too large.')
+            self.buffer += data
+
+    def read(self, size=-1):
+        if size is None:
+            size = -1
+        self._fill(size)
+        if size < 0:
+            data, self.buffer = self.buffer, b''
+        else:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def readline(self, size=-1):
+        while b'\n' not in self.buffer and not self.eof:
+            self._fill(len(self.buffer) + 16384)
+        end = self.buffer.find(b'\n') + 1 or len(self.buffer)
+        if size is not None and 0 <= size < end:
+            end = size
+        data, self.buffer = self.buffer[:end], self.buffer[end:]
+        return data
+
+    def close(self):
+        self.stream.close()
+
+
+class RequestDecompressionMiddleware(MiddlewareMixin):
+    """
+    Accept request bodies sent with Content-Encoding gzip (or zstd when
+    available). The body is decompressed lazily as the view reads it.
+
+    CONTENT_LENGTH is replaced by the most the body may decompress to, as
+    Django and DRF take a missing length for an empty body. Multipart
+    uploads are then always spooled to a temporary file, and other bodies,
+    which are read into memory whole, stop at DATA_UPLOAD_MAX_MEMORY_SIZE.
+    """
+
+    def process_request(self, request):
+        encoding = request.META.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if not encoding or encoding == 'identity':
+            return None
+
+        decompressor = new_decompressor(encoding)
+        if decompressor is None:
+            return HttpResponseBadRequest(f'Unsupported Content-Encoding: {encoding}')
+
+        limit = settings.MAX_DECOMPRESSED_REQUEST_SIZE
+        if not request.content_type.startswith('multipart/') and settings.DATA_UPLOAD_MAX_MEMORY_SIZE is not None:
+            limit = min(limit, settings.DATA_UPLOAD_MAX_MEMORY_SIZE)
+        request._stream = DecompressingStream(request._stream, decompressor, limit)
+        request.META['CONTENT_LENGTH'] = str(limit)
+        del request.META['HTTP_CONTENT_ENCODING']
+        return None
+
+
+def negotiate_encoding(accept_encoding):
+    """Pick the best supported encoding from an Accept-Encoding header"""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    for encoding in supported_encodings():
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+class ResponseCompressionMiddleware(MiddlewareMixin):
+    """
+    Compress large API responses (JSON, CSV exports and PDF reports) with the
+    best encoding the client accepts. Responses below
+    RESPONSE_COMPRESSION_MIN_SIZE are sent as they are.
+    """
+
+    max_random_bytes = 100
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in settings.RESPONSE_COMPRESSION_TYPES:
+            return response
+
+        min_size = settings.RESPONSE_COMPRESSION_MIN_SIZE
+        if response.streaming:
+            length = response.get('Content-Length')
+            if length is not None and int(length) < min_size:
+                return response
+        elif len(response.content) < min_size:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compress_async_sequence(
+                    response.streaming_content, encoding
+                )
+            elif encoding == 'zstd':
+                response.streaming_content = zstd_compress_sequence(response.streaming_content)
+            else:
+                response.streaming_content = compress_sequence(
+                    response.streaming_content, max_random_bytes=self.max_random_bytes
+                )
+            del response.headers['Content-Length']
+        else:
+            if encoding == 'zstd':
+                compressed = zstd_compress(response.content)
+            else:
+                compressed = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(response.content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that can run in an async middleware chain. The stock
+    middleware is sync only, which makes Django run every request under
+    ASGI through a single thread.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='sketches',
+            field=models.TextField(default='{}'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0003_dataset_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmentrecord',
+            name='anomaly_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='equipmentrecord',
+            name='is_anomaly',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentrecord',
+            index=models.Index(fields=['dataset', 'is_anomaly', '-anomaly_score'], name='equipment_e_dataset_937d07_idx'),
+        ),
+    ]
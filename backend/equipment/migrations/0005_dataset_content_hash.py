@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0004_equipmentrecord_anomalies'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+    ]
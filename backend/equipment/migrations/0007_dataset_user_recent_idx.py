@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0006_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dataset',
+            index=models.Index(fields=['user', '-id'], name='dataset_user_recent_idx'),
+        ),
+    ]
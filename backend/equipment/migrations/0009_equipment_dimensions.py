@@ -0,0 +1,110 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:30
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def encode_records(apps, schema_editor):
+    """Copy the distinct type and name strings into the dimension tables and link the records"""
+    EquipmentRecord = apps.get_model('equipment', 'EquipmentRecord')
+    for field, model_name in (('equipment_type', 'EquipmentType'), ('equipment_name', 'EquipmentName')):
+        Dimension = apps.get_model('equipment', model_name)
+        names = EquipmentRecord.objects.values_list(field, flat=True).distinct()
+        Dimension.objects.bulk_create([Dimension(name=name) for name in names.iterator()], batch_size=500)
+        EquipmentRecord.objects.update(**{
+            f'{field}_key': Subquery(
+                Dimension.objects.filter(name=OuterRef(field)).values('id')[:1]
+            )
+        })
+
+
+def decode_records(apps, schema_editor):
+    EquipmentRecord = apps.get_model('equipment', 'EquipmentRecord')
+    for field, model_name in (('equipment_type', 'EquipmentType'), ('equipment_name', 'EquipmentName')):
+        Dimension = apps.get_model('equipment', model_name)
+        EquipmentRecord.objects.update(**{
+            field: Subquery(
+                Dimension.objects.filter(id=OuterRef(f'{field}_key')).values('name')[:1]
+            )
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0008_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentName',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='EquipmentType',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='equipmentrecord',
+            name='equipment_name_key',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='equipment.equipmentname'),
+        ),
+        migrations.AddField(
+            model_name='equipmentrecord',
+            name='equipment_type_key',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='equipment.equipmenttype'),
+        ),
+        # Nullable so that reversing on a populated table can refill them
+        migrations.AlterField(
+            model_name='equipmentrecord',
+            name='equipment_name',
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='equipmentrecord',
+            name='equipment_type',
+            field=models.CharField(max_length=100, null=True),
+        ),
+        migrations.RunPython(encode_records, decode_records),
+        migrations.RemoveField(
+            model_name='equipmentrecord',
+            name='equipment_name',
+        ),
+        migrations.RemoveField(
+            model_name='equipmentrecord',
+            name='equipment_type',
+        ),
+        migrations.RenameField(
+            model_name='equipmentrecord',
+            old_name='equipment_name_key',
+            new_name='equipment_name',
+        ),
+        migrations.RenameField(
+            model_name='equipmentrecord',
+            old_name='equipment_type_key',
+            new_name='equipment_type',
+        ),
+        migrations.AlterField(
+            model_name='equipmentrecord',
+            name='equipment_name',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='records', to='equipment.equipmentname'),
+        ),
+        migrations.AlterField(
+            model_name='equipmentrecord',
+            name='equipment_type',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='records', to='equipment.equipmenttype'),
+        ),
+    ]
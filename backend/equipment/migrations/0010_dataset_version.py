@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0009_equipment_dimensions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
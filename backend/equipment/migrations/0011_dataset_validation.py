@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0010_dataset_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='validation',
+            field=models.TextField(default='{}'),
+        ),
+    ]
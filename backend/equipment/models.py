@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 import json
+import uuid
 
 class Dataset(models.Model):
     """Store uploaded datasets with metadata"""
@@ -9,9 +10,22 @@ class Dataset(models.Model):
     upload_date = models.DateTimeField(auto_now_add=True)
     row_count = models.IntegerField()
     summary_stats = models.TextField()  # JSON string
+    sketches = models.TextField(default='{}')  # JSON string of serialized sketches
+    aggregates = models.TextField(default='{}')  # JSON string of per-group running aggregates
+    validation = models.TextField(default='{}')  # JSON string of the last upload's validation report
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    version = models.PositiveIntegerField(default=1)  # bumped whenever rows are appended
+    
+    # Grow with the number of distinct equipment names; only appends and
+    # PDF reports read them whole, other queries defer them
+    BLOB_FIELDS = ('sketches', 'aggregates')
     
     class Meta:
         ordering = ['-upload_date']
+        indexes = [
+            # Every dataset query is scoped to one user, newest first
+            models.Index(fields=['user', '-id'], name='dataset_user_recent_idx'),
+        ]
     
     def get_summary(self):
         """Parse JSON summary stats"""
@@ -21,18 +35,125 @@ class Dataset(models.Model):
         """Set summary stats from dict"""
         self.summary_stats = json.dumps(data)
     
+    def get_sketches(self):
+        """Parse JSON sketches"""
+        return json.loads(self.sketches or '{}')
+    
+    def set_sketches(self, data):
+        """Set sketches from dict"""
+        self.sketches = json.dumps(data)
+    
+    def get_aggregates(self):
+        """Parse JSON per-group aggregates"""
+        return json.loads(self.aggregates or '{}')
+    
+    def set_aggregates(self, data):
+        """Set per-group aggregates from dict"""
+        self.aggregates = json.dumps(data)
+    
+    def get_validation(self):
+        """Parse JSON validation report"""
+        return json.loads(self.validation or '{}')
+    
+    def set_validation(self, data):
+        """Set validation report from dict"""
+        self.validation = json.dumps(data)
+    
+    def cache_key(self, *parts):
+        """Build a cache key that changes whenever this dataset is replaced or appended to"""
+        stamp = int(self.upload_date.timestamp()) if self.upload_date else 0
+        return ':'.join(['dataset', str(self.pk), str(stamp), f'v{self.version}'] + [str(p) for p in parts])
+    
     def __str__(self):
         return f"{self.filename} - {self.upload_date.strftime('%Y-%m-%d %H:%M')}"
 
 
+class Dimension(models.Model):
+    """Distinct string value referenced from records by an integer key"""
+    
+    class Meta:
+        abstract = True
+    
+    @classmethod
+    def get_ids(cls, names, batch_size=500):
+        """Map each name to its key, inserting the names not stored yet"""
+        ids = {}
+        names = list(names)
+        for start in range(0, len(names), batch_size):
+            batch = names[start:start + batch_size]
+            found = dict(cls.objects.filter(name__in=batch).values_list('name', 'id'))
+            missing = [name for name in batch if name not in found]
+            if missing:
+                # Another upload may insert the same names concurrently
+                cls.objects.bulk_create([cls(name=name) for name in missing], ignore_conflicts=True)
+                found.update(cls.objects.filter(name__in=missing).values_list('name', 'id'))
+            ids.update(found)
+        return ids
+    
+    def __str__(self):
+        return self.name
+
+
+class EquipmentType(Dimension):
+    """Distinct equipment type such as Pump or Valve"""
+    name = models.CharField(max_length=100, unique=True)
+
+
+class EquipmentName(Dimension):
+    """Distinct equipment name"""
+    name = models.CharField(max_length=255, unique=True)
+
+
 class EquipmentRecord(models.Model):
     """Store individual equipment records"""
     dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name='records')
-    equipment_name = models.CharField(max_length=255)
-    equipment_type = models.CharField(max_length=100)
+    equipment_name = models.ForeignKey(EquipmentName, on_delete=models.PROTECT, related_name='records')
+    equipment_type = models.ForeignKey(EquipmentType, on_delete=models.PROTECT, related_name='records')
     flowrate = models.FloatField()
     pressure = models.FloatField()
     temperature = models.FloatField()
+    anomaly_score = models.FloatField(default=0)
+    is_anomaly = models.BooleanField(default=False)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['dataset', 'is_anomaly', '-anomaly_score']),
+        ]
+    
+    def __str__(self):
+        return f"{self.equipment_name} ({self.equipment_type})"
+
+
+class UploadSession(models.Model):
+    """Track a resumable chunked upload until it is finalized"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    chunk_size = models.IntegerField()
+    checksum = models.CharField(max_length=64)  # BLAKE2b hex digest of the whole file
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    @property
+    def total_chunks(self):
+        return max(1, -(-self.total_size // self.chunk_size))
+    
+    def expected_chunk_length(self, index):
+        """Number of bytes the chunk at index must contain"""
+        if index == self.total_chunks - 1:
+            return self.total_size - index * self.chunk_size
+        return self.chunk_size
+    
+    def __str__(self):
+        return f"{self.filename} ({self.id})"
+
+
+class Event(models.Model):
+    """Dataset and job event, stored so every server process can relay it"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=32)
+    payload = models.TextField()  # JSON string
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     
     def __str__(self):
-        return f"{self.equipment_name} ({self.equipment_type})"
\ No newline at end of file
+        return f"{self.kind} ({self.id})"
@@ -0,0 +1,145 @@
+import functools
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# (executor, slots): the pool and the semaphore bounding its tasks, replaced
+# together when the pool breaks
+_pool = None
+_executor_lock = threading.Lock()
+_counters = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0}
+_counters_lock = threading.Lock()
+
+
+class PoolSaturated(Exception):
+    """Raised when the CPU pool already holds as much work as it may queue"""
+
+    def __init__(self, retry_after):
+        super().__init__('Server is busy, please retry shortly')
+        self.retry_after = retry_after
+
+
+# What run() raises when the pool could not finish a task: it ran past
+# CPU_POOL_TIMEOUT, or its process died (the next task gets a fresh pool)
+POOL_FAILURES = (TimeoutError, BrokenProcessPool)
+
+
+def _init_worker():
+    """Set up Django and pre-import the heavy libraries in a pool process"""
+    django.setup()
+    # pandas, numpy and reportlab
+    from . import reports
+
+
+def _noop():
+    return None
+
+
+def _get_pool():
+    """Return the process-wide CPU pool and its task slots, creating them on first use"""
+    global _pool
+    with _executor_lock:
+        if _pool is None:
+            workers = settings.CPU_POOL_WORKERS
+            context = multiprocessing.get_context(settings.CPU_POOL_START_METHOD)
+            if settings.CPU_POOL_START_METHOD == 'forkserver':
+                # Imported once by the fork server, so pool processes share
+                # pandas, numpy and reportlab instead of importing their own
+                context.set_forkserver_preload(['equipment.reports'])
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=context,
+                initializer=_init_worker
+            )
+            _pool = (executor, threading.BoundedSemaphore(workers + settings.CPU_POOL_MAX_QUEUE))
+        return _pool
+
+
+def get_executor():
+    """Return the process-wide CPU pool, creating it on first use"""
+    return _get_pool()[0]
+
+
+def warm_up():
+    """Start every pool process ahead of the first request"""
+    if not settings.CPU_POOL_WORKERS or not settings.CPU_POOL_WARMUP:
+        return
+    executor = get_executor()
+    for future in [executor.submit(_noop) for _ in range(settings.CPU_POOL_WORKERS)]:
+        future.result()
+
+
+def _count(name):
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def _release(slots, future):
+    # The slots of the pool the task ran in, which may have been replaced since
+    slots.release()
+    _count('failed' if future.exception() else 'completed')
+
+
+def run(func, *args):
+    """
+    Run a CPU-heavy function in the shared process pool and wait for it.
+
+    The pool accepts at most CPU_POOL_WORKERS running plus CPU_POOL_MAX_QUEUE
+    waiting tasks per server process; beyond that PoolSaturated is raised so
+    the view can answer 503 instead of piling up work. With
+    CPU_POOL_WORKERS = 0 the function runs inline.
+    """
+    if not settings.CPU_POOL_WORKERS:
+        return func(*args)
+
+    executor, slots = _get_pool()
+    if not slots.acquire(blocking=False):
+        _count('rejected')
+        logger.warning('CPU pool saturated, rejecting %s', func.__name__)
+        raise PoolSaturated(settings.CPU_POOL_RETRY_AFTER)
+
+    try:
+        future = executor.submit(func, *args)
+    except Exception:
+        slots.release()
+        raise
+    _count('submitted')
+    future.add_done_callback(functools.partial(_release, slots))
+    try:
+        return future.result(timeout=settings.CPU_POOL_TIMEOUT)
+    except BrokenProcessPool:
+        _discard(executor)
+        raise
+
+
+def _discard(executor):
+    """Drop a pool whose processes died so the next task starts a fresh one"""
+    global _pool
+    with _executor_lock:
+        if _pool is not None and _pool[0] is executor:
+            _pool = None
+    executor.shutdown(wait=False)
+
+
+def metrics():
+    """Queue depth and task counters of the CPU pool in this server process"""
+    workers = settings.CPU_POOL_WORKERS
+    with _counters_lock:
+        counters = dict(_counters)
+    in_flight = counters['submitted'] - counters['completed'] - counters['failed']
+    return {
+        'workers': workers,
+        'max_queue': settings.CPU_POOL_MAX_QUEUE,
+        'started': _pool is not None,
+        'in_flight': in_flight,
+        'running': min(in_flight, workers),
+        'queue_depth': max(in_flight - workers, 0),
+        **counters
+    }
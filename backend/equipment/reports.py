@@ -0,0 +1,325 @@
+import copy
+import io
+import threading
+from collections import OrderedDict
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import (
+    Flowable, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+)
+
+from .utils import SKETCH_COLUMNS, deserialize_sketches
+
+PAGE_MARGIN = 0.75 * inch
+HISTOGRAM_BINS = 20
+ROW_HEIGHT = 14
+RECORD_COLUMNS = [
+    ('Equipment Name', 2.0 * inch, 'left'),
+    ('Type', 1.3 * inch, 'left'),
+    ('Flowrate', 0.9 * inch, 'right'),
+    ('Pressure', 0.9 * inch, 'right'),
+    ('Temperature', 0.9 * inch, 'right'),
+]
+RECORD_FIELDS = ['equipment_name__name', 'equipment_type__name', 'flowrate', 'pressure',
+                 'temperature', 'is_anomaly']
+TOP_ANOMALIES = 25
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+_chart_cache = OrderedDict()
+_chart_lock = threading.Lock()
+
+
+class LazyStory(list):
+    """
+    Story for doc.build() that pulls flowables from an iterator as the
+    document consumes them, so only a few flowables exist at any time.
+    """
+
+    def __init__(self, flowables, lookahead=8):
+        super().__init__()
+        self._source = iter(flowables)
+        self._lookahead = lookahead
+
+    def _fill(self, size):
+        while self._source is not None and list.__len__(self) < size:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+
+    def __len__(self):
+        self._fill(self._lookahead)
+        return list.__len__(self)
+
+    def __getitem__(self, index):
+        if isinstance(index, int) and index >= 0:
+            self._fill(max(index + 1, self._lookahead))
+        return list.__getitem__(self, index)
+
+
+class RecordTable(Flowable):
+    """
+    A page worth of records drawn straight onto the canvas. Much cheaper
+    than a platypus Table for thousands of rows since nothing is measured
+    or split.
+    """
+
+    def __init__(self, rows):
+        super().__init__()
+        self.rows = rows
+        self.width = sum(width for _, width, _ in RECORD_COLUMNS)
+        self.height = ROW_HEIGHT * (len(rows) + 1)
+
+    def wrap(self, available_width, available_height):
+        return self.width, self.height
+
+    def draw(self):
+        canv = self.canv
+        top = self.height
+
+        canv.setFillColor(colors.grey)
+        canv.rect(0, top - ROW_HEIGHT, self.width, ROW_HEIGHT, stroke=0, fill=1)
+        canv.setFillColor(colors.beige)
+        canv.rect(0, 0, self.width, top - ROW_HEIGHT, stroke=0, fill=1)
+        canv.setStrokeColor(colors.black)
+        canv.setLineWidth(0.25)
+        canv.rect(0, 0, self.width, self.height, stroke=1, fill=0)
+
+        canv.setFont('Helvetica-Bold', 8)
+        canv.setFillColor(colors.whitesmoke)
+        self._draw_row([name for name, _, _ in RECORD_COLUMNS], top - ROW_HEIGHT + 4)
+
+        canv.setFont('Helvetica', 8)
+        for index, row in enumerate(self.rows):
+            *values, anomaly = row
+            canv.setFillColor(colors.red if anomaly else colors.black)
+            self._draw_row(
+                [values[0], values[1], f'{values[2]:.2f}', f'{values[3]:.2f}', f'{values[4]:.2f}'],
+                top - ROW_HEIGHT * (index + 2) + 4
+            )
+
+    def _draw_row(self, values, y):
+        x = 0
+        for value, (_, width, align) in zip(values, RECORD_COLUMNS):
+            if align == 'right':
+                self.canv.drawRightString(x + width - 4, y, str(value))
+            else:
+                self.canv.drawString(x + 4, y, str(value)[:40])
+            x += width
+
+
+def _bar_chart(title, labels, series, width=6.5 * inch, height=2.4 * inch, colours=None):
+    drawing = Drawing(width, height)
+    drawing.add(String(0, height - 12, title, fontName='Helvetica-Bold', fontSize=10))
+    chart = VerticalBarChart()
+    chart.x, chart.y = 40, 30
+    chart.width, chart.height = width - 60, height - 60
+    chart.data = series
+    chart.categoryAxis.categoryNames = labels
+    chart.categoryAxis.labels.fontSize = 7
+    chart.categoryAxis.labels.angle = 30 if len(labels) > 8 else 0
+    chart.categoryAxis.labels.boxAnchor = 'ne' if len(labels) > 8 else 'n'
+    chart.valueAxis.labels.fontSize = 7
+    chart.valueAxis.valueMin = 0
+    chart.barSpacing = 1
+    for index, colour in enumerate(colours or [colors.steelblue]):
+        chart.bars[index].fillColor = colour
+    drawing.add(chart)
+    return drawing
+
+
+def _histogram(field, digest):
+    """Histogram of a numeric field read from its t-digest, no record scan needed"""
+    edges = np.linspace(digest.min, digest.max, HISTOGRAM_BINS + 1)
+    counts = np.diff(digest.cdf(edges)) * digest.count
+    labels = [f'{edge:.4g}' if index % 4 == 0 else '' for index, edge in enumerate(edges[:-1])]
+    return _bar_chart(f'{field.title()} distribution', labels,
+                      [[round(float(c)) for c in counts]], height=2.1 * inch)
+
+
+def build_charts(dataset):
+    """
+    Chart drawings for a dataset, built from the stored aggregates and
+    sketches and cached per process so repeated reports reuse them.
+    """
+    key = dataset.cache_key('pdf-charts')
+    with _chart_lock:
+        if key in _chart_cache:
+            _chart_cache.move_to_end(key)
+            return _chart_cache[key]
+
+    charts = []
+    by_type = dataset.get_aggregates().get('equipment_type', {})
+    if by_type:
+        labels = sorted(by_type)
+        charts.append(_bar_chart('Records per equipment type', labels,
+                                 [[by_type[label]['count'] for label in labels]]))
+        for field in SKETCH_COLUMNS:
+            means = [by_type[label][field]['sum'] / by_type[label]['count'] for label in labels]
+            charts.append(_bar_chart(f'Average {field} per equipment type', labels,
+                                     [[round(mean, 2) for mean in means]],
+                                     height=2.1 * inch, colours=[colors.darkseagreen]))
+
+    sketches = deserialize_sketches(dataset.get_sketches())
+    for field in SKETCH_COLUMNS:
+        digest = sketches.get(field)
+        if digest is not None and digest.count and digest.max > digest.min:
+            charts.append(_histogram(field, digest))
+
+    with _chart_lock:
+        _chart_cache[key] = charts
+        while len(_chart_cache) > settings.PDF_CHART_CACHE_SIZE:
+            _chart_cache.popitem(last=False)
+    return charts
+
+
+def _summary_flowables(dataset, styles):
+    summary = dataset.get_summary()
+    yield Paragraph("Chemical Equipment Analysis Report", styles['Heading1'])
+    yield Spacer(1, 0.2 * inch)
+    for item in (
+        f"<b>Filename:</b> {dataset.filename}",
+        f"<b>Upload Date:</b> {dataset.upload_date.strftime('%Y-%m-%d %H:%M')}",
+        f"<b>Total Records:</b> {dataset.row_count}",
+        f"<b>Anomalies:</b> {summary.get('anomaly_count', 0)}",
+    ):
+        yield Paragraph(item, styles['Normal'])
+        yield Spacer(1, 0.1 * inch)
+    yield Spacer(1, 0.2 * inch)
+
+    yield Paragraph("<b>Summary Statistics</b>", styles['Heading2'])
+    yield Spacer(1, 0.2 * inch)
+    percentiles = summary.get('percentiles', {})
+    summary_data = [['Parameter', 'Average', 'Min', 'Max', 'p50', 'p95']]
+    for field in SKETCH_COLUMNS:
+        field_percentiles = percentiles.get(field, {})
+        summary_data.append([
+            field.title(), f"{summary[f'avg_{field}']}", f"{summary[f'min_{field}']}",
+            f"{summary[f'max_{field}']}", f"{field_percentiles.get('p50', '-')}",
+            f"{field_percentiles.get('p95', '-')}"
+        ])
+    summary_table = Table(summary_data, colWidths=[1.5 * inch] + [1 * inch] * 5)
+    summary_table.setStyle(TABLE_STYLE)
+    yield summary_table
+    yield Spacer(1, 0.3 * inch)
+
+    yield Paragraph("<b>Equipment Type Distribution</b>", styles['Heading2'])
+    yield Spacer(1, 0.2 * inch)
+    types_data = [['Equipment Type', 'Count']]
+    for eq_type, count in summary['equipment_types'].items():
+        types_data.append([eq_type, str(count)])
+    types_table = Table(types_data, colWidths=[4 * inch, 2 * inch])
+    types_table.setStyle(TABLE_STYLE)
+    yield types_table
+
+
+def _chart_flowables(dataset, styles):
+    charts = build_charts(dataset)
+    if not charts:
+        return
+    yield PageBreak()
+    yield Paragraph("<b>Charts</b>", styles['Heading2'])
+    for chart in charts:
+        yield Spacer(1, 0.15 * inch)
+        # Layout state is stored on flowables, so each build gets its own
+        # shallow copy; the shapes themselves are shared
+        yield copy.copy(chart)
+
+
+def _anomaly_flowables(dataset, styles):
+    top = list(
+        dataset.records.filter(is_anomaly=True)
+        .order_by('-anomaly_score')
+        .values_list('equipment_name__name', 'equipment_type__name', 'flowrate', 'pressure',
+                     'temperature', 'anomaly_score')[:TOP_ANOMALIES]
+    )
+    if not top:
+        return
+    yield PageBreak()
+    yield Paragraph("<b>Top Anomalies</b>", styles['Heading2'])
+    yield Spacer(1, 0.2 * inch)
+    data = [['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature', 'Score']]
+    data += [[name, eq_type, f'{f:.2f}', f'{p:.2f}', f'{t:.2f}', f'{score:.2f}']
+             for name, eq_type, f, p, t, score in top]
+    table = Table(data, colWidths=[1.8 * inch, 1.2 * inch] + [0.9 * inch] * 4, repeatRows=1)
+    table.setStyle(TABLE_STYLE)
+    yield table
+
+
+def _record_flowables(dataset, styles, rows_per_page):
+    limit = settings.PDF_REPORT_MAX_RECORDS
+    shown = dataset.row_count if limit is None else min(dataset.row_count, limit)
+    yield PageBreak()
+    yield Paragraph("<b>Records</b>", styles['Heading2'])
+    if shown < dataset.row_count:
+        yield Paragraph(f"First {shown:,} of {dataset.row_count:,} records; "
+                        "use the CSV export for the full dataset.", styles['Normal'])
+    yield Spacer(1, 0.1 * inch)
+
+    records = dataset.records.order_by('id').values_list(*RECORD_FIELDS)
+    if limit is not None:
+        records = records[:limit]
+    rows = records.iterator(chunk_size=2000)
+
+    # The first table shares its page with the heading
+    first = list(islice(rows, rows_per_page - 4))
+    if first:
+        yield RecordTable(first)
+    while page := list(islice(rows, rows_per_page)):
+        yield RecordTable(page)
+
+
+def _draw_page_number(canvas, doc):
+    canvas.saveState()
+    canvas.setFont('Helvetica', 8)
+    canvas.drawRightString(letter[0] - PAGE_MARGIN, PAGE_MARGIN / 2, f'Page {doc.page}')
+    canvas.restoreState()
+
+
+def generate_pdf_report(dataset, buffer):
+    """
+    Generate PDF report for a dataset: summary, charts, top anomalies and
+    paginated record tables. Flowables are produced lazily while the
+    document is laid out, records are streamed from the database a page at
+    a time, and charts come from the per-process chart cache.
+    """
+    doc = SimpleDocTemplate(buffer, pagesize=letter, leftMargin=PAGE_MARGIN,
+                            rightMargin=PAGE_MARGIN, topMargin=PAGE_MARGIN,
+                            bottomMargin=PAGE_MARGIN)
+    styles = getSampleStyleSheet()
+    # Frame padding takes 12pt off the usable height
+    rows_per_page = int((doc.height - 12) // ROW_HEIGHT) - 1
+
+    def story():
+        yield from _summary_flowables(dataset, styles)
+        yield from _chart_flowables(dataset, styles)
+        yield from _anomaly_flowables(dataset, styles)
+        yield from _record_flowables(dataset, styles, rows_per_page)
+
+    doc.build(LazyStory(story()), onFirstPage=_draw_page_number, onLaterPages=_draw_page_number)
+    buffer.seek(0)
+    return buffer
+
+
+def render_pdf_report(dataset):
+    """Return the PDF report of a dataset as bytes (runs in the CPU pool)"""
+    close_old_connections()
+    return generate_pdf_report(dataset, io.BytesIO()).getvalue()
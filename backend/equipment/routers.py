@@ -0,0 +1,61 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import request_started
+from django.dispatch import receiver
+
+# Replica the current request reads from, None for the primary
+_replica = ContextVar('replica', default=None)
+
+
+class ReplicaRouter:
+    """
+    Route reads to a read replica within requests that opted in through
+    use_replica(), and every write to the primary. Outside such requests
+    reads follow the database the related instance came from, Django's
+    default, so a PDF report rendered in the CPU pool reads its records
+    from the replica its dataset was loaded from.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _replica.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema through replication
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+@receiver(request_started)
+def reset_replica(sender, **kwargs):
+    # Threads serve many requests; each one starts on the primary
+    _replica.set(None)
+
+
+def _pin_key(user):
+    return f'replica-pin:{user.pk}'
+
+
+def pin_to_primary(user):
+    """Keep a user's reads on the primary while replicas may still lag behind their last write"""
+    if settings.DATABASE_REPLICAS and user is not None and user.is_authenticated:
+        caches['replica-pins'].set(_pin_key(user), True, settings.DATABASE_REPLICA_PIN_SECONDS)
+
+
+def use_replica(user):
+    """
+    Send the rest of the current request's reads to one replica, picked at
+    random, unless the user changed data recently
+    """
+    if settings.DATABASE_REPLICAS and not caches['replica-pins'].get(_pin_key(user)):
+        _replica.set(random.choice(settings.DATABASE_REPLICAS))
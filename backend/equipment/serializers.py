@@ -1,30 +1,94 @@
 from rest_framework import serializers
-from .models import Dataset, EquipmentRecord
+from .models import Dataset, EquipmentRecord, UploadSession
+from .uploads import received_chunks, missing_chunks
 
 class EquipmentRecordSerializer(serializers.ModelSerializer):
+    """
+    Reference representation of a record. Responses build it with
+    record_values(), which bench_serialize checks against this serializer.
+    """
+    equipment_name = serializers.CharField(source='equipment_name.name', read_only=True)
+    equipment_type = serializers.CharField(source='equipment_type.name', read_only=True)
+    
     class Meta:
         model = EquipmentRecord
         fields = ['id', 'equipment_name', 'equipment_type', 'flowrate', 'pressure', 'temperature']
 
 
+# Output key -> lookup of the fields of EquipmentRecordSerializer, for
+# record_values(); anomaly listings add the anomaly score
+RECORD_FIELDS = {
+    'id': 'id',
+    'equipment_name': 'equipment_name__name',
+    'equipment_type': 'equipment_type__name',
+    'flowrate': 'flowrate',
+    'pressure': 'pressure',
+    'temperature': 'temperature',
+}
+ANOMALY_RECORD_FIELDS = {**RECORD_FIELDS, 'anomaly_score': 'anomaly_score'}
+
+
+def record_rows(records, fields=RECORD_FIELDS):
+    """Read a record queryset with values_list(), without a model instance per record"""
+    return records.values_list(*fields.values())
+
+
+def record_values(rows, fields=RECORD_FIELDS):
+    """
+    The representation EquipmentRecordSerializer gives the records read by
+    record_rows() (plus anomaly_score with ANOMALY_RECORD_FIELDS), without
+    its per-record, per-field method calls
+    """
+    keys = list(fields)
+    return [dict(zip(keys, row)) for row in rows]
+
+
 class DatasetSerializer(serializers.ModelSerializer):
     summary = serializers.SerializerMethodField()
+    validation = serializers.SerializerMethodField()
     
     class Meta:
         model = Dataset
-        fields = ['id', 'filename', 'upload_date', 'row_count', 'summary']
+        fields = ['id', 'filename', 'upload_date', 'row_count', 'version', 'summary', 'validation']
     
     def get_summary(self, obj):
         return obj.get_summary()
+    
+    def get_validation(self, obj):
+        return obj.get_validation()
 
 
 class DatasetDetailSerializer(serializers.ModelSerializer):
-    records = EquipmentRecordSerializer(many=True, read_only=True)
+    records = serializers.SerializerMethodField()
     summary = serializers.SerializerMethodField()
+    validation = serializers.SerializerMethodField()
     
     class Meta:
         model = Dataset
-        fields = ['id', 'filename', 'upload_date', 'row_count', 'summary', 'records']
+        fields = ['id', 'filename', 'upload_date', 'row_count', 'version', 'summary', 'validation', 'records']
+    
+    def get_records(self, obj):
+        return record_values(record_rows(obj.records.all()))
     
     def get_summary(self, obj):
-        return obj.get_summary()
\ No newline at end of file
+        return obj.get_summary()
+    
+    def get_validation(self, obj):
+        return obj.get_validation()
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    total_chunks = serializers.IntegerField(read_only=True)
+    received_chunks = serializers.SerializerMethodField()
+    missing_chunks = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'filename', 'total_size', 'chunk_size', 'total_chunks', 'checksum',
+                  'created_at', 'received_chunks', 'missing_chunks']
+    
+    def get_received_chunks(self, obj):
+        return received_chunks(obj)
+    
+    def get_missing_chunks(self, obj):
+        return missing_chunks(obj)
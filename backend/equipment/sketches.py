@@ -0,0 +1,163 @@
+"""Mergeable quantile and distinct-count sketches built at ingest time"""
+import base64
+import math
+
+import numpy as np
+import pandas as pd
+
+# About compression / 2 centroids; 200 keeps p99 of skewed data within a
+# fraction of a percent
+DEFAULT_COMPRESSION = 200
+DEFAULT_PRECISION = 12
+
+
+class TDigest:
+    """Merging t-digest over float values"""
+
+    def __init__(self, means=(), weights=(), minimum=None, maximum=None,
+                 compression=DEFAULT_COMPRESSION):
+        self.means = np.asarray(means, dtype=float)
+        self.weights = np.asarray(weights, dtype=float)
+        self.min = minimum
+        self.max = maximum
+        self.compression = compression
+
+    @classmethod
+    def from_values(cls, values, compression=DEFAULT_COMPRESSION):
+        """Build a digest from an array of values"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return cls(compression=compression)
+        values = np.sort(values)
+        means, weights = _compress(values, np.ones(len(values)), compression)
+        return cls(means, weights, float(values[0]), float(values[-1]), compression)
+
+    @property
+    def count(self):
+        return int(self.weights.sum())
+
+    def merge(self, other):
+        """Return a new digest covering the values of both digests"""
+        if not other.count:
+            return self
+        if not self.count:
+            return other
+        means = np.concatenate([self.means, other.means])
+        weights = np.concatenate([self.weights, other.weights])
+        order = np.argsort(means, kind='mergesort')
+        # Digests stored with a lower compression are refined as they are merged
+        compression = max(self.compression, other.compression)
+        means, weights = _compress(means[order], weights[order], compression)
+        return TDigest(means, weights, min(self.min, other.min),
+                       max(self.max, other.max), compression)
+
+    def quantile(self, q):
+        """Estimate the value at quantile q (0..1); q may be an array"""
+        if not self.count:
+            return None
+        total = self.weights.sum()
+        centers = np.cumsum(self.weights) - self.weights / 2
+        xp = np.concatenate([[0], centers, [total]])
+        fp = np.concatenate([[self.min], self.means, [self.max]])
+        return np.interp(np.asarray(q, dtype=float) * total, xp, fp)
+
+    def cdf(self, x):
+        """Estimate the fraction of values <= x; x may be an array"""
+        if not self.count:
+            return None
+        total = self.weights.sum()
+        centers = np.cumsum(self.weights) - self.weights / 2
+        xp = np.concatenate([[self.min], self.means, [self.max]])
+        fp = np.concatenate([[0], centers, [total]])
+        return np.interp(np.asarray(x, dtype=float), xp, fp) / total
+
+    def to_dict(self):
+        return {
+            'compression': self.compression,
+            'min': self.min,
+            'max': self.max,
+            'means': [round(float(m), 6) for m in self.means],
+            'weights': [int(w) for w in self.weights],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['means'], data['weights'], data['min'], data['max'],
+                   data.get('compression', DEFAULT_COMPRESSION))
+
+
+def _compress(means, weights, compression):
+    """Merge sorted centroids so that each spans at most one unit of the k1 scale"""
+    total = weights.sum()
+    q_left = (np.cumsum(weights) - weights) / total
+    k = compression / (2 * math.pi) * np.arcsin(2 * q_left - 1)
+    cluster = np.floor(k - k[0]).astype(np.int64)
+    starts = np.flatnonzero(np.diff(cluster, prepend=-1))
+    merged_weights = np.add.reduceat(weights, starts)
+    merged_means = np.add.reduceat(means * weights, starts) / merged_weights
+    return merged_means, merged_weights
+
+
+class HyperLogLog:
+    """HyperLogLog distinct-count estimator over 64-bit hashes"""
+
+    def __init__(self, registers=None, precision=DEFAULT_PRECISION):
+        self.precision = precision
+        if registers is None:
+            registers = np.zeros(1 << precision, dtype=np.uint8)
+        self.registers = registers
+
+    @classmethod
+    def from_values(cls, values, precision=DEFAULT_PRECISION):
+        """Build an estimator from an array of hashable values"""
+        sketch = cls(precision=precision)
+        values = pd.Series(values).dropna().astype(str)
+        if len(values):
+            hashes = pd.util.hash_pandas_object(values, index=False).to_numpy(np.uint64)
+            index = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+            remainder = hashes << np.uint64(precision)
+            np.maximum.at(sketch.registers, index, _rank(remainder, precision))
+        return sketch
+
+    def merge(self, other):
+        """Return a new estimator covering the values of both estimators"""
+        return HyperLogLog(np.maximum(self.registers, other.registers), self.precision)
+
+    def estimate(self):
+        """Estimate the number of distinct values"""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.exp2(-self.registers.astype(float)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+    def to_dict(self):
+        return {
+            'precision': self.precision,
+            'registers': base64.b64encode(self.registers.tobytes()).decode('ascii'),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        registers = np.frombuffer(base64.b64decode(data['registers']), dtype=np.uint8).copy()
+        return cls(registers, data.get('precision', DEFAULT_PRECISION))
+
+
+def _rank(remainder, precision):
+    """Position of the leading one bit in the hash bits left after the register index"""
+    width = 64 - precision
+    lengths = np.zeros(len(remainder), dtype=np.int64)
+    value = remainder.copy()
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = value >> np.uint64(shift)
+        mask = high != 0
+        lengths[mask] += shift
+        value = np.where(mask, high, value)
+    lengths += (value != 0)
+    # remainder has its low `precision` bits cleared, so the leading one bit
+    # is at most `width` positions from the top
+    rank = 64 - lengths + 1
+    return np.minimum(rank, width + 1).astype(np.uint8)
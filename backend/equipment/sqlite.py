@@ -0,0 +1,53 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+_optimized_at = {}
+_optimize_lock = threading.Lock()
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+    """Apply the SQLITE_PRAGMAS profile to every new SQLite connection"""
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRAGMAS:
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def optimize(using='default'):
+    """
+    Refresh the query planner statistics of a SQLite database after large
+    deletes, at most once per SQLITE_OPTIMIZE_INTERVAL seconds per process.
+
+    The first run analyzes every table; later runs use PRAGMA optimize,
+    which only analyzes tables whose row counts changed a lot. Both sample
+    at most analysis_limit rows per index, so a run stays short on large
+    tables.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or not settings.SQLITE_OPTIMIZE_INTERVAL:
+        return
+    now = time.monotonic()
+    with _optimize_lock:
+        last = _optimized_at.get(using)
+        if last is not None and now - last < settings.SQLITE_OPTIMIZE_INTERVAL:
+            return
+        _optimized_at[using] = now
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA analysis_limit = 1000')
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            cursor.execute('PRAGMA optimize' if cursor.fetchone() else 'ANALYZE')
+    except Exception:
+        # Statistics are only an aid to the planner; the delete already succeeded
+        logger.exception('SQLite optimize failed')
@@ -0,0 +1,467 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.client import encode_multipart
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import pool
+from .anomalies import FLAG_COLUMN, SCORE_COLUMN, detect_anomalies
+from .authentication import CachedTokenAuthentication, token_cache
+from .middleware import RequestDecompressionMiddleware
+from .models import Dataset, EquipmentRecord, Event
+from .renderers import FastJSONRenderer
+from .sketches import TDigest
+from .utils import parse_csv_file
+from .validation import describe_report
+
+SAMPLE_CSV = (
+    b'Equipment Name,Type,Flowrate,Pressure,Temperature\n'
+    b'Pump-1,Pump,120.5,5.2,110.0\n'
+    b'Pump-2,Pump,118.0,5.0,112.5\n'
+    b'Pump-2,Pump,121.0,5.4,108.0\n'
+    b'Valve-1,Valve,60.0,4.1,105.0\n'
+)
+
+
+def upload(client, content=SAMPLE_CSV, filename='data.csv'):
+    """Upload a CSV through the API, analyzed inline, and return the response"""
+    with override_settings(CPU_POOL_WORKERS=0, ADMISSION_CONTROL=False):
+        return client.post('/api/datasets/upload/', {
+            'file': SimpleUploadedFile(filename, content, content_type='text/csv')
+        })
+
+
+class RequestDecompressionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('tester')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_gzip_chunk_put(self):
+        content = b'Equipment Name,Type,Flowrate,Pressure,Temperature\nPump-1,Pump,120.5,5.2,110.0\n'
+        with tempfile.TemporaryDirectory() as directory, override_settings(CHUNKED_UPLOAD_DIR=directory):
+            session = self.client.post('/api/uploads/', {
+                'filename': 'data.csv',
+                'size': len(content),
+                'checksum': hashlib.blake2b(content, digest_size=32).hexdigest(),
+            }).json()
+            response = self.client.generic(
+                'PUT', f'/api/uploads/{session["id"]}/?offset=0', gzip.compress(content),
+                content_type='application/octet-stream', HTTP_CONTENT_ENCODING='gzip'
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['size'], len(content))
+
+    def test_gzip_multipart_upload_keeps_filename_and_hash(self):
+        plain = upload(self.client)
+        self.assertEqual(plain.status_code, 201, plain.content)
+        multipart = encode_multipart('BoUnDaRy', {
+            'file': SimpleUploadedFile('data.csv', SAMPLE_CSV, content_type='text/csv')
+        })
+        with override_settings(CPU_POOL_WORKERS=0, ADMISSION_CONTROL=False):
+            response = self.client.generic(
+                'POST', '/api/datasets/upload/', gzip.compress(multipart),
+                content_type='multipart/form-data; boundary=BoUnDaRy', HTTP_CONTENT_ENCODING='gzip'
+            )
+        # Answered from the plain upload: same name, same content hash
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['id'], plain.json()['id'])
+        self.assertEqual(response.json()['filename'], 'data.csv')
+
+    def test_large_gzip_multipart_body_is_spooled_to_disk(self):
+        boundary = 'boundary'
+        size = 12 * 1024 * 1024  # above FILE_UPLOAD_MAX_MEMORY_SIZE
+        body = gzip.compress(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="big.csv"\r\n'
+            f'Content-Type: text/csv\r\n\r\n'.encode() + b'0' * size + f'\r\n--{boundary}--\r\n'.encode()
+        )
+        request = RequestFactory().generic(
+            'POST', '/api/datasets/upload/', body,
+            content_type=f'multipart/form-data; boundary={boundary}', HTTP_CONTENT_ENCODING='gzip'
+        )
+        self.assertLess(len(body), 100 * 1024)
+
+        RequestDecompressionMiddleware(lambda request: None).process_request(request)
+        uploaded = request.FILES['file']
+        self.assertIsInstance(uploaded, TemporaryUploadedFile)
+        self.assertEqual(uploaded.size, size)
+
+
+class AggregateTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('tester'))
+        self.dataset = upload(self.client).json()['id']
+
+    def test_std_of_single_row_group_is_null(self):
+        response = self.client.get(f'/api/datasets/{self.dataset}/aggregate/',
+                                   {'group_by': 'equipment_name', 'agg': 'count,std'})
+        self.assertEqual(response.status_code, 200, response.content)
+        groups = {group['equipment_name']: group for group in response.json()['groups']}
+        self.assertEqual(groups['Pump-1']['count'], 1)
+        self.assertIsNone(groups['Pump-1']['flowrate']['std'])
+        self.assertEqual(groups['Pump-2']['flowrate']['std'], 2.12)
+
+    def test_invalid_parameters_get_fixed_messages(self):
+        for url, params in (
+            ('/api/datasets/quantiles/', {'q': 'abc'}),
+            ('/api/datasets/quantiles/', {'q': 'nan'}),
+            ('/api/datasets/quantiles/', {'ids': 'x'}),
+            (f'/api/datasets/{self.dataset}/aggregate/', {'group_by': 'flowrate'}),
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertRegex(response.json()['error'], r'^(q|ids|group_by) must be ')
+
+
+class AnomalyDetectionTests(TestCase):
+    def frame(self, rows):
+        return pd.DataFrame(rows, columns=['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature'])
+
+    def test_hard_limits_on_every_column(self):
+        df = self.frame([
+            ('A', 'Pump', 100.0, 5.0, 100.0),
+            ('B', 'Pump', 250.0, 5.0, 100.0),  # flowrate above 200
+            ('C', 'Pump', 100.0, 0.5, 100.0),  # pressure below 1
+            ('D', 'Pump', 100.0, 5.0, 180.0),  # temperature above 150
+        ])
+        limits = {'Flowrate': (0, 200), 'Pressure': (1, None), 'Temperature': (None, 150)}
+        result = detect_anomalies(df, threshold=np.inf, limits=limits)
+        self.assertEqual(result[FLAG_COLUMN].tolist(), [False, True, True, True])
+
+    def test_iqr_scores_each_type_separately(self):
+        pumps = [(f'P{i}', 'Pump', 100.0 + i, 5.0, 100.0) for i in range(10)]
+        # Ordinary for a valve, far outside the pumps' fences
+        valves = [(f'V{i}', 'Valve', 300.0 + i, 5.0, 100.0) for i in range(10)]
+        df = self.frame(pumps + valves + [('P-out', 'Pump', 300.0, 5.0, 100.0)])
+        result = detect_anomalies(df, method='iqr', threshold=0, limits={})
+        self.assertEqual(result.loc[result[FLAG_COLUMN], 'Equipment Name'].tolist(), ['P-out'])
+        # (300 - upper fence 115) / IQR 5
+        self.assertEqual(result[SCORE_COLUMN].iloc[-1], 37.0)
+
+    def test_unknown_method_is_refused(self):
+        with self.assertRaises(ValueError):
+            detect_anomalies(self.frame([('A', 'Pump', 1.0, 1.0, 1.0)]), method='median')
+
+
+class AppendTests(TestCase):
+    # Twenty ordinary pumps; one appended outlier is ordinary among its own batch
+    BASE_CSV = b'Equipment Name,Type,Flowrate,Pressure,Temperature\n' + b''.join(
+        f'P{i},Pump,{120 + i % 5},{5 + i % 3 / 10},{110 + i % 4}\n'.encode() for i in range(20)
+    )
+    OUTLIER_CSV = b'Equipment Name,Type,Flowrate,Pressure,Temperature\nZ9,Pump,500,50,300\n'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('tester'))
+
+    def append_outlier(self):
+        dataset = upload(self.client, self.BASE_CSV).json()
+        self.assertEqual(dataset['summary']['anomaly_count'], 0)
+        with override_settings(CPU_POOL_WORKERS=0):
+            response = self.client.post(f'/api/datasets/{dataset["id"]}/append/', {
+                'file': SimpleUploadedFile('more.csv', self.OUTLIER_CSV, content_type='text/csv')
+            })
+        self.assertEqual(response.status_code, 200, response.content)
+        record = EquipmentRecord.objects.get(dataset=dataset['id'], equipment_name__name='Z9')
+        return response.json(), record
+
+    def test_appended_outlier_is_scored_against_whole_dataset(self):
+        dataset, record = self.append_outlier()
+        self.assertTrue(record.is_anomaly)
+        self.assertGreater(record.anomaly_score, 3)
+        self.assertEqual(dataset['summary']['anomaly_count'], 1)
+
+    def test_append_merges_statistics_as_one_upload_would(self):
+        extra = b'Equipment Name,Type,Flowrate,Pressure,Temperature\nV1,Valve,60,4.1,105\nP3,Pump,119,5.1,111\n'
+        dataset = upload(self.client, self.BASE_CSV).json()
+        with override_settings(CPU_POOL_WORKERS=0, ADMISSION_CONTROL=False):
+            appended = self.client.post(f'/api/datasets/{dataset["id"]}/append/', {
+                'file': SimpleUploadedFile('more.csv', extra, content_type='text/csv')
+            }).json()
+        combined = upload(self.client, self.BASE_CSV + extra.split(b'\n', 1)[1]).json()
+
+        self.assertEqual(appended['row_count'], 22)
+        self.assertEqual(appended['version'], dataset['version'] + 1)
+        expected = combined['summary']
+        for key, value in appended['summary'].items():
+            if key not in ('percentiles', 'distinct_equipment'):
+                self.assertEqual(value, expected[key], key)
+        self.assertEqual(EquipmentRecord.objects.filter(dataset=dataset['id']).count(), 22)
+
+    def test_appended_outlier_is_flagged_by_iqr(self):
+        with override_settings(ANOMALY_DETECTION={**settings.ANOMALY_DETECTION, 'METHOD': 'iqr'}):
+            dataset, record = self.append_outlier()
+        self.assertTrue(record.is_anomaly)
+        self.assertEqual(dataset['summary']['anomaly_count'], 1)
+
+
+class CompareTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('tester'))
+
+    def test_groups_are_aligned_across_datasets(self):
+        baseline = upload(self.client).json()['id']
+        other = upload(self.client, (
+            b'Equipment Name,Type,Flowrate,Pressure,Temperature\n'
+            b'Pump-1,Pump,130.5,5.2,110.0\n'
+            b'Mixer-1,Mixer,40.0,2.0,90.0\n'
+        )).json()['id']
+        response = self.client.get('/api/datasets/compare/', {'ids': f'{baseline},{other}'})
+        self.assertEqual(response.status_code, 200, response.content)
+
+        by_type = response.json()['by_type']
+        self.assertEqual(by_type['labels'], ['Mixer', 'Pump', 'Valve'])
+        first, second = by_type['series']
+        self.assertEqual(first['count'], [0, 3, 1])
+        self.assertEqual(second['count'], [1, 1, 0])
+        self.assertEqual(first['flowrate'], [None, 119.83, 60.0])
+        self.assertEqual(second['flowrate'], [40.0, 130.5, None])
+        self.assertEqual(first['flowrate_delta'], [None, 0.0, 0.0])
+        self.assertEqual(second['flowrate_delta'], [None, 10.67, None])
+        self.assertEqual(response.json()['by_equipment']['labels'], ['Mixer-1', 'Pump-1', 'Pump-2', 'Valve-1'])
+
+    def test_unknown_dataset_is_not_found(self):
+        baseline = upload(self.client).json()['id']
+        response = self.client.get('/api/datasets/compare/', {'ids': f'{baseline},{baseline + 100}'})
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(CHUNKED_UPLOAD_CHUNK_SIZE=64, CPU_POOL_WORKERS=0, ADMISSION_CONTROL=False)
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        upload_dir = override_settings(CHUNKED_UPLOAD_DIR=directory.name)
+        upload_dir.enable()
+        self.addCleanup(upload_dir.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('tester'))
+
+    def start(self, content=SAMPLE_CSV):
+        response = self.client.post('/api/uploads/', {
+            'filename': 'data.csv',
+            'size': len(content),
+            'checksum': hashlib.blake2b(content, digest_size=32).hexdigest(),
+        })
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()
+
+    def put(self, session, index, content=SAMPLE_CSV):
+        size = session['chunk_size']
+        return self.client.generic(
+            'PUT', f'/api/uploads/{session["id"]}/?offset={index * size}',
+            content[index * size:(index + 1) * size], content_type='application/octet-stream'
+        )
+
+    def test_interrupted_upload_resumes(self):
+        session = self.start()
+        self.assertEqual(session['total_chunks'], 3)
+        self.assertEqual(self.put(session, 2).status_code, 200)
+
+        # The client comes back and asks what is still missing
+        state = self.client.get(f'/api/uploads/{session["id"]}/').json()
+        self.assertEqual(state['received_chunks'], [2])
+        self.assertEqual(state['missing_chunks'], [0, 1])
+        incomplete = self.client.post(f'/api/uploads/{session["id"]}/finalize/')
+        self.assertEqual(incomplete.status_code, 400)
+        self.assertEqual(incomplete.json()['missing_chunks'], [0, 1])
+
+        for index in state['missing_chunks']:
+            self.assertEqual(self.put(session, index).status_code, 200)
+        response = self.client.post(f'/api/uploads/{session["id"]}/finalize/')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['row_count'], 4)
+        self.assertEqual(self.client.get(f'/api/uploads/{session["id"]}/').status_code, 404)
+
+    def test_chunk_of_wrong_length_is_refused(self):
+        session = self.start()
+        response = self.client.generic(
+            'PUT', f'/api/uploads/{session["id"]}/?offset=0', b'too short',
+            content_type='application/octet-stream'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(f'/api/uploads/{session["id"]}/').json()['received_chunks'], [])
+
+
+class DedupeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('tester')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_reupload_returns_the_retained_dataset(self):
+        first = upload(self.client)
+        second = upload(self.client, filename='renamed.csv')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['id'], first.json()['id'])
+        self.assertEqual(Dataset.objects.filter(user=self.user).count(), 1)
+
+    def test_other_users_and_changed_content_are_not_deduplicated(self):
+        first = upload(self.client).json()['id']
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('other'))
+        self.assertEqual(upload(other).status_code, 201)
+        changed = upload(self.client, SAMPLE_CSV + b'Valve-2,Valve,61.0,4.0,104.0\n')
+        self.assertEqual(changed.status_code, 201)
+        self.assertNotEqual(changed.json()['id'], first)
+
+    def test_chunked_session_points_at_the_retained_dataset(self):
+        dataset = upload(self.client).json()['id']
+        session = self.client.post('/api/uploads/', {
+            'filename': 'data.csv',
+            'size': len(SAMPLE_CSV),
+            'checksum': hashlib.blake2b(SAMPLE_CSV, digest_size=32).hexdigest(),
+        }).json()
+        self.assertEqual(session['existing_dataset'], dataset)
+        # Finalizing without sending any chunk answers with that dataset
+        response = self.client.post(f'/api/uploads/{session["id"]}/finalize/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], dataset)
+
+
+@override_settings(EVENTS_DB_BRIDGE=True, EVENTS_STREAM_DURATION=0.2, EVENTS_HEARTBEAT=0.1)
+class EventStreamTests(TestCase):
+    def setUp(self):
+        # Stored events are replayed by the stream itself; no relay thread is needed
+        bridge = mock.patch('equipment.events._start_bridge')
+        bridge.start()
+        self.addCleanup(bridge.stop)
+        self.user = User.objects.create_user('tester')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.events = [Event.objects.create(user=self.user, kind='job.progress', payload='{}') for _ in range(3)]
+
+    def stream(self, **params):
+        ticket = self.client.post('/api/events/ticket/').json()['ticket']
+        response = Client().get('/api/events/', {'ticket': ticket, **params})
+        self.assertEqual(response.status_code, 200)
+        try:
+            return b''.join(response.streaming_content).decode()
+        finally:
+            response.close()
+
+    def test_new_connection_starts_at_latest_event(self):
+        body = self.stream()
+        self.assertIn(f'id: {self.events[-1].id}\n', body)
+        self.assertNotIn('event: job.progress', body)
+
+    def test_reconnect_replays_missed_events(self):
+        body = self.stream(lastEventId=self.events[0].id)
+        self.assertEqual(body.count('event: job.progress'), 2)
+
+    def test_token_in_query_string_is_refused(self):
+        token = Token.objects.create(user=self.user)
+        self.assertEqual(Client().get('/api/events/', {'token': token.key}).status_code, 401)
+
+
+class TokenCacheTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.token = Token.objects.create(user=User.objects.create_user('tester'))
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_revocation_in_another_process_is_honoured(self):
+        key = self.token.key
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 200)
+        # A logout in another server process: the token is gone and only the
+        # shared revocation marker tells this process
+        with mock.patch.object(token_cache, 'invalidate'), mock.patch.object(token_cache, 'invalidate_user'):
+            self.token.delete()
+        self.assertIsNotNone(token_cache.get(key))
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 401)
+
+    def test_hits_return_their_own_user_instance(self):
+        backend = CachedTokenAuthentication()
+        first, _ = backend.authenticate_credentials(self.token.key)
+        second, token = backend.authenticate_credentials(self.token.key)
+        self.assertIsNot(first, second)
+        self.assertIs(token.user, second)
+        self.assertEqual(first.pk, second.pk)
+
+
+class TDigestTests(TestCase):
+    def test_p99_error_against_numpy(self):
+        values = np.random.default_rng(0).lognormal(3, 1, 100_000)
+        merged = TDigest()
+        for chunk in np.array_split(values, 10):
+            merged = merged.merge(TDigest.from_values(chunk))
+        expected = np.percentile(values, 99)
+        for digest in (TDigest.from_values(values), merged):
+            self.assertLess(abs(digest.quantile(0.99) - expected) / expected, 0.01)
+
+
+class FastJSONRendererTests(TestCase):
+    def test_matches_stdlib_renderer(self):
+        data = {'name': 'Pump\u2028A\u2029', 'value': 1.5, 'date': timezone.now(), 'items': [1, None]}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_non_finite_floats_render_as_null(self):
+        # The stdlib renderer refuses them (STRICT_JSON)
+        data = {'nan': float('nan'), 'inf': float('inf'), 'array': np.array([np.nan, 1.0])}
+        self.assertEqual(json.loads(FastJSONRenderer().render(data)), {'nan': None, 'inf': None, 'array': [None, 1.0]})
+
+
+@override_settings(CPU_POOL_WORKERS=1, CPU_POOL_MAX_QUEUE=0)
+class CPUPoolTests(TestCase):
+    def tearDown(self):
+        if pool._pool is not None:
+            pool._discard(pool._pool[0])
+
+    def test_broken_pool_is_replaced_with_its_own_slots(self):
+        with self.assertRaises(BrokenProcessPool):
+            pool.run(os._exit, 1)
+        # The dead pool's task gives its slot back to the dead pool, not to this one
+        self.assertEqual(pool.run(abs, -2), 2)
+        self.assertEqual(pool.run(abs, -3), 3)
+        executor, slots = pool._get_pool()
+        self.assertTrue(slots.acquire(blocking=False))
+        self.assertFalse(slots.acquire(blocking=False))
+        slots.release()
+
+
+class PoolFailureTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('tester'))
+
+    def test_pool_failures_are_not_reported_as_bad_uploads(self):
+        for error, code in ((TimeoutError(), 504), (BrokenProcessPool(), 503)):
+            with self.subTest(code=code), mock.patch('equipment.ingest.pool.run', side_effect=error):
+                response = upload(self.client)
+            self.assertEqual(response.status_code, code)
+            self.assertTrue(response.json()['error'])
+
+
+class ValidationTests(TestCase):
+    def test_rows_are_numbered_past_blank_lines(self):
+        content = (
+            b'Equipment Name,Type,Flowrate,Pressure,Temperature\n'
+            b'Pump-1,Pump,120.5,5.2,110.0\n'
+            b'\n'
+            b'Pump-2,Pump,abc,5.0,112.5\n'
+        )
+        df, report = parse_csv_file(io.BytesIO(content))
+        self.assertEqual(report['errors']['not_numeric']['rows'], [2])
+        self.assertIn('(row 2)', describe_report(report))
@@ -0,0 +1,104 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler
+
+CHUNK_SUFFIX = '.chunk'
+
+
+def new_content_hasher():
+    """Hash object used to fingerprint uploaded content"""
+    return hashlib.blake2b(digest_size=32)
+
+
+class ContentHashUploadHandler(FileUploadHandler):
+    """
+    Hash every uploaded file while it is being received.
+
+    The handler passes all data through untouched, so the handlers after it
+    still store the file. Digests are collected on request.upload_hashes,
+    keyed by form field name.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.request.upload_hashes = {}
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = new_content_hasher()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        self.request.upload_hashes[self.field_name] = self.hasher.hexdigest()
+        return None
+
+
+def session_dir(session):
+    """Directory holding the received chunks of an upload session"""
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, str(session.id))
+
+
+def received_chunks(session):
+    """Sorted indexes of the chunks already stored for a session"""
+    try:
+        names = os.listdir(session_dir(session))
+    except FileNotFoundError:
+        return []
+    return sorted(int(name[:-len(CHUNK_SUFFIX)]) for name in names if name.endswith(CHUNK_SUFFIX))
+
+
+def missing_chunks(session):
+    """Indexes of the chunks still to be uploaded for a session"""
+    received = set(received_chunks(session))
+    return [index for index in range(session.total_chunks) if index not in received]
+
+
+def store_chunk(session, index, data):
+    """
+    Write one chunk to disk. Chunks are written to a temporary file and
+    renamed into place, so a dropped connection never leaves a partial chunk
+    and parallel uploads of different chunks never interfere.
+    """
+    directory = session_dir(session)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{index}{CHUNK_SUFFIX}')
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def assemble_chunks(session):
+    """
+    Concatenate all chunks into one file, hashing while writing.
+    Returns the assembled file path and its hex digest.
+    """
+    directory = session_dir(session)
+    path = os.path.join(directory, 'assembled.upload')
+    hasher = new_content_hasher()
+    with open(path, 'wb') as out:
+        for index in range(session.total_chunks):
+            with open(os.path.join(directory, f'{index}{CHUNK_SUFFIX}'), 'rb') as chunk:
+                while True:
+                    block = chunk.read(1024 * 1024)
+                    if not block:
+                        break
+                    hasher.update(block)
+                    out.write(block)
+    return path, hasher.hexdigest()
+
+
+def discard_session_files(session):
+    """Remove every file stored for an upload session"""
+    shutil.rmtree(session_dir(session), ignore_errors=True)
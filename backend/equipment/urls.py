@@ -1,10 +1,29 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import DatasetViewSet
+from .views import DatasetViewSet, ChunkedUploadViewSet, metrics, event_stream, event_ticket
 
 router = DefaultRouter()
 router.register(r'datasets', DatasetViewSet, basename='dataset')
+router.register(r'uploads', ChunkedUploadViewSet, basename='upload')
 
-urlpatterns = [
+urlpatterns = []
+
+if settings.ASYNC_VIEWS:
+    from . import async_views
+    
+    # Registered ahead of the router so they take precedence for GET requests
+    urlpatterns += [
+        path('datasets/', async_views.dataset_list),
+        path('datasets/statistics/', async_views.dataset_statistics),
+        path('datasets/<int:pk>/summary/', async_views.dataset_summary),
+        path('datasets/<int:pk>/export/', async_views.dataset_export),
+        path('events/', async_views.event_stream),
+    ]
+
+urlpatterns += [
+    path('metrics/', metrics, name='metrics'),
+    path('events/', event_stream, name='events'),
+    path('events/ticket/', event_ticket, name='event-ticket'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,113 +1,275 @@
 import pandas as pd
+import copy
+import csv
 import io
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-
-def parse_csv_file(file):
-    """Parse uploaded CSV file and return DataFrame"""
+from django.conf import settings
+from django.utils.module_loading import import_string
+from .sketches import TDigest, HyperLogLog
+from .anomalies import FLAG_COLUMN
+from .compression import open_decompressed
+from .validation import REQUIRED_COLUMNS, validate_frame
+
+SKETCH_COLUMNS = {
+    'flowrate': 'Flowrate',
+    'pressure': 'Pressure',
+    'temperature': 'Temperature',
+}
+SUMMARY_PERCENTILES = [0.5, 0.95, 0.99]
+GROUP_COLUMNS = {
+    'equipment_type': 'Type',
+    'equipment_name': 'Equipment Name',
+}
+
+def read_csv_file(file, compression=None):
+    """Read an uploaded CSV file (optionally gzip or zstd compressed) without validating it"""
     try:
-        content = file.read()
-        df = pd.read_csv(io.BytesIO(content))
-        
-        required_cols = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
-        missing_cols = [col for col in required_cols if col not in df.columns]
-        
-        if missing_cols:
-            raise ValueError(f"Missing required columns: {', '.join(missing_cols)}")
-        
-        df = df.dropna()
-        return df
+        # Read straight from the file object so compressed uploads are
+        # decompressed as a stream instead of being buffered first.
+        # Whitespace-only fields are read as blanks. Names stay plain
+        # objects, which hash faster than pandas strings when checked for
+        # duplicates and dictionary-encoded.
+        df = pd.read_csv(open_decompressed(file, compression),
+                         dtype={'Type': 'category', 'Equipment Name': object},
+                         skipinitialspace=True)
     except Exception as e:
         raise ValueError(f"Error parsing CSV: {str(e)}")
+    
+    missing_cols = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing_cols:
+        raise ValueError(f"Error parsing CSV: Missing required columns: {', '.join(missing_cols)}")
+    return df
+
+def parse_csv_file(file, compression=None):
+    """
+    Parse uploaded CSV file (optionally gzip or zstd compressed) and return
+    the DataFrame of valid rows with its validation report
+    """
+    return validate_frame(read_csv_file(file, compression))
+
+EXPORT_COLUMNS = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+EXPORT_FIELDS = ['equipment_name__name', 'equipment_type__name', 'flowrate', 'pressure', 'temperature']
+
+def format_csv_rows(rows, header=False):
+    """Format a batch of record tuples as CSV bytes"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+def iter_csv_export(rows, batch_size=2000):
+    """Stream record tuples as CSV, one batch of rows per chunk"""
+    yield format_csv_rows([], header=True)
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield format_csv_rows(batch)
+            batch = []
+    if batch:
+        yield format_csv_rows(batch)
+
+def run_ingest_stages(df, stages=None):
+    """Run the configured ingest stages over a parsed DataFrame"""
+    for path in settings.INGEST_STAGES if stages is None else stages:
+        df = import_string(path)(df)
+    return df
+
+def build_sketches(df):
+    """Build mergeable quantile and distinct-count sketches from DataFrame"""
+    sketches = {
+        field: TDigest.from_values(df[column].to_numpy(dtype=float))
+        for field, column in SKETCH_COLUMNS.items()
+    }
+    sketches['equipment_name'] = HyperLogLog.from_values(df['Equipment Name'])
+    return sketches
+
+def serialize_sketches(sketches):
+    """Convert sketches to a JSON compatible dict"""
+    return {name: sketch.to_dict() for name, sketch in sketches.items()}
+
+def deserialize_sketches(data):
+    """Rebuild sketches from their JSON compatible dict"""
+    sketches = {
+        field: TDigest.from_dict(data[field])
+        for field in SKETCH_COLUMNS if field in data
+    }
+    if 'equipment_name' in data:
+        sketches['equipment_name'] = HyperLogLog.from_dict(data['equipment_name'])
+    return sketches
+
+def merge_sketches(sketch_dicts):
+    """Merge several datasets' sketches into one set of sketches"""
+    merged = {}
+    for sketches in sketch_dicts:
+        for name, sketch in sketches.items():
+            merged[name] = merged[name].merge(sketch) if name in merged else sketch
+    return merged
+
+def sketch_percentiles(sketches, quantiles=SUMMARY_PERCENTILES):
+    """Read approximate percentiles of every numeric field from sketches"""
+    percentiles = {}
+    for field in SKETCH_COLUMNS:
+        digest = sketches.get(field)
+        if digest is None or not digest.count:
+            continue
+        values = digest.quantile(quantiles)
+        percentiles[field] = {
+            f"p{q * 100:g}": round(float(value), 2)
+            for q, value in zip(quantiles, values)
+        }
+    return percentiles
 
-def calculate_summary_stats(df):
+def calculate_summary_stats(df, sketches=None):
     """Calculate summary statistics from DataFrame"""
+    if sketches is None:
+        sketches = build_sketches(df)
     summary = {
         'total_count': len(df),
-        'avg_flowrate': round(df['Flowrate'].mean(), 2),
-        'avg_pressure': round(df['Pressure'].mean(), 2),
-        'avg_temperature': round(df['Temperature'].mean(), 2),
-        'min_flowrate': round(df['Flowrate'].min(), 2),
-        'max_flowrate': round(df['Flowrate'].max(), 2),
-        'min_pressure': round(df['Pressure'].min(), 2),
-        'max_pressure': round(df['Pressure'].max(), 2),
-        'min_temperature': round(df['Temperature'].min(), 2),
-        'max_temperature': round(df['Temperature'].max(), 2),
-        'equipment_types': df['Type'].value_counts().to_dict()
+        'avg_flowrate': round(float(df['Flowrate'].mean()), 2),
+        'avg_pressure': round(float(df['Pressure'].mean()), 2),
+        'avg_temperature': round(float(df['Temperature'].mean()), 2),
+        'min_flowrate': round(float(df['Flowrate'].min()), 2),
+        'max_flowrate': round(float(df['Flowrate'].max()), 2),
+        'min_pressure': round(float(df['Pressure'].min()), 2),
+        'max_pressure': round(float(df['Pressure'].max()), 2),
+        'min_temperature': round(float(df['Temperature'].min()), 2),
+        'max_temperature': round(float(df['Temperature'].max()), 2),
+        'equipment_types': {k: int(v) for k, v in df['Type'].value_counts().items() if v},
+        'percentiles': sketch_percentiles(sketches),
+        'distinct_equipment': sketches['equipment_name'].estimate()
     }
+    if FLAG_COLUMN in df.columns:
+        summary['anomaly_count'] = int(df[FLAG_COLUMN].sum())
     return summary
 
-def generate_pdf_report(dataset, buffer):
-    """Generate PDF report for a dataset"""
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
-    story = []
-    
-    title = Paragraph("Chemical Equipment Analysis Report", styles['Heading1'])
-    story.append(title)
-    story.append(Spacer(1, 0.2*inch))
-    
-    info = [
-        Paragraph(f"<b>Filename:</b> {dataset.filename}", styles['Normal']),
-        Paragraph(f"<b>Upload Date:</b> {dataset.upload_date.strftime('%Y-%m-%d %H:%M')}", styles['Normal']),
-        Paragraph(f"<b>Total Records:</b> {dataset.row_count}", styles['Normal']),
-    ]
-    for item in info:
-        story.append(item)
-        story.append(Spacer(1, 0.1*inch))
-    
-    story.append(Spacer(1, 0.3*inch))
-    
-    summary = dataset.get_summary()
-    summary_title = Paragraph("<b>Summary Statistics</b>", styles['Heading2'])
-    story.append(summary_title)
-    story.append(Spacer(1, 0.2*inch))
-    
-    summary_data = [
-        ['Parameter', 'Average', 'Min', 'Max'],
-        ['Flowrate', f"{summary['avg_flowrate']}", f"{summary['min_flowrate']}", f"{summary['max_flowrate']}"],
-        ['Pressure', f"{summary['avg_pressure']}", f"{summary['min_pressure']}", f"{summary['max_pressure']}"],
-        ['Temperature', f"{summary['avg_temperature']}", f"{summary['min_temperature']}", f"{summary['max_temperature']}"],
-    ]
-    
-    summary_table = Table(summary_data, colWidths=[2*inch, 1.5*inch, 1.5*inch, 1.5*inch])
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    story.append(summary_table)
-    story.append(Spacer(1, 0.3*inch))
-    
-    types_title = Paragraph("<b>Equipment Type Distribution</b>", styles['Heading2'])
-    story.append(types_title)
-    story.append(Spacer(1, 0.2*inch))
-    
-    types_data = [['Equipment Type', 'Count']]
-    for eq_type, count in summary['equipment_types'].items():
-        types_data.append([eq_type, str(count)])
+def calculate_group_aggregates(df):
+    """
+    Calculate count, sum, sum of squares, min and max of every parameter per
+    equipment type and per equipment name. Sums are kept instead of means
+    and standard deviations so that the aggregates of several uploads can
+    be merged.
+    """
+    aggregates = {}
+    parameters = df[list(SKETCH_COLUMNS.values())]
+    for group, column in GROUP_COLUMNS.items():
+        grouped = parameters.groupby(df[column], sort=False, observed=True)
+        frames = {name: grouped.agg(name) for name in ('sum', 'min', 'max')}
+        # Groups come in the same first-seen order as above
+        frames['sumsq'] = (parameters ** 2).groupby(df[column], sort=False, observed=True).sum()
+        counts = grouped.size()
+        # Whole columns are converted once; a cell lookup per group takes
+        # minutes when every equipment name is its own group
+        columns = {
+            (field, name): frame[col].astype(float).tolist()
+            for name, frame in frames.items()
+            for field, col in SKETCH_COLUMNS.items()
+        }
+        aggregates[group] = {
+            str(key): {
+                'count': count,
+                **{
+                    field: {name: columns[field, name][i] for name in frames}
+                    for field in SKETCH_COLUMNS
+                }
+            }
+            for i, (key, count) in enumerate(zip(counts.index, counts.tolist()))
+        }
+    return aggregates
+
+def merge_group_aggregates(base, extra):
+    """Merge the per-group aggregates of new rows into a dataset's stored ones"""
+    merged = copy.deepcopy(base)
+    for group, groups in extra.items():
+        target = merged.setdefault(group, {})
+        for key, stats in groups.items():
+            current = target.get(key)
+            if current is None:
+                target[key] = copy.deepcopy(stats)
+                continue
+            current['count'] += stats['count']
+            for field in SKETCH_COLUMNS:
+                current[field]['sum'] += stats[field]['sum']
+                current[field]['min'] = min(current[field]['min'], stats[field]['min'])
+                current[field]['max'] = max(current[field]['max'], stats[field]['max'])
+                # Aggregates stored before sums of squares were kept have none
+                if 'sumsq' in current[field] and 'sumsq' in stats[field]:
+                    current[field]['sumsq'] += stats[field]['sumsq']
+                else:
+                    current[field].pop('sumsq', None)
+    return merged
+
+def summary_from_aggregates(aggregates, sketches, anomaly_count=None):
+    """
+    Build the summary statistics of a dataset from its per-type aggregates
+    and sketches, the same figures calculate_summary_stats reads off the rows.
+    """
+    by_type = aggregates.get('equipment_type', {})
+    total = sum(stats['count'] for stats in by_type.values())
+    summary = {'total_count': total}
+    for field in SKETCH_COLUMNS:
+        values = sum(stats[field]['sum'] for stats in by_type.values())
+        summary[f'avg_{field}'] = round(values / total, 2) if total else None
+    for field in SKETCH_COLUMNS:
+        summary[f'min_{field}'] = round(min(stats[field]['min'] for stats in by_type.values()), 2)
+        summary[f'max_{field}'] = round(max(stats[field]['max'] for stats in by_type.values()), 2)
+    summary['equipment_types'] = {
+        key: stats['count']
+        for key, stats in sorted(by_type.items(), key=lambda item: -item[1]['count'])
+        if stats['count']
+    }
+    summary['percentiles'] = sketch_percentiles(sketches)
+    summary['distinct_equipment'] = sketches['equipment_name'].estimate()
+    if anomaly_count is not None:
+        summary['anomaly_count'] = anomaly_count
+    return summary
+
+def compare_group_aggregates(aggregate_dicts, group):
+    """
+    Align several datasets' per-group aggregates on a shared list of labels.
+    Returns the labels and one series of means and deltas from the first
+    dataset per dataset; groups missing from a dataset are None.
+    """
+    labels = sorted({key for aggregates in aggregate_dicts for key in aggregates.get(group, {})})
+    baseline = aggregate_dicts[0].get(group, {}) if aggregate_dicts else {}
     
-    types_table = Table(types_data, colWidths=[4*inch, 2*inch])
-    types_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    story.append(types_table)
+    def mean(stats, field):
+        if not stats or not stats['count']:
+            return None
+        return round(stats[field]['sum'] / stats['count'], 2)
     
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
\ No newline at end of file
+    series = []
+    for aggregates in aggregate_dicts:
+        groups = aggregates.get(group, {})
+        entry = {'count': [groups[label]['count'] if label in groups else 0 for label in labels]}
+        for field in SKETCH_COLUMNS:
+            values = [mean(groups.get(label), field) for label in labels]
+            base = [mean(baseline.get(label), field) for label in labels]
+            entry[field] = values
+            entry[f'{field}_delta'] = [
+                round(v - b, 2) if v is not None and b is not None else None
+                for v, b in zip(values, base)
+            ]
+        series.append(entry)
+    return {'labels': labels, 'series': series}
+
+def rollup_statistics(summaries):
+    """
+    Combine (row_count, summary) pairs of datasets into overall statistics,
+    so the rollup reads the stored summaries instead of scanning records.
+    """
+    total_records = 0
+    type_counts = {}
+    for row_count, summary in summaries:
+        total_records += row_count
+        for eq_type, count in summary.get('equipment_types', {}).items():
+            type_counts[eq_type] = type_counts.get(eq_type, 0) + count
+    return {
+        'total_datasets': len(summaries),
+        'total_records': total_records,
+        'type_distribution': [
+            {'equipment_type': eq_type, 'count': count}
+            for eq_type, count in sorted(type_counts.items(), key=lambda item: (-item[1], item[0]))
+        ]
+    }
@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+REQUIRED_COLUMNS = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+NUMERIC_COLUMNS = ['Flowrate', 'Pressure', 'Temperature']
+
+MISSING_VALUE = 'missing_value'
+NOT_NUMERIC = 'not_numeric'
+OUT_OF_RANGE = 'out_of_range'
+UNKNOWN_TYPE = 'unknown_type'
+DUPLICATE_NAME = 'duplicate_name'
+
+# Failing rows are reported by their position among the data rows read,
+# counting from 1. File line numbers would be off after blank lines, which
+# the reader skips, and after quoted fields spanning several lines.
+FIRST_ROW = 1
+
+
+class CSVValidationError(ValueError):
+    """An upload rejected by validation, with the report of what failed"""
+
+    def __init__(self, message, report):
+        super().__init__(message)
+        self.report = report
+
+    def __reduce__(self):
+        # Raised in CPU pool workers and pickled back to the web process
+        return self.__class__, (str(self), self.report)
+
+
+def validate_frame(df, config=None):
+    """
+    Check every row of a parsed upload and return the valid rows with a
+    validation report.
+
+    All rules run over whole columns at once: blank required fields,
+    parameters that are not finite numbers, parameters outside a configured
+    range, types outside the allowed list and repeated equipment names.
+    Rows failing an error rule are dropped, or the upload is rejected with
+    ON_ERROR='reject'. Repeated names are only reported unless
+    DUPLICATE_NAMES='drop', which keeps the first row of each name.
+    """
+    config = config or settings.CSV_VALIDATION
+    rows = len(df)
+    errors = {}
+    warnings = {}
+
+    missing = {column: df[column].isna().to_numpy() for column in REQUIRED_COLUMNS}
+    _add_rule(errors, MISSING_VALUE, missing, config)
+
+    not_numeric = {}
+    out_of_range = {}
+    coerced = {}
+    for column in NUMERIC_COLUMNS:
+        values = df[column]
+        if not pd.api.types.is_float_dtype(values.dtype):
+            values = coerced[column] = pd.to_numeric(values, errors='coerce').astype(float)
+        values = values.to_numpy()
+        # Blank fields are counted as missing, not as unparseable
+        not_numeric[column] = ~np.isfinite(values) & ~missing[column]
+
+        low, high = config['RANGES'].get(column, (None, None))
+        if low is not None or high is not None:
+            bad = np.zeros(rows, dtype=bool)
+            if low is not None:
+                bad |= values < low
+            if high is not None:
+                bad |= values > high
+            out_of_range[column] = bad
+    _add_rule(errors, NOT_NUMERIC, not_numeric, config)
+    _add_rule(errors, OUT_OF_RANGE, out_of_range, config)
+
+    if config['ALLOWED_TYPES']:
+        unknown = ~df['Type'].isin(config['ALLOWED_TYPES']).to_numpy() & ~missing['Type']
+        _add_rule(errors, UNKNOWN_TYPE, {'Type': unknown}, config)
+
+    if config['DUPLICATE_NAMES'] != 'ignore':
+        duplicate = df['Equipment Name'].duplicated().to_numpy() & ~missing['Equipment Name']
+        rules = errors if config['DUPLICATE_NAMES'] == 'drop' else warnings
+        _add_rule(rules, DUPLICATE_NAME, {'Equipment Name': duplicate}, config)
+
+    invalid = np.zeros(rows, dtype=bool)
+    for rule in errors.values():
+        invalid |= rule.pop('mask')
+    for rule in warnings.values():
+        del rule['mask']
+
+    report = {
+        'rows_read': rows,
+        'rows_dropped': int(invalid.sum()),
+        'errors': errors,
+        'warnings': warnings,
+    }
+    if report['rows_dropped'] and config['ON_ERROR'] == 'reject':
+        raise CSVValidationError(f'CSV validation failed: {describe_report(report)}', report)
+    if report['rows_dropped'] == rows:
+        raise CSVValidationError(f'CSV has no valid rows: {describe_report(report)}', report)
+
+    if coerced:
+        df = df.assign(**coerced)
+    if report['rows_dropped']:
+        df = df[~invalid]
+    return df, report
+
+
+def _add_rule(rules, name, masks, config):
+    """Record a rule from its per-column masks of failing rows, if any row fails"""
+    columns = {column: int(mask.sum()) for column, mask in masks.items()}
+    if not any(columns.values()):
+        return
+    failed = np.zeros(len(next(iter(masks.values()))), dtype=bool)
+    for mask in masks.values():
+        failed |= mask
+    row_numbers = np.flatnonzero(failed)[:config['MAX_ROW_NUMBERS']] + FIRST_ROW
+    rules[name] = {
+        'count': int(failed.sum()),
+        'columns': {column: count for column, count in columns.items() if count},
+        'rows': row_numbers.tolist(),
+        'mask': failed,
+    }
+
+
+def describe_report(report):
+    """One line summary of the failed rules, for error messages"""
+    parts = []
+    for name, rule in {**report['errors'], **report['warnings']}.items():
+        row_numbers = ', '.join(map(str, rule['rows']))
+        more = ', ...' if rule['count'] > len(rule['rows']) else ''
+        rows = 'row' if rule['count'] == 1 else 'rows'
+        parts.append(f"{name.replace('_', ' ')} in {rule['count']} {rows} ({rows} {row_numbers}{more})")
+    return '; '.join(parts) or 'no problems found'
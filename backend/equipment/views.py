@@ -2,14 +2,38 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from django.http import FileResponse
-from django.db.models import Count
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from .models import Dataset, EquipmentRecord
-from .serializers import DatasetSerializer, DatasetDetailSerializer, EquipmentRecordSerializer
-from .utils import parse_csv_file, calculate_summary_stats, generate_pdf_report
+from .models import Dataset, UploadSession
+from .serializers import (
+    DatasetSerializer, DatasetDetailSerializer, UploadSessionSerializer,
+    ANOMALY_RECORD_FIELDS, record_rows, record_values
+)
+from .utils import (
+    deserialize_sketches, merge_sketches, sketch_percentiles,
+    compare_group_aggregates, iter_csv_export, EXPORT_FIELDS, rollup_statistics
+)
+from .reports import render_pdf_report
+from .ingest import ingest_csv, append_csv, find_duplicate
+from .compression import is_csv_filename
+from .uploads import (
+    store_chunk, received_chunks, missing_chunks, assemble_chunks, discard_session_files
+)
+from .events import publish, publish_progress, stream_events, acquire_stream_slot, DATASET_DELETED
+from .authentication import authenticate_stream, issue_stream_ticket
+from .aggregates import compute_aggregates, parse_aggregates, parse_fields, parse_group_by, parse_quantiles
+from . import admission, pool
+from .admission import AdmissionRejected
+from .pool import POOL_FAILURES, PoolSaturated
+from .validation import CSVValidationError
+from .routers import pin_to_primary, use_replica
 import io
-import traceback
+import json
+import re
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
 
 # ============= AUTHENTICATION VIEWS =============
 from django.contrib.auth.models import User
@@ -113,11 +137,127 @@ def login(request):
             status=status.HTTP_401_UNAUTHORIZED
         )
 
+
+@api_view(['POST'])
+def logout(request):
+    """Delete the caller's token so it can no longer be used"""
+    request.auth.delete()
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+# ============= CPU POOL =============
+
+def pool_failed_response(error):
+    """504 for work that ran past CPU_POOL_TIMEOUT, 503 for work lost with a crashed pool process"""
+    if isinstance(error, TimeoutError):
+        return Response(
+            {'error': f'Processing did not finish within {settings.CPU_POOL_TIMEOUT} seconds'},
+            status=status.HTTP_504_GATEWAY_TIMEOUT
+        )
+    return Response(
+        {'error': 'Processing was interrupted on the server, please retry'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': str(settings.CPU_POOL_RETRY_AFTER)}
+    )
+
+
+def pool_saturated_response(error):
+    """503 telling the client when to retry work the CPU pool had no room for"""
+    return Response(
+        {'error': str(error)},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': str(error.retry_after)}
+    )
+
+
+@api_view(['GET'])
+def metrics(request):
+    """CPU pool and admission control queue depths and counters of this server process"""
+    return Response({'cpu_pool': pool.metrics(), 'admission': admission.metrics()})
+
+
+# ============= ADMISSION CONTROL =============
+
+def admission_rejected_response(error):
+    """429 or 503 telling the client when to retry a heavy request that was not admitted"""
+    return Response(
+        {'error': str(error)},
+        status=error.status,
+        headers={'Retry-After': str(error.retry_after)}
+    )
+
+
+class AdmissionControlMixin:
+    """
+    Admit the heavy actions in admission_classes (action name -> class in
+    settings.ADMISSION_CLASSES) through equipment.admission before they run.
+    Rejections are answered before the request body is read.
+    """
+    admission_classes = {}
+    
+    def dispatch(self, request, *args, **kwargs):
+        self.admission_ticket = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            # Also after an unhandled exception
+            if self.admission_ticket is not None:
+                self.admission_ticket.release()
+    
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        name = self.admission_classes.get(self.action)
+        if name:
+            self.admission_ticket = admission.admit(name, request.user)
+    
+    def handle_exception(self, exc):
+        if isinstance(exc, AdmissionRejected):
+            return admission_rejected_response(exc)
+        return super().handle_exception(exc)
+
+
 # ============= DATASET VIEWS =============
 
-class DatasetViewSet(viewsets.ModelViewSet):
+def ingest_failed_response(error):
+    """400 for an upload that could not be ingested, with the validation report if it was rejected"""
+    body = {'error': str(error)}
+    if isinstance(error, CSVValidationError):
+        body['validation'] = error.report
+    return Response(body, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ReplicaReadMixin:
+    """
+    Serve the read-only actions in replica_actions from a read replica,
+    and keep a user's reads on the primary for a while after one of the
+    pinning_actions succeeds, so they see their own changes
+    """
+    replica_actions = ()
+    pinning_actions = ()
+    
+    def initial(self, request, *args, **kwargs):
+        # Authentication reads the token from the primary first
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions:
+            use_replica(request.user)
+    
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self.action in self.pinning_actions and response.status_code < 400:
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class DatasetViewSet(AdmissionControlMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """ViewSet for managing datasets"""
     queryset = Dataset.objects.all()
+    admission_classes = {'upload': 'upload', 'append': 'upload', 'download_pdf': 'report'}
+    replica_actions = (
+        'list', 'retrieve', 'summary', 'export', 'download_pdf', 'aggregate',
+        'quantiles', 'compare', 'anomalies', 'statistics'
+    )
+    pinning_actions = ('create', 'update', 'partial_update', 'destroy', 'upload', 'append')
+    # Actions that read the stored sketches and aggregates of a dataset
+    blob_actions = ('download_pdf', 'quantiles', 'compare')
     
     def get_permissions(self):
         """
@@ -134,10 +274,18 @@ class DatasetViewSet(viewsets.ModelViewSet):
         return DatasetSerializer
     
     def get_queryset(self):
-        """Return datasets based on action"""
+        """Return the requesting user's datasets based on action"""
+        datasets = Dataset.objects.filter(user=self.request.user)
+        if self.action not in self.blob_actions:
+            datasets = datasets.defer(*Dataset.BLOB_FIELDS)
         if self.action == 'list':
-            return Dataset.objects.all().order_by('-id')[:5]
-        return Dataset.objects.all()
+            return datasets.order_by('-id')[:5]
+        return datasets
+    
+    def perform_destroy(self, instance):
+        dataset_id = instance.id
+        instance.delete()
+        publish(self.request.user, DATASET_DELETED, {'id': dataset_id})
     
     def retrieve(self, request, *args, **kwargs):
         """Override retrieve to handle non-existent datasets gracefully"""
@@ -165,64 +313,96 @@ class DatasetViewSet(viewsets.ModelViewSet):
         
         file = request.FILES['file']
         
-        if not file.name.endswith('.csv'):
+        if not is_csv_filename(file.name):
             return Response(
-                {'error': 'Only CSV files are allowed'}, 
+                {'error': 'Only CSV files (.csv, .csv.gz, .csv.zst) are allowed'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # Re-uploads of a retained dataset are answered from the stored copy
+        content_hash = getattr(request, 'upload_hashes', {}).get('file', '')
+        existing = find_duplicate(content_hash, request.user)
+        if existing is not None:
+            serializer = DatasetDetailSerializer(existing)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        
+        job = uuid.uuid4().hex
         try:
-            # Step 1: Parsing CSV
-            df = parse_csv_file(file)
-            
-            # Step 2: Calculating summary statistics
-            summary = calculate_summary_stats(df)
-            
-            # Step 3: Maintaining last 5 datasets
-            old_datasets = Dataset.objects.all().order_by('-id')[4:]
-            for old in old_datasets:
-                old.delete()
+            dataset = ingest_csv(file, file.name, request.user, content_hash, job=job)
             
-            # Step 4: Creating dataset in database
-            dataset = Dataset.objects.create(
-                filename=file.name,
-                row_count=len(df)
-            )
-            dataset.set_summary(summary)
-            dataset.save()
-            
-            # Step 5: Creating equipment records
-            records = []
-            for _, row in df.iterrows():
-                records.append(EquipmentRecord(
-                    dataset=dataset,
-                    equipment_name=row.get('Equipment Name', 'N/A'),
-                    equipment_type=row.get('Type', 'N/A'),
-                    flowrate=row.get('Flowrate', 0),
-                    pressure=row.get('Pressure', 0),
-                    temperature=row.get('Temperature', 0)
-                ))
-            
-            EquipmentRecord.objects.bulk_create(records)
-            
-            # Step 6: Serializing response
             serializer = DatasetDetailSerializer(dataset)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
             
+        except PoolSaturated as e:
+            return pool_saturated_response(e)
+        except POOL_FAILURES as e:
+            response = pool_failed_response(e)
+            publish_progress(request.user, job, file.name, 'failed', error=response.data['error'])
+            return response
         except Exception as e:
+            publish_progress(request.user, job, file.name, 'failed', error=str(e))
+            return ingest_failed_response(e)
+    
+    @action(detail=True, methods=['post'])
+    def append(self, request, pk=None):
+        """Append the rows of an uploaded CSV file to an existing dataset"""
+        dataset = get_object_or_404(self.get_queryset(), pk=pk)
+        if 'file' not in request.FILES:
+            return Response(
+                {'error': 'No file provided'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        file = request.FILES['file']
+        
+        if not is_csv_filename(file.name):
             return Response(
-                {'error': str(e)}, 
+                {'error': 'Only CSV files (.csv, .csv.gz, .csv.zst) are allowed'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
+        
+        job = uuid.uuid4().hex
+        try:
+            dataset = append_csv(dataset, file, file.name, request.user, job=job)
+            return Response(DatasetSerializer(dataset).data)
+            
+        except PoolSaturated as e:
+            return pool_saturated_response(e)
+        except POOL_FAILURES as e:
+            response = pool_failed_response(e)
+            publish_progress(request.user, job, file.name, 'failed', error=response.data['error'])
+            return response
+        except Exception as e:
+            publish_progress(request.user, job, file.name, 'failed', error=str(e))
+            return ingest_failed_response(e)
+    
+    @action(detail=True, methods=['get'])
+    def summary(self, request, pk=None):
+        """Return dataset metadata and summary statistics without records"""
+        dataset = get_object_or_404(self.get_queryset(), pk=pk)
+        return Response(DatasetSerializer(dataset).data)
+    
+    @action(detail=True, methods=['get'])
+    def export(self, request, pk=None):
+        """Stream all records of a dataset as CSV"""
+        dataset = get_object_or_404(self.get_queryset(), pk=pk)
+        rows = dataset.records.order_by('id').values_list(*EXPORT_FIELDS).iterator(chunk_size=2000)
+        
+        response = StreamingHttpResponse(iter_csv_export(rows), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="dataset_{dataset.id}.csv"'
+        return response
     
     @action(detail=True, methods=['get'])
     def download_pdf(self, request, pk=None):
         """Generate and download PDF report"""
-        dataset = get_object_or_404(Dataset, pk=pk)
+        dataset = get_object_or_404(self.get_queryset(), pk=pk)
         
-        buffer = io.BytesIO()
-        generate_pdf_report(dataset, buffer)
-        buffer.seek(0)
+        try:
+            buffer = io.BytesIO(pool.run(render_pdf_report, dataset))
+        except PoolSaturated as e:
+            return pool_saturated_response(e)
+        except POOL_FAILURES as e:
+            return pool_failed_response(e)
         
         response = FileResponse(
             buffer, 
@@ -232,19 +412,346 @@ class DatasetViewSet(viewsets.ModelViewSet):
         )
         return response
     
+    @action(detail=True, methods=['get'])
+    def aggregate(self, request, pk=None):
+        """
+        Aggregate records grouped by equipment type or name
+        
+        Query parameters:
+            group_by: equipment_type (default) or equipment_name
+            agg: comma separated list of count, mean, min, max, std, p50, p95, ...
+            fields: comma separated list of flowrate, pressure, temperature
+        """
+        dataset = get_object_or_404(self.get_queryset(), pk=pk)
+        
+        # Only the parameters are validated here; errors raised while
+        # aggregating are server errors, not bad requests
+        try:
+            group_by = parse_group_by(request.query_params.get('group_by'))
+            aggregates = parse_aggregates(request.query_params.get('agg'))
+            fields = parse_fields(request.query_params.get('fields'))
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        groups = compute_aggregates(dataset, group_by, aggregates, fields)
+        
+        return Response({
+            'dataset': dataset.id,
+            'group_by': group_by,
+            'aggregates': aggregates,
+            'fields': fields,
+            'groups': groups
+        })
+    
     @action(detail=False, methods=['get'])
-    def statistics(self, request):
-        """Get overall statistics across all datasets"""
-        total_datasets = Dataset.objects.count()
-        total_records = EquipmentRecord.objects.count()
+    def quantiles(self, request):
+        """
+        Approximate quantiles and distinct equipment count from stored sketches
         
-        # Type distribution across all datasets
-        type_counts = list(EquipmentRecord.objects.values('equipment_type').annotate(
-            count=Count('equipment_type')
-        ).order_by('-count'))
+        Query parameters:
+            ids: comma separated dataset ids (defaults to all datasets)
+            q: comma separated quantiles between 0 and 1 (default 0.5,0.95,0.99)
+        """
+        try:
+            ids = [int(i) for i in request.query_params.get('ids', '').split(',') if i.strip()]
+        except ValueError:
+            return Response(
+                {'error': 'ids must be a comma separated list of dataset ids'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            quantiles = parse_quantiles(request.query_params.get('q'))
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        rows = self.get_queryset()
+        if ids:
+            rows = rows.filter(pk__in=ids)
+        rows = list(rows.values_list('id', 'sketches'))
+        
+        merged = merge_sketches(
+            deserialize_sketches(json.loads(data or '{}')) for _, data in rows
+        )
+        distinct = merged.get('equipment_name')
         
         return Response({
-            'total_datasets': total_datasets,
-            'total_records': total_records,
-            'type_distribution': type_counts
-        })
\ No newline at end of file
+            'datasets': [pk for pk, _ in rows],
+            'count': merged['flowrate'].count if 'flowrate' in merged else 0,
+            'quantiles': sketch_percentiles(merged, quantiles),
+            'distinct_equipment': distinct.estimate() if distinct else 0
+        })
+    
+    @action(detail=False, methods=['get'])
+    def compare(self, request):
+        """
+        Compare several datasets per equipment type and per equipment
+        
+        Query parameters:
+            ids: comma separated dataset ids; the first one is the baseline
+                 that deltas are computed against
+        """
+        try:
+            ids = [int(i) for i in request.query_params.get('ids', '').split(',') if i.strip()]
+        except ValueError:
+            return Response(
+                {'error': 'ids must be a comma separated list of dataset ids'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if len(ids) < 2:
+            return Response(
+                {'error': 'At least two dataset ids are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        found = self.get_queryset().filter(pk__in=ids).only(
+            'id', 'filename', 'upload_date', 'aggregates'
+        ).in_bulk()
+        missing = [pk for pk in ids if pk not in found]
+        if missing:
+            return Response(
+                {'error': f"Datasets not found: {', '.join(map(str, missing))}"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        datasets = [found[pk] for pk in ids]
+        aggregates = [dataset.get_aggregates() for dataset in datasets]
+        
+        return Response({
+            'baseline': ids[0],
+            'datasets': [
+                {'id': d.id, 'filename': d.filename, 'upload_date': d.upload_date}
+                for d in datasets
+            ],
+            'by_type': compare_group_aggregates(aggregates, 'equipment_type'),
+            'by_equipment': compare_group_aggregates(aggregates, 'equipment_name')
+        })
+    
+    @action(detail=True, methods=['get'])
+    def anomalies(self, request, pk=None):
+        """List records flagged by anomaly detection, highest score first"""
+        dataset = get_object_or_404(self.get_queryset(), pk=pk)
+        records = dataset.records.filter(is_anomaly=True).order_by('-anomaly_score', 'id')
+        
+        page = self.paginate_queryset(record_rows(records, ANOMALY_RECORD_FIELDS))
+        return self.get_paginated_response(record_values(page, ANOMALY_RECORD_FIELDS))
+    
+    @action(detail=False, methods=['get'])
+    def statistics(self, request):
+        """Get overall statistics across the user's datasets"""
+        summaries = [
+            (row_count, json.loads(summary))
+            for row_count, summary in self.get_queryset().values_list('row_count', 'summary_stats')
+        ]
+        return Response(rollup_statistics(summaries))
+
+# ============= EVENT STREAM =============
+
+@api_view(['POST'])
+def event_ticket(request):
+    """Short-lived ticket for opening the event stream with EventSource (?ticket=)"""
+    return Response({
+        'ticket': issue_stream_ticket(request.user),
+        'expires_in': settings.EVENTS_TICKET_MAX_AGE
+    })
+
+
+def event_stream(request):
+    """
+    Server-Sent Events of the user's dataset and job events, authenticated
+    by the token header or a ticket from event_ticket. Under WSGI each
+    stream occupies a worker thread, so a process serves at most
+    EVENTS_SYNC_STREAMS of them (503 beyond that) and streams end after
+    EVENTS_STREAM_DURATION seconds, when the client reconnects.
+    """
+    user = authenticate_stream(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    
+    slots = acquire_stream_slot()
+    if slots is None:
+        return JsonResponse(
+            {'detail': 'Too many event streams on this server, please retry shortly'},
+            status=503, headers={'Retry-After': str(settings.EVENTS_RETRY_MS // 1000)}
+        )
+    
+    response = StreamingHttpResponse(
+        stream_events(request, user, settings.EVENTS_STREAM_DURATION),
+        content_type='text/event-stream'
+    )
+    # Released when the server closes the response, also if the stream never started
+    response._resource_closers.append(slots.release)
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+# ============= CHUNKED UPLOAD VIEWS =============
+
+class ChunkedUploadViewSet(AdmissionControlMixin, ReplicaReadMixin, viewsets.ViewSet):
+    """
+    Resumable chunked upload protocol
+    
+    1. POST   /api/uploads/                       {filename, size, checksum}
+    2. PUT    /api/uploads/{id}/?offset=N         raw chunk bytes, any order, in parallel
+    3. GET    /api/uploads/{id}/                  received and missing chunks, to resume
+    4. POST   /api/uploads/{id}/finalize/         verify checksum and ingest the CSV
+    
+    The checksum is the hex BLAKE2b (32 byte digest) of the whole file.
+    """
+    permission_classes = [IsAuthenticated]
+    admission_classes = {'finalize': 'upload'}
+    pinning_actions = ('finalize',)
+    
+    def get_session(self, request, pk):
+        return get_object_or_404(UploadSession, pk=pk, user=request.user)
+    
+    def create(self, request):
+        """Start a new upload session"""
+        filename = str(request.data.get('filename', ''))
+        checksum = str(request.data.get('checksum', '')).lower()
+        
+        try:
+            size = int(request.data.get('size'))
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'size must be the file size in bytes'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if not is_csv_filename(filename):
+            return Response(
+                {'error': 'Only CSV files (.csv, .csv.gz, .csv.zst) are allowed'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if not re.fullmatch(r'[0-9a-f]{64}', checksum):
+            return Response(
+                {'error': 'checksum must be a 64 character BLAKE2b hex digest'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if size <= 0 or size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+            return Response(
+                {'error': f'size must be between 1 and {settings.CHUNKED_UPLOAD_MAX_SIZE} bytes'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Drop sessions that were abandoned long enough ago
+        expired = UploadSession.objects.filter(
+            created_at__lt=timezone.now() - timedelta(hours=settings.CHUNKED_UPLOAD_EXPIRY_HOURS)
+        )
+        for old in expired:
+            discard_session_files(old)
+            old.delete()
+        
+        session = UploadSession.objects.create(
+            user=request.user,
+            filename=filename,
+            total_size=size,
+            chunk_size=settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+            checksum=checksum
+        )
+        
+        data = UploadSessionSerializer(session).data
+        # The client may skip sending chunks and finalize right away
+        existing = find_duplicate(checksum, request.user)
+        data['existing_dataset'] = existing.id if existing else None
+        return Response(data, status=status.HTTP_201_CREATED)
+    
+    def retrieve(self, request, pk=None):
+        """Report which chunks were received so an interrupted upload can resume"""
+        session = self.get_session(request, pk)
+        return Response(UploadSessionSerializer(session).data)
+    
+    def update(self, request, pk=None):
+        """Store one chunk; offset must be a multiple of the session chunk size"""
+        session = self.get_session(request, pk)
+        
+        try:
+            offset = int(request.query_params.get('offset'))
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'offset query parameter is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        index, remainder = divmod(offset, session.chunk_size)
+        if offset < 0 or remainder or index >= session.total_chunks:
+            return Response(
+                {'error': f'offset must be a multiple of {session.chunk_size} below {session.total_size}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        data = request.body
+        expected = session.expected_chunk_length(index)
+        if len(data) != expected:
+            return Response(
+                {'error': f'Chunk at offset {offset} must be {expected} bytes, got {len(data)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        store_chunk(session, index, data)
+        publish_progress(
+            request.user, str(session.id), session.filename, 'uploading',
+            progress=round(len(received_chunks(session)) / session.total_chunks, 3)
+        )
+        return Response({'offset': offset, 'size': len(data), 'index': index})
+    
+    def destroy(self, request, pk=None):
+        """Abort an upload and delete its chunks"""
+        session = self.get_session(request, pk)
+        discard_session_files(session)
+        session.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, pk=None):
+        """Assemble the chunks, verify the checksum and run the CSV pipeline"""
+        session = self.get_session(request, pk)
+        
+        existing = find_duplicate(session.checksum, request.user)
+        if existing is not None:
+            discard_session_files(session)
+            session.delete()
+            return Response(DatasetDetailSerializer(existing).data, status=status.HTTP_200_OK)
+        
+        missing = missing_chunks(session)
+        if missing:
+            return Response(
+                {'error': 'Upload is incomplete', 'missing_chunks': missing},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        path, digest = assemble_chunks(session)
+        if digest != session.checksum:
+            discard_session_files(session)
+            session.delete()
+            return Response(
+                {'error': 'Checksum mismatch, please upload the file again'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            with open(path, 'rb') as f:
+                dataset = ingest_csv(f, session.filename, request.user, digest, job=str(session.id))
+        except PoolSaturated as e:
+            # Chunks are kept so the client can simply retry finalize
+            return pool_saturated_response(e)
+        except POOL_FAILURES as e:
+            response = pool_failed_response(e)
+            publish_progress(request.user, str(session.id), session.filename, 'failed', error=response.data['error'])
+            return response
+        except Exception as e:
+            publish_progress(request.user, str(session.id), session.filename, 'failed', error=str(e))
+            discard_session_files(session)
+            session.delete()
+            return ingest_failed_response(e)
+        
+        discard_session_files(session)
+        session.delete()
+        return Response(DatasetDetailSerializer(dataset).data, status=status.HTTP_201_CREATED)
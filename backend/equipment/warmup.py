@@ -0,0 +1,26 @@
+from django.db import connections
+from django.urls import get_resolver
+
+SAMPLE_CSV = (
+    b'Equipment Name,Type,Flowrate,Pressure,Temperature\n'
+    b'Pump-1,Pump,120,5.2,110\n'
+    b'Pump-2,Pump,115,5.0,108\n'
+    b'Valve-1,Valve,60,4.1,105\n'
+)
+
+
+def prime():
+    """
+    Do the one-off work of a server process ahead of its first request:
+    import every view with the libraries behind it (pandas, numpy,
+    ReportLab) by resolving the URL configuration, and run the upload
+    analysis on a few rows so pandas loads its parser and the ingest stages
+    are imported. Nothing is written to the database, and connections are
+    closed so none is shared by processes forked afterwards.
+    """
+    get_resolver().url_patterns
+
+    from .ingest import analyze_csv
+    analyze_csv(SAMPLE_CSV, None)
+
+    connections.close_all()
@@ -0,0 +1,71 @@
+"""
+gunicorn settings, read from the working directory by `gunicorn config.wsgi:application`.
+
+The application is loaded once in the master process (preload_app) and
+primed there, so Django, pandas, numpy and ReportLab are imported and the
+URL configuration is resolved before the workers are forked. Workers share
+those pages copy-on-write instead of each importing them, start faster and
+serve their first upload without paying for the imports. Each worker starts
+its own CPU pool after forking.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True') == 'True'
+
+# CPU-heavy work runs in the CPU pool, so web workers mostly wait on the
+# database and the network; threads keep event streams from blocking a worker
+workers = int(os.environ.get('WEB_CONCURRENCY', min(2 * multiprocessing.cpu_count() + 1, 4)))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Recycle workers to bound slow leaks; jitter keeps them from restarting together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# An event stream holds a gthread worker thread for its whole duration; half
+# of them may serve streams, the other half stays free for API requests
+if worker_class == 'gthread':
+    os.environ.setdefault('EVENTS_SYNC_STREAMS', str(max(threads // 2, 1)))
+
+# Events published by one worker reach clients connected to another only
+# through the database bridge; logouts likewise reach the token caches of
+# other workers only through shared revocation markers
+os.environ.setdefault('EVENTS_DB_BRIDGE', str(workers > 1))
+os.environ.setdefault('TOKEN_REVOCATION_SHARED', str(workers > 1))
+
+# A pool started in the master would not survive the fork; post_worker_init
+# starts one per worker instead of the WSGI/ASGI module
+os.environ['CPU_POOL_WARMUP_ON_LOAD'] = 'False'
+
+if preload_app:
+    # Garbage collection in the master would leave holes in pages the
+    # workers share; objects alive at fork time are frozen instead
+    gc.disable()
+
+
+def when_ready(server):
+    if preload_app:
+        from equipment.warmup import prime
+        prime()
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        # Keep the collector in the workers from writing to shared objects
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
+
+
+def post_worker_init(worker):
+    if not preload_app:
+        from equipment.warmup import prime
+        prime()
+    from equipment.pool import warm_up
+    warm_up()
@@ -0,0 +1,149 @@
+"""
+Measure desktop startup time and guard it against regressions.
+
+    python bench_startup.py [--runs 5] [--max-import-ms 400] [--max-paint-ms 1000]
+
+Reports the import time of main.py (python -X importtime) with its heaviest
+imports, and the time from process start to the first paint of the login
+dialog and of the main window. Every run starts a fresh interpreter. The
+main window gets a dummy token and an unreachable API address, so nothing
+is sent to the server. Set QT_QPA_PLATFORM=offscreen on machines without a
+display.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+PROBE = r'''
+import json
+import sys
+import time
+
+start = float(sys.argv[1])
+import main
+imported = time.time() - start
+main.API_BASE_URL = 'http://127.0.0.1:9/api'
+
+from PyQt5.QtCore import QEvent, QObject, QTimer
+from PyQt5.QtWidgets import QApplication
+
+results = {'import': imported}
+
+
+class FirstPaint(QObject):
+    """Records when any widget of a top-level window is first painted"""
+
+    def __init__(self):
+        super().__init__()
+        self.targets = {}
+
+    def watch(self, window, name, then):
+        self.targets[window] = (name, then)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and obj.isWidgetType():
+            target = self.targets.pop(obj.window(), None)
+            if target is not None:
+                results[target[0]] = time.time() - start
+                QTimer.singleShot(0, target[1])
+        return False
+
+
+def show_main_window():
+    login.close()
+    window = main.MainWindow('0' * 40)
+    first_paint.watch(window, 'main_window', finish)
+    window.show()
+    windows.append(window)
+
+
+def finish():
+    results['matplotlib_loaded'] = 'matplotlib' in sys.modules
+    print(json.dumps(results))
+    app.quit()
+
+
+app = QApplication(sys.argv[:1])
+app.setQuitOnLastWindowClosed(False)
+first_paint = FirstPaint()
+app.installEventFilter(first_paint)
+windows = []
+login = main.LoginDialog()
+first_paint.watch(login, 'login', show_main_window)
+login.show()
+app.exec_()
+'''
+
+
+def import_times():
+    """Cumulative import time of main and of its heaviest direct imports, in ms"""
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'],
+        cwd=HERE, capture_output=True, text=True, check=True
+    ).stderr
+    total = 0.0
+    direct = []
+    for line in output.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)$', line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(1)) / 1000, len(match.group(2)), match.group(3)
+        if name == 'main':
+            total = cumulative
+        elif indent == 3:
+            direct.append((cumulative, name))
+    return total, sorted(direct, reverse=True)[:5]
+
+
+def paint_times():
+    start = time.time()
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, repr(start)],
+        cwd=HERE, capture_output=True, text=True, check=True, timeout=60
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-import-ms', type=float, default=400)
+    parser.add_argument('--max-paint-ms', type=float, default=1000,
+                        help='Limit for the first paint of the main window')
+    args = parser.parse_args()
+
+    imports = [import_times() for _ in range(args.runs)]
+    import_ms = statistics.median(total for total, _ in imports)
+    print(f'import main:               {import_ms:7.0f} ms')
+    for cumulative, name in imports[-1][1]:
+        print(f'  {name:24} {cumulative:7.0f} ms')
+
+    runs = [paint_times() for _ in range(args.runs)]
+    login_ms = statistics.median(run['login'] for run in runs) * 1000
+    window_ms = statistics.median(run['main_window'] for run in runs) * 1000
+    print(f'first paint, login dialog: {login_ms:7.0f} ms')
+    print(f'first paint, main window:  {window_ms:7.0f} ms')
+
+    failures = []
+    if import_ms > args.max_import_ms:
+        failures.append(f'import took {import_ms:.0f} ms (limit {args.max_import_ms:.0f} ms)')
+    if window_ms > args.max_paint_ms:
+        failures.append(f'main window painted after {window_ms:.0f} ms (limit {args.max_paint_ms:.0f} ms)')
+    if any(run['matplotlib_loaded'] for run in runs):
+        failures.append('matplotlib was imported before a chart was needed')
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    if failures:
+        sys.exit(1)
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
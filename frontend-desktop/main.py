@@ -1,18 +1,327 @@
 import sys
+import os
+import json
+import time
+import gzip
+import shutil
+import hashlib
+import random
+import tempfile
+import threading
 import requests
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QPushButton, QTableWidget, QTableWidgetItem,
                              QLabel, QFileDialog, QMessageBox, QComboBox, QGroupBox,
                              QGridLayout, QScrollArea, QStackedWidget, QFrame,
                              QSizePolicy, QHeaderView, QDialog, QLineEdit)
-from PyQt5.QtCore import Qt, QSize
+from PyQt5.QtCore import Qt, QSize, QObject, QTimer, pyqtSignal
 from PyQt5.QtGui import QFont, QIcon, QPalette, QColor
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
 
 API_BASE_URL = 'https://chemical-equipment-visualizer-production-999d.up.railway.app/api'
 
+# Resumable uploads remember unfinished sessions here between runs
+UPLOAD_STATE_FILE = os.path.join(os.path.expanduser('~'), '.equipment_visualizer_uploads.json')
+UPLOAD_PARALLEL_CHUNKS = 4
+UPLOAD_CHUNK_RETRIES = 3
+UPLOAD_CHUNK_TIMEOUT = 60
+EVENTS_RECONNECT_DELAY = 2
+EVENTS_MAX_RECONNECT_DELAY = 60
+# Details (records included) of listed datasets are fetched in the background,
+# newest first, and kept for instant selection; larger datasets load on demand
+DATASET_PREFETCH_WORKERS = 2
+DATASET_PREFETCH_MAX_ROWS = 20000
+DATASET_CACHE_SIZE = 8
+
+CHART_COLORS = ['#36A2EB', '#FF6384', '#FFCE56', '#4BC0C0', '#9966FF', '#FF9F40']
+# Per-record series with more points are rasterized off the GUI thread
+RASTER_THRESHOLD = 20000
+RASTER_EXECUTOR = ThreadPoolExecutor(max_workers=1)
+
+
+class ChunkedUploader:
+    """Upload a file through the resumable chunked upload API"""
+    def __init__(self, headers, progress_callback=None):
+        self.headers = headers
+        self.progress_callback = progress_callback
+        self.local = threading.local()
+    
+    def session(self):
+        """One HTTP session per worker thread"""
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+            self.local.session.headers.update(self.headers)
+        return self.local.session
+    
+    @staticmethod
+    def file_checksum(filepath):
+        hasher = hashlib.blake2b(digest_size=32)
+        with open(filepath, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                hasher.update(block)
+        return hasher.hexdigest()
+    
+    @staticmethod
+    def compress_for_upload(filepath):
+        """
+        Gzip a plain CSV into a new temporary file before sending it; the
+        caller deletes it. The output is byte-identical for identical input
+        (mtime is fixed), so an interrupted upload of the same file can
+        still be resumed.
+        """
+        if not filepath.lower().endswith('.csv'):
+            return filepath
+        fd, compressed = tempfile.mkstemp(prefix='equipment_visualizer_', suffix='.csv.gz')
+        try:
+            with open(filepath, 'rb') as src, os.fdopen(fd, 'wb') as raw:
+                with gzip.GzipFile(filename='', mode='wb', fileobj=raw, mtime=0, compresslevel=6) as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+        except BaseException:
+            os.remove(compressed)
+            raise
+        return compressed
+    
+    @staticmethod
+    def load_state():
+        try:
+            with open(UPLOAD_STATE_FILE) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    @staticmethod
+    def save_state(state):
+        try:
+            with open(UPLOAD_STATE_FILE, 'w') as f:
+                json.dump(state, f)
+        except OSError:
+            pass
+    
+    def start_session(self, filename, size, checksum, state_key):
+        """Resume the saved session for this file, or start a new one"""
+        state = self.load_state()
+        session_id = state.get(state_key)
+        
+        if session_id:
+            response = self.session().get(f'{API_BASE_URL}/uploads/{session_id}/', timeout=10)
+            if response.status_code == 200:
+                return response.json()
+        
+        response = self.session().post(
+            f'{API_BASE_URL}/uploads/',
+            json={'filename': filename, 'size': size, 'checksum': checksum},
+            timeout=10
+        )
+        if response.status_code != 201:
+            raise Exception(response.json().get('error', f'Status {response.status_code}'))
+        
+        upload = response.json()
+        state[state_key] = upload['id']
+        self.save_state(state)
+        return upload
+    
+    def send_chunk(self, filepath, upload, index):
+        """Send one chunk, retrying with backoff on network errors"""
+        offset = index * upload['chunk_size']
+        with open(filepath, 'rb') as f:
+            f.seek(offset)
+            data = f.read(upload['chunk_size'])
+        
+        for attempt in range(UPLOAD_CHUNK_RETRIES):
+            try:
+                response = self.session().put(
+                    f"{API_BASE_URL}/uploads/{upload['id']}/",
+                    params={'offset': offset},
+                    data=data,
+                    headers={'Content-Type': 'application/octet-stream'},
+                    timeout=UPLOAD_CHUNK_TIMEOUT
+                )
+                if response.status_code == 200:
+                    return len(data)
+                if response.status_code < 500:
+                    raise Exception(response.json().get('error', f'Status {response.status_code}'))
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == UPLOAD_CHUNK_RETRIES - 1:
+                    raise
+            time.sleep(2 ** attempt)
+        raise Exception(f'Chunk at offset {offset} failed after {UPLOAD_CHUNK_RETRIES} attempts')
+    
+    def upload(self, filepath):
+        """Upload a file and return the finalize response"""
+        compressed = self.compress_for_upload(filepath)
+        try:
+            return self.upload_file(compressed, filepath)
+        finally:
+            if compressed != filepath:
+                os.remove(compressed)
+    
+    def upload_file(self, filepath, source):
+        """Send one file, the source file or its compressed copy, through an upload session"""
+        size = os.path.getsize(filepath)
+        checksum = self.file_checksum(filepath)
+        # Sessions are saved under the source file; the compressed copy gets a new name every time
+        state_key = f'{os.path.abspath(source)}|{size}|{checksum}'
+        filename = os.path.basename(source)
+        if filepath != source:
+            filename += '.gz'
+        
+        upload = self.start_session(filename, size, checksum, state_key)
+        
+        # The server already holds this exact file, no chunks need to be sent
+        missing = [] if upload.get('existing_dataset') else upload['missing_chunks']
+        sent = size - sum(min(upload['chunk_size'], size - i * upload['chunk_size']) for i in missing)
+        self.report_progress(sent, size)
+        
+        with ThreadPoolExecutor(max_workers=UPLOAD_PARALLEL_CHUNKS) as executor:
+            futures = [executor.submit(self.send_chunk, filepath, upload, i) for i in missing]
+            for future in as_completed(futures):
+                sent += future.result()
+                self.report_progress(sent, size)
+        
+        response = self.session().post(
+            f"{API_BASE_URL}/uploads/{upload['id']}/finalize/",
+            timeout=120
+        )
+        
+        # Keep the session for resuming unless the server is done with it
+        if response.status_code in (200, 201) or response.status_code == 404:
+            state = self.load_state()
+            state.pop(state_key, None)
+            self.save_state(state)
+        return response
+    
+    def report_progress(self, sent, total):
+        if self.progress_callback:
+            self.progress_callback(sent, total)
+
+class EventListener(QObject):
+    """Follow the server's event stream on a background thread"""
+    event_received = pyqtSignal(str, dict)
+    
+    def __init__(self, headers):
+        super().__init__()
+        self.headers = headers
+        self.last_event_id = None
+        self.response = None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='event-listener', daemon=True)
+    
+    def start(self):
+        self.thread.start()
+    
+    def stop(self):
+        self.stopped.set()
+        response = self.response
+        if response is not None:
+            # Unblocks the read in the listener thread
+            response.close()
+    
+    def run(self):
+        """
+        Read events, reconnecting after the server ends the stream. Refused
+        connections (503 from a server with no free stream slot) and network
+        errors are retried after a jittered delay that doubles every time
+        """
+        failures = 0
+        while not self.stopped.is_set():
+            headers = dict(self.headers)
+            if self.last_event_id:
+                headers['Last-Event-ID'] = self.last_event_id
+            delay = EVENTS_RECONNECT_DELAY
+            try:
+                with requests.get(f'{API_BASE_URL}/events/', headers=headers,
+                                  stream=True, timeout=(10, 60)) as response:
+                    if response.status_code == 401:
+                        return
+                    response.raise_for_status()
+                    failures = 0
+                    self.response = response
+                    self.read_events(response)
+            except requests.exceptions.HTTPError as e:
+                failures += 1
+                retry_after = e.response.headers.get('Retry-After', '')
+                if retry_after.isdigit():
+                    delay = int(retry_after)
+            except (requests.exceptions.RequestException, AttributeError, ValueError):
+                failures += 1
+            finally:
+                self.response = None
+            if failures:
+                backoff = min(EVENTS_RECONNECT_DELAY * 2 ** failures, EVENTS_MAX_RECONNECT_DELAY)
+                delay = max(delay, backoff) * random.uniform(1, 1.5)
+            self.stopped.wait(delay)
+    
+    def read_events(self, response):
+        kind, data = None, []
+        for line in response.iter_lines(chunk_size=1, decode_unicode=True):
+            if self.stopped.is_set():
+                return
+            if not line:
+                if kind and data:
+                    self.event_received.emit(kind, json.loads('\n'.join(data)))
+                kind, data = None, []
+            elif line.startswith('id:'):
+                self.last_event_id = line[3:].strip()
+            elif line.startswith('event:'):
+                kind = line[6:].strip()
+            elif line.startswith('data:'):
+                data.append(line[5:].strip())
+
+
+class DatasetPrefetcher(QObject):
+    """Fetch dataset details on a few background threads"""
+    fetched = pyqtSignal(int, dict)
+    
+    def __init__(self, headers):
+        super().__init__()
+        self.headers = headers
+        self.local = threading.local()
+        self.executor = ThreadPoolExecutor(max_workers=DATASET_PREFETCH_WORKERS, thread_name_prefix='prefetch')
+        self.pending = {}
+    
+    def session(self):
+        """One HTTP session per prefetch thread, reused for every fetch"""
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+            self.local.session.headers.update(self.headers)
+        return self.local.session
+    
+    def prefetch(self, dataset_ids):
+        """Fetch these datasets in order, dropping queued fetches of datasets no longer wanted"""
+        pending = {}
+        for dataset_id, future in self.pending.items():
+            if not future.cancel() and not future.done():
+                pending[dataset_id] = future
+        for dataset_id in dataset_ids:
+            if dataset_id not in pending:
+                pending[dataset_id] = self.executor.submit(self.fetch, dataset_id)
+        self.pending = pending
+    
+    def fetch(self, dataset_id):
+        response = self.session().get(f'{API_BASE_URL}/datasets/{dataset_id}/', timeout=30)
+        response.raise_for_status()
+        dataset = response.json()
+        self.fetched.emit(dataset_id, dataset)
+        return dataset
+    
+    def wait(self, dataset_id, timeout=10):
+        """The dataset from a fetch in progress, or None if none is or it failed"""
+        future = self.pending.pop(dataset_id, None)
+        if future is None or future.cancel():
+            return None
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            return None
+    
+    def stop(self):
+        for future in self.pending.values():
+            future.cancel()
+        self.pending = {}
+        self.executor.shutdown(wait=False)
+
+
 class LoginDialog(QDialog):
     def __init__(self):
         super().__init__()
@@ -303,41 +612,145 @@ class LoginDialog(QDialog):
             QMessageBox.critical(self, "Error", f"An error occurred:\n\n{str(e)}")
 
 
+class SeriesRasterizer(QObject):
+    """Rasterize large point series with Agg on a background thread"""
+    finished = pyqtSignal(int, object, tuple)
+    
+    def __init__(self):
+        super().__init__()
+        self.latest = 0
+    
+    def submit(self, kind, x, y, size, extent, color):
+        """Queue a render; results of earlier requests are dropped"""
+        self.latest += 1
+        RASTER_EXECUTOR.submit(self.render, self.latest, kind, x, y, size, extent, color)
+        return self.latest
+    
+    def cancel(self):
+        self.latest += 1
+    
+    def render(self, request_id, kind, x, y, size, extent, color):
+        if request_id != self.latest:
+            return
+        import numpy as np
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        
+        try:
+            width, height = size
+            figure = Figure(figsize=(width / 100, height / 100), dpi=100)
+            canvas = FigureCanvasAgg(figure)
+            figure.patch.set_alpha(0)
+            ax = figure.add_axes([0, 0, 1, 1])
+            ax.set_axis_off()
+            ax.set_xlim(extent[0], extent[1])
+            ax.set_ylim(extent[2], extent[3])
+            if kind == 'line':
+                ax.plot(*decimate_line(x, y, width), color=color, linewidth=0.8)
+            else:
+                ax.scatter(x, y, s=4, color=color, alpha=0.5, linewidths=0)
+            canvas.draw()
+            image = np.asarray(canvas.buffer_rgba()).copy()
+        except Exception as e:
+            print(f"Error rasterizing chart: {str(e)}")
+            return
+        if request_id == self.latest:
+            self.finished.emit(request_id, image, extent)
+
+
 class ChartWidget(QWidget):
-    """Widget for displaying matplotlib charts"""
+    """
+    Widget for displaying matplotlib charts.
+    
+    matplotlib is imported when the first chart widget is created rather
+    than at startup, since loading it takes most of the app's import time.
+    Axes and artists are kept between plots: re-plotting a chart of the same
+    kind and shape updates the artists' data in place and repaints with
+    draw_idle. Only a new chart kind clears the figure and runs tight_layout.
+    Per-record series above RASTER_THRESHOLD points are rasterized off the
+    GUI thread and shown as an image inside the axes.
+    """
     def __init__(self, parent=None):
         super().__init__(parent)
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+        from matplotlib.figure import Figure
+        
         self.figure = Figure(figsize=(8, 6))
         self.canvas = FigureCanvas(self.figure)
         layout = QVBoxLayout()
         layout.addWidget(self.canvas)
         layout.setContentsMargins(0, 0, 0, 0)
         self.setLayout(layout)
+        
+        self.ax = None
+        self.kind = None
+        self.shape = None
+        self.artists = {}
+        self.raster_series = None
+        self.needs_layout = False
+        self.stale = False
+        self.rasterizer = SeriesRasterizer()
+        self.rasterizer.finished.connect(self.on_raster_ready)
+        self.canvas.mpl_connect('resize_event', self.on_resize)
+    
+    def prepare(self, kind, shape=None):
+        """Return True when the artists of the current chart can be updated in place"""
+        if self.ax is not None and self.kind == kind and self.shape == shape:
+            return True
+        self.rasterizer.cancel()
+        self.figure.clear()
+        self.ax = self.figure.add_subplot(111)
+        self.kind = kind
+        self.shape = shape
+        self.artists = {}
+        self.raster_series = None
+        return False
+    
+    def refresh(self, layout):
+        if layout:
+            self.needs_layout = True
+        # A hidden widget may not have its final size yet; showing or
+        # resizing it lays it out and draws it
+        if not self.isVisible() or min(self.figure.bbox.size) <= 0:
+            self.stale = True
+            return
+        if self.needs_layout:
+            self.figure.tight_layout()
+            self.needs_layout = False
+        self.stale = False
+        self.canvas.draw_idle()
     
     def plot_bar_chart(self, labels, values, title):
         """Plot bar chart"""
-        self.figure.clear()
-        ax = self.figure.add_subplot(111)
-        colors = ['#36A2EB', '#FF6384', '#FFCE56']
-        bars = ax.bar(labels, values, color=colors[:len(labels)], width=0.6)
-        
-        for bar in bars:
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., height,
-                    f'{height:.1f}',
-                    ha='center', va='bottom', fontsize=11, fontweight='bold')
+        reuse = self.prepare('bar', tuple(labels))
+        ax = self.ax
+        if not reuse:
+            bars = ax.bar(labels, values, color=CHART_COLORS[:len(labels)], width=0.6)
+            texts = [ax.text(0, 0, '', ha='center', va='bottom', fontsize=11, fontweight='bold')
+                     for _ in bars]
+            ax.set_ylabel('Values', fontsize=12)
+            ax.grid(axis='y', alpha=0.3, linestyle='--')
+            ax.set_axisbelow(True)
+            self.artists = {'bars': bars, 'texts': texts}
+        
+        for bar, text, value in zip(self.artists['bars'], self.artists['texts'], values):
+            bar.set_height(value)
+            text.set_position((bar.get_x() + bar.get_width() / 2., value))
+            text.set_text(f'{value:.1f}')
         
         ax.set_title(title, fontsize=14, fontweight='bold', pad=15)
-        ax.set_ylabel('Values', fontsize=12)
-        ax.grid(axis='y', alpha=0.3, linestyle='--')
-        ax.set_axisbelow(True)
-        self.figure.tight_layout()
-        self.canvas.draw()
+        ax.relim()
+        ax.autoscale_view()
+        self.refresh(layout=not reuse)
     
     def plot_pie_chart(self, labels, values, title):
         """Plot pie chart"""
-        self.figure.clear()
-        ax = self.figure.add_subplot(111)
+        # Wedge geometry depends on every value, so the pie itself is redrawn;
+        # the axes and figure layout are kept
+        reuse = self.prepare('pie', len(labels))
+        if reuse:
+            self.ax.clear()
+        ax = self.ax
         colors = ['#FF6384', '#36A2EB', '#FFCE56', '#4BC0C0', '#9966FF', '#FF9F40']
         explode = [0.05] * len(labels)
         
@@ -361,8 +774,161 @@ class ChartWidget(QWidget):
             text.set_fontweight('bold')
         
         ax.set_title(title, fontsize=14, fontweight='bold', pad=15)
-        self.figure.tight_layout()
-        self.canvas.draw()
+        self.refresh(layout=not reuse)
+    
+    def plot_grouped_bar_chart(self, labels, series, title):
+        """Plot one group of bars per label with one bar per (name, values) series"""
+        names = tuple(name for name, _ in series)
+        reuse = self.prepare('grouped_bar', (tuple(labels), names))
+        ax = self.ax
+        width = 0.8 / max(len(series), 1)
+        
+        if not reuse:
+            containers = []
+            for i, (name, values) in enumerate(series):
+                positions = [x - 0.4 + width * (i + 0.5) for x in range(len(labels))]
+                containers.append(ax.bar(positions, [0] * len(labels), width=width,
+                                         label=name, color=CHART_COLORS[i % len(CHART_COLORS)]))
+            ax.set_xticks(range(len(labels)))
+            ax.set_xticklabels(labels, rotation=30, ha='right')
+            ax.grid(axis='y', alpha=0.3, linestyle='--')
+            ax.set_axisbelow(True)
+            ax.legend(fontsize=9)
+            self.artists = {'containers': containers}
+        
+        for container, (_, values) in zip(self.artists['containers'], series):
+            for bar, value in zip(container, values):
+                bar.set_height(value if value is not None else 0)
+        
+        ax.set_title(title, fontsize=14, fontweight='bold', pad=15)
+        ax.relim()
+        ax.autoscale_view()
+        self.refresh(layout=not reuse)
+    
+    def plot_histogram(self, values, title, xlabel, bins=30):
+        """Plot the distribution of a per-record parameter"""
+        import numpy as np
+        values = np.asarray(values, dtype=float)
+        counts, edges = np.histogram(values, bins=bins)
+        reuse = self.prepare('histogram')
+        ax = self.ax
+        if not reuse:
+            self.artists['steps'] = ax.stairs(counts, edges, fill=True, color=CHART_COLORS[0], alpha=0.8)
+            ax.set_ylabel('Records', fontsize=12)
+            ax.grid(axis='y', alpha=0.3, linestyle='--')
+            ax.set_axisbelow(True)
+        else:
+            self.artists['steps'].set_data(counts, edges)
+        
+        ax.set_xlabel(xlabel, fontsize=12)
+        ax.set_title(title, fontsize=14, fontweight='bold', pad=15)
+        ax.relim()
+        ax.autoscale_view()
+        self.refresh(layout=not reuse)
+    
+    def plot_line_chart(self, values, title, ylabel):
+        """Plot a per-record parameter in record order"""
+        import numpy as np
+        values = np.asarray(values, dtype=float)
+        self.plot_series('line', np.arange(len(values)), values, title, 'Record', ylabel)
+    
+    def plot_scatter_chart(self, x, y, title, xlabel, ylabel):
+        """Plot one per-record parameter against another"""
+        import numpy as np
+        self.plot_series('scatter', np.asarray(x, dtype=float), np.asarray(y, dtype=float),
+                         title, xlabel, ylabel)
+    
+    def plot_series(self, kind, x, y, title, xlabel, ylabel):
+        import numpy as np
+        reuse = self.prepare(kind)
+        ax = self.ax
+        color = CHART_COLORS[0]
+        if not reuse:
+            if kind == 'line':
+                self.artists['points'], = ax.plot([], [], color=color, linewidth=1)
+            else:
+                self.artists['points'] = ax.scatter([], [], s=12, color=color, alpha=0.6, linewidths=0)
+            self.artists['image'] = ax.imshow(np.zeros((1, 1, 4)), extent=(0, 1, 0, 1), aspect='auto',
+                                              interpolation='nearest', visible=False)
+            ax.grid(alpha=0.3, linestyle='--')
+            ax.set_axisbelow(True)
+        
+        extent = series_extent(x, y)
+        large = len(x) > RASTER_THRESHOLD
+        shown = (x[:0], y[:0]) if large else (x, y)
+        if kind == 'line':
+            self.artists['points'].set_data(*shown)
+        else:
+            self.artists['points'].set_offsets(np.column_stack(shown))
+        self.artists['image'].set_visible(False)
+        
+        ax.set_xlim(extent[0], extent[1])
+        ax.set_ylim(extent[2], extent[3])
+        ax.set_xlabel(xlabel, fontsize=12)
+        ax.set_ylabel(ylabel, fontsize=12)
+        ax.set_title(title, fontsize=14, fontweight='bold', pad=15)
+        self.refresh(layout=not reuse)
+        
+        if large:
+            self.raster_series = (kind, x, y, extent, color)
+            self.request_raster()
+        else:
+            self.raster_series = None
+            self.rasterizer.cancel()
+    
+    def request_raster(self):
+        kind, x, y, extent, color = self.raster_series
+        bbox = self.ax.get_window_extent()
+        size = (max(int(bbox.width), 1), max(int(bbox.height), 1))
+        self.rasterizer.submit(kind, x, y, size, extent, color)
+    
+    def on_raster_ready(self, request_id, image, extent):
+        """Show a finished raster if it still matches the plotted series"""
+        if request_id != self.rasterizer.latest or self.raster_series is None:
+            return
+        self.artists['image'].set_data(image)
+        self.artists['image'].set_extent(extent)
+        self.artists['image'].set_visible(True)
+        self.canvas.draw_idle()
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.stale:
+            # Once the page's layout has settled
+            QTimer.singleShot(0, lambda: self.refresh(layout=False))
+    
+    def on_resize(self, event):
+        if self.stale:
+            self.refresh(layout=True)
+        if self.raster_series is not None:
+            self.request_raster()
+
+
+def decimate_line(x, y, width):
+    """
+    Reduce a line in record order to the first, minimum, maximum and last
+    point of each pixel column, which draws the same at that width.
+    """
+    import numpy as np
+    if len(x) <= width * 4:
+        return x, y
+    columns = np.linspace(0, len(x), width + 1).astype(int)
+    indices = []
+    for start, stop in zip(columns[:-1], columns[1:]):
+        if stop > start:
+            segment = y[start:stop]
+            indices += sorted({start, start + int(segment.argmin()), start + int(segment.argmax()), stop - 1})
+    return x[indices], y[indices]
+
+
+def series_extent(x, y):
+    """Axis limits around a series with a 5% margin"""
+    limits = []
+    for values in (x, y):
+        low, high = (float(values.min()), float(values.max())) if len(values) else (0.0, 1.0)
+        margin = (high - low) * 0.05 or 0.5
+        limits += [low - margin, high + margin]
+    return tuple(limits)
 
 
 class SidebarButton(QPushButton):
@@ -437,8 +1003,17 @@ class MainWindow(QMainWindow):
         self.token = token  # Store the auth token
         self.datasets = []
         self.current_dataset = None
+        # Dataset id -> details with records, least recently used first
+        self.dataset_cache = OrderedDict()
+        self.prefetcher = DatasetPrefetcher(self.get_headers())
+        self.prefetcher.fetched.connect(self.cache_dataset)
         self.init_ui()
         self.load_datasets()
+        
+        # Keep the dataset list current as datasets are created or deleted
+        self.events = EventListener(self.get_headers())
+        self.events.event_received.connect(self.on_server_event)
+        self.events.start()
     
     def get_headers(self):
         """Helper to return auth headers"""
@@ -543,14 +1118,13 @@ class MainWindow(QMainWindow):
         
         self.stacked_widget = QStackedWidget()
         
-        self.page_upload = self.create_upload_page()
-        self.stacked_widget.addWidget(self.page_upload)
-        
-        self.page_analysis = self.create_analysis_page()
-        self.stacked_widget.addWidget(self.page_analysis)
-        
-        self.page_equipment = self.create_equipment_page()
-        self.stacked_widget.addWidget(self.page_equipment)
+        # Only the upload page is built up front; the others hold a
+        # placeholder until they are first shown (see ensure_page)
+        self.page_builders = [self.create_upload_page, self.create_analysis_page, self.create_equipment_page]
+        self.pages = [None] * len(self.page_builders)
+        for _ in self.page_builders:
+            self.stacked_widget.addWidget(QWidget())
+        self.ensure_page(0)
         
         content_layout.addWidget(self.stacked_widget)
         main_layout.addWidget(content_widget)
@@ -569,6 +1143,12 @@ class MainWindow(QMainWindow):
         )
         
         if reply == QMessageBox.Yes:
+            # Revoke the token on the server; logging out locally still works offline
+            try:
+                requests.post(f"{API_BASE_URL}/logout/", headers=self.get_headers(), timeout=5)
+            except requests.exceptions.RequestException:
+                pass
+            self.events.stop()
             self.close()
             # Show login dialog again
             login = LoginDialog()
@@ -576,6 +1156,11 @@ class MainWindow(QMainWindow):
                 new_window = MainWindow(login.token)
                 new_window.show()
     
+    def closeEvent(self, event):
+        self.events.stop()
+        self.prefetcher.stop()
+        super().closeEvent(event)
+    
     def create_upload_page(self):
         """Create upload and select dataset page"""
         page = QWidget()
@@ -703,6 +1288,7 @@ class MainWindow(QMainWindow):
         
         stats_container = QWidget()
         stats_container.setStyleSheet('background: transparent;')
+        stats_container.setMinimumHeight(190)
         self.stats_layout = QGridLayout(stats_container)
         self.stats_layout.setSpacing(20)
         layout.addWidget(stats_container)
@@ -727,7 +1313,9 @@ class MainWindow(QMainWindow):
         charts_row.setSpacing(20)
         
         self.avg_chart = ChartWidget()
+        self.avg_chart.setMinimumHeight(350)
         self.type_chart = ChartWidget()
+        self.type_chart.setMinimumHeight(350)
         
         charts_row.addWidget(self.avg_chart)
         charts_row.addWidget(self.type_chart)
@@ -736,7 +1324,112 @@ class MainWindow(QMainWindow):
         charts_group.setLayout(charts_layout)
         layout.addWidget(charts_group, 1)
         
-        return page
+        records_group = QGroupBox()
+        records_group.setStyleSheet('''
+            QGroupBox {
+                background: white;
+                border-radius: 12px;
+                padding: 25px;
+            }
+        ''')
+        records_layout = QVBoxLayout()
+        records_layout.setSpacing(15)
+        
+        records_header = QHBoxLayout()
+        records_title = QLabel('📉 Record Series')
+        records_title.setFont(QFont('Arial', 16, QFont.Bold))
+        records_title.setStyleSheet('color: #34495e;')
+        records_header.addWidget(records_title)
+        records_header.addStretch()
+        
+        self.record_kind_combo = QComboBox()
+        self.record_kind_combo.addItem('Histogram', 'histogram')
+        self.record_kind_combo.addItem('Line', 'line')
+        self.record_kind_combo.addItem('Scatter vs. Flowrate', 'scatter')
+        self.record_kind_combo.setMinimumHeight(35)
+        self.record_kind_combo.currentIndexChanged.connect(self.plot_records)
+        records_header.addWidget(self.record_kind_combo)
+        
+        self.record_param_combo = QComboBox()
+        self.record_param_combo.addItem('Flowrate', 'flowrate')
+        self.record_param_combo.addItem('Pressure', 'pressure')
+        self.record_param_combo.addItem('Temperature', 'temperature')
+        self.record_param_combo.setCurrentIndex(1)
+        self.record_param_combo.setMinimumHeight(35)
+        self.record_param_combo.currentIndexChanged.connect(self.plot_records)
+        records_header.addWidget(self.record_param_combo)
+        records_layout.addLayout(records_header)
+        
+        self.record_chart = ChartWidget()
+        self.record_chart.setMinimumHeight(350)
+        records_layout.addWidget(self.record_chart)
+        
+        records_group.setLayout(records_layout)
+        layout.addWidget(records_group, 1)
+        
+        self.record_values = {}
+        
+        compare_group = QGroupBox()
+        compare_group.setStyleSheet('''
+            QGroupBox {
+                background: white;
+                border-radius: 12px;
+                padding: 25px;
+            }
+        ''')
+        compare_layout = QVBoxLayout()
+        compare_layout.setSpacing(15)
+        
+        compare_header = QHBoxLayout()
+        compare_title = QLabel('🔀 Dataset Comparison')
+        compare_title.setFont(QFont('Arial', 16, QFont.Bold))
+        compare_title.setStyleSheet('color: #34495e;')
+        compare_header.addWidget(compare_title)
+        compare_header.addStretch()
+        
+        self.compare_param_combo = QComboBox()
+        self.compare_param_combo.addItem('Flowrate', 'flowrate')
+        self.compare_param_combo.addItem('Pressure', 'pressure')
+        self.compare_param_combo.addItem('Temperature', 'temperature')
+        self.compare_param_combo.setMinimumHeight(35)
+        self.compare_param_combo.currentIndexChanged.connect(self.plot_comparison)
+        compare_header.addWidget(self.compare_param_combo)
+        
+        self.compare_btn = QPushButton('Compare with Previous Datasets')
+        self.compare_btn.setMinimumHeight(35)
+        self.compare_btn.setCursor(Qt.PointingHandCursor)
+        self.compare_btn.setStyleSheet('''
+            QPushButton {
+                background: #3498db;
+                color: white;
+                padding: 6px 18px;
+                border-radius: 6px;
+                font-weight: bold;
+                border: none;
+            }
+            QPushButton:hover {
+                background: #2980b9;
+            }
+        ''')
+        self.compare_btn.clicked.connect(self.compare_datasets)
+        compare_header.addWidget(self.compare_btn)
+        compare_layout.addLayout(compare_header)
+        
+        self.compare_chart = ChartWidget()
+        self.compare_chart.setMinimumHeight(350)
+        compare_layout.addWidget(self.compare_chart)
+        
+        compare_group.setLayout(compare_layout)
+        layout.addWidget(compare_group, 1)
+        
+        self.comparison = None
+        
+        # Three chart groups do not fit every screen
+        scroll = QScrollArea()
+        scroll.setWidgetResizable(True)
+        scroll.setFrameShape(QFrame.NoFrame)
+        scroll.setWidget(page)
+        return scroll
     
     def create_equipment_page(self):
         """Create equipment records page"""
@@ -834,8 +1527,19 @@ class MainWindow(QMainWindow):
         
         return page
     
+    def ensure_page(self, index):
+        """Build a page the first time it is needed"""
+        if self.pages[index] is None:
+            placeholder = self.stacked_widget.widget(index)
+            self.pages[index] = self.page_builders[index]()
+            self.stacked_widget.insertWidget(index, self.pages[index])
+            self.stacked_widget.removeWidget(placeholder)
+            placeholder.deleteLater()
+        return self.pages[index]
+    
     def switch_page(self, index):
         """Switch between pages"""
+        self.ensure_page(index)
         for btn in self.nav_buttons:
             btn.setChecked(False)
         
@@ -874,6 +1578,7 @@ class MainWindow(QMainWindow):
                     )
             
             self.dataset_combo.blockSignals(False)
+            self.prefetch_datasets()
             
         except requests.exceptions.Timeout:
             QMessageBox.critical(self, "Connection Error", "Request timed out while loading datasets.")
@@ -890,13 +1595,78 @@ class MainWindow(QMainWindow):
             self.dataset_combo.addItem("Error loading datasets", None)
             self.dataset_combo.blockSignals(False)
     
+    def prefetch_datasets(self):
+        """Fetch the details of listed datasets that are not cached, newest first"""
+        listed = {ds['id'] for ds in self.datasets}
+        for dataset_id in [i for i in self.dataset_cache if i not in listed]:
+            del self.dataset_cache[dataset_id]
+        self.prefetcher.prefetch([
+            ds['id'] for ds in self.datasets
+            if ds.get('row_count', 0) <= DATASET_PREFETCH_MAX_ROWS and not self.is_cached(ds)
+        ])
+    
+    def is_cached(self, listed):
+        """Whether the cache holds a listed dataset's details at its current version"""
+        dataset = self.dataset_cache.get(listed['id'])
+        return dataset is not None and dataset.get('version') == listed.get('version')
+    
+    def cached_dataset(self, dataset_id):
+        """Cached details of a listed dataset, or None"""
+        listed = next((ds for ds in self.datasets if ds['id'] == dataset_id), None)
+        if listed is None or not self.is_cached(listed):
+            return None
+        self.dataset_cache.move_to_end(dataset_id)
+        return self.dataset_cache[dataset_id]
+    
+    def cache_dataset(self, dataset_id, dataset):
+        """Keep a dataset's details, dropping the least recently used beyond DATASET_CACHE_SIZE"""
+        self.dataset_cache[dataset_id] = dataset
+        self.dataset_cache.move_to_end(dataset_id)
+        while len(self.dataset_cache) > DATASET_CACHE_SIZE:
+            self.dataset_cache.popitem(last=False)
+    
+    def on_server_event(self, kind, data):
+        """Apply a dataset or job event from the server to the window"""
+        if kind == 'dataset.created':
+            if any(ds['id'] == data['id'] for ds in self.datasets):
+                return
+            self.datasets.insert(0, data)
+            self.dataset_combo.blockSignals(True)
+            if self.dataset_combo.currentData() is None:
+                # Drop the "No datasets available" placeholder
+                self.dataset_combo.clear()
+            self.dataset_combo.insertItem(0, f"{data['filename']} - {data['upload_date'][:10]}", data['id'])
+            self.dataset_combo.blockSignals(False)
+            self.prefetch_datasets()
+        elif kind == 'dataset.updated':
+            self.datasets = [data if ds['id'] == data['id'] else ds for ds in self.datasets]
+            # The cached details are of the previous version
+            self.prefetch_datasets()
+        elif kind == 'dataset.deleted':
+            self.datasets = [ds for ds in self.datasets if ds['id'] != data['id']]
+            index = self.dataset_combo.findData(data['id'])
+            if index >= 0:
+                self.dataset_combo.blockSignals(True)
+                self.dataset_combo.removeItem(index)
+                if not self.datasets:
+                    self.dataset_combo.addItem("No datasets available", None)
+                self.dataset_combo.blockSignals(False)
+            if self.current_dataset and self.current_dataset.get('id') == data['id']:
+                self.current_dataset = None
+            self.prefetch_datasets()
+        elif kind == 'job.progress':
+            if not self.upload_btn.isEnabled() and data['stage'] in ('analyzing', 'storing'):
+                self.upload_btn.setText(f"⏳ {data['stage'].capitalize()}...")
+        elif kind == 'resync':
+            self.load_datasets()
+    
     def upload_file(self):
         """Upload CSV file"""
         filepath, _ = QFileDialog.getOpenFileName(
             self, 
             'Select CSV File', 
             '', 
-            'CSV Files (*.csv);;All Files (*)'
+            'CSV Files (*.csv *.csv.gz *.csv.zst);;All Files (*)'
         )
         
         if not filepath:
@@ -906,43 +1676,52 @@ class MainWindow(QMainWindow):
         self.upload_btn.setText('⏳ Uploading...')
         
         try:
-            with open(filepath, 'rb') as f:
-                file_content = f.read()
-                files = {'file': (filepath.split('\\')[-1].split('/')[-1], file_content, 'text/csv')}
-                response = requests.post(
-                    f'{API_BASE_URL}/datasets/upload/', 
-                    files=files, 
-                    headers=self.get_headers(),
-                    timeout=30
-                )
+            uploader = ChunkedUploader(self.get_headers(), self.on_upload_progress)
+            response = uploader.upload(filepath)
+            if response.status_code in (200, 201):
+                data = response.json()
+                self.upload_btn.setEnabled(True)
+                self.upload_btn.setText('📤 Choose CSV File')
                 
-                if response.status_code == 201:
-                    data = response.json()
-                    self.upload_btn.setEnabled(True)
-                    self.upload_btn.setText('📤 Choose CSV File')
-                    
-                    QMessageBox.information(
-                        self, 
-                        'Success', 
-                        '✅ File uploaded successfully!\n\nSwitch to "Analyze Report" to view the data.'
-                    )
-                    self.load_datasets()
-                    self.current_dataset = data
-                    self.display_dataset(data)
-                    self.switch_page(1)
-                else:
-                    error_msg = response.json().get('error', 'Unknown error')
-                    raise Exception(error_msg)
-                    
-        except requests.exceptions.Timeout:
+                # 200 means the server already holds this exact file
+                message = ('✅ File uploaded successfully!' if response.status_code == 201
+                           else 'ℹ️ This file was already uploaded, showing the existing dataset.')
+                skipped = data.get('validation', {}).get('rows_dropped')
+                if skipped:
+                    message += f'\n\n⚠️ {skipped} invalid rows were skipped.'
+                QMessageBox.information(
+                    self, 
+                    'Success', 
+                    f'{message}\n\nSwitch to "Analyze Report" to view the data.'
+                )
+                self.cache_dataset(data['id'], data)
+                self.load_datasets()
+                self.current_dataset = data
+                self.display_dataset(data)
+                self.switch_page(1)
+            else:
+                error_msg = response.json().get('error', 'Unknown error')
+                raise Exception(error_msg)
+            
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
             self.upload_btn.setEnabled(True)
             self.upload_btn.setText('📤 Choose CSV File')
-            QMessageBox.critical(self, 'Upload Failed', '❌ Request timed out. Please try again.')
+            QMessageBox.critical(
+                self,
+                'Upload Failed',
+                '❌ Connection lost during upload.\n\nChoose the same file again to resume where it stopped.'
+            )
         except Exception as e:
             self.upload_btn.setEnabled(True)
             self.upload_btn.setText('📤 Choose CSV File')
             QMessageBox.critical(self, 'Upload Failed', f'❌ Error: {str(e)}')
     
+    def on_upload_progress(self, sent, total):
+        """Show chunked upload progress on the upload button"""
+        percent = int(sent * 100 / total) if total else 100
+        self.upload_btn.setText(f'⏳ Uploading... {percent}%')
+        QApplication.processEvents()
+    
     def on_dataset_selected(self, index):
         """Handle dataset selection"""
         if index < 0:
@@ -954,6 +1733,13 @@ class MainWindow(QMainWindow):
             self.current_dataset = None
             return
         
+        dataset = self.cached_dataset(dataset_id) or self.prefetcher.wait(dataset_id)
+        if dataset is not None:
+            self.current_dataset = dataset
+            self.display_dataset(dataset)
+            self.switch_page(1)
+            return
+        
         try:
             response = requests.get(
                 f'{API_BASE_URL}/datasets/{dataset_id}/', 
@@ -973,6 +1759,7 @@ class MainWindow(QMainWindow):
                 
             response.raise_for_status()
             self.current_dataset = response.json()
+            self.cache_dataset(dataset_id, self.current_dataset)
             self.display_dataset(self.current_dataset)
             self.switch_page(1)
             
@@ -993,6 +1780,8 @@ class MainWindow(QMainWindow):
             return
             
         summary = dataset['summary']
+        self.ensure_page(1)
+        self.ensure_page(2)
         
         for i in reversed(range(self.stats_layout.count())): 
             widget = self.stats_layout.itemAt(i).widget()
@@ -1022,7 +1811,14 @@ class MainWindow(QMainWindow):
             counts = list(summary['equipment_types'].values())
             self.type_chart.plot_pie_chart(types, counts, 'Equipment Type Distribution')
         
+        import numpy as np
         records = dataset.get('records', [])
+        self.record_values = {
+            field: np.array([record.get(field, np.nan) for record in records], dtype=float)
+            for field in ('flowrate', 'pressure', 'temperature')
+        }
+        self.plot_records()
+        
         self.table.setRowCount(len(records))
         
         for i, record in enumerate(records):
@@ -1032,6 +1828,75 @@ class MainWindow(QMainWindow):
             self.table.setItem(i, 3, QTableWidgetItem(str(record.get('pressure', ''))))
             self.table.setItem(i, 4, QTableWidgetItem(str(record.get('temperature', ''))))
     
+    def plot_records(self):
+        """Plot the selected per-record series of the current dataset"""
+        if not self.record_values:
+            return
+        
+        kind = self.record_kind_combo.currentData()
+        field = self.record_param_combo.currentData()
+        label = self.record_param_combo.currentText()
+        values = self.record_values[field]
+        
+        if kind == 'histogram':
+            self.record_chart.plot_histogram(values, f'{label} Distribution', label)
+        elif kind == 'line':
+            self.record_chart.plot_line_chart(values, f'{label} by Record', label)
+        else:
+            self.record_chart.plot_scatter_chart(
+                self.record_values['flowrate'], values, f'{label} vs. Flowrate', 'Flowrate', label
+            )
+    
+    def compare_datasets(self):
+        """Compare the current dataset against the other listed datasets"""
+        if not self.current_dataset:
+            QMessageBox.warning(self, 'Warning', '⚠️ Please select a dataset first.')
+            return
+        
+        current_id = self.current_dataset.get('id')
+        ids = [current_id] + [ds['id'] for ds in self.datasets if ds['id'] != current_id]
+        
+        if len(ids) < 2:
+            QMessageBox.information(self, 'Compare', 'ℹ️ Upload another dataset to compare against.')
+            return
+        
+        try:
+            response = requests.get(
+                f'{API_BASE_URL}/datasets/compare/',
+                params={'ids': ','.join(str(i) for i in ids)},
+                headers=self.get_headers(),
+                timeout=10
+            )
+            
+            if response.status_code != 200:
+                error_msg = response.json().get('error', f'Status {response.status_code}')
+                raise Exception(error_msg)
+            
+            self.comparison = response.json()
+            self.plot_comparison()
+            
+        except requests.exceptions.Timeout:
+            QMessageBox.critical(self, 'Error', '❌ Request timed out.')
+        except Exception as e:
+            QMessageBox.warning(self, 'Error', f'❌ Failed to compare datasets: {str(e)}')
+    
+    def plot_comparison(self):
+        """Plot the loaded comparison for the selected parameter"""
+        if not self.comparison:
+            return
+        
+        field = self.compare_param_combo.currentData()
+        by_type = self.comparison['by_type']
+        series = [
+            (f"{ds['filename']} (#{ds['id']})", values[field])
+            for ds, values in zip(self.comparison['datasets'], by_type['series'])
+        ]
+        self.compare_chart.plot_grouped_bar_chart(
+            by_type['labels'],
+            series,
+            f'Average {self.compare_param_combo.currentText()} by Equipment Type'
+        )
+    
     def download_pdf(self):
         """Download PDF report"""
         if not self.current_dataset:
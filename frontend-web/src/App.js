@@ -25,6 +25,8 @@ ChartJS.register(
 );
 
 const API_BASE_URL = process.env.REACT_APP_API_URL || 'https://chemical-equipment-visualizer-production-999d.up.railway.app/api';
+const EVENTS_RECONNECT_DELAY = 5000; // ms before reopening a closed event stream
+const EVENTS_MAX_RECONNECT_DELAY = 60000; // ms; the delay doubles with every failed attempt
 
 function App() {
   const [datasets, setDatasets] = useState([]);
@@ -32,6 +34,9 @@ function App() {
   const [selectedDatasetId, setSelectedDatasetId] = useState('');
   const [currentPage, setCurrentPage] = useState(0);
   const [uploading, setUploading] = useState(false);
+  const [uploadStage, setUploadStage] = useState('');
+  const [comparison, setComparison] = useState(null);
+  const [compareField, setCompareField] = useState('flowrate');
   
   // Authentication States
   const [token, setToken] = useState(localStorage.getItem('token'));
@@ -107,6 +112,13 @@ function App() {
   };
 
   const handleLogout = () => {
+    if (token) {
+      // Revoke the token on the server; the local logout does not wait for it
+      fetch(`${API_BASE_URL}/logout/`, {
+        method: 'POST',
+        headers: { 'Authorization': `Token ${token}` }
+      }).catch(() => {});
+    }
     localStorage.removeItem('token');
     setToken(null);
     setCurrentDataset(null);
@@ -122,6 +134,100 @@ function App() {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [token]);
 
+  // Live dataset and upload events. The stream is opened with a short-lived
+  // ticket instead of the token, which would end up in access logs.
+  // EventSource reconnects by itself and resumes from the last event id; once
+  // it gives up (expired ticket, busy server) a new ticket is fetched after a
+  // delay that doubles until a stream opens again.
+  useEffect(() => {
+    if (!token || typeof EventSource === 'undefined') {
+      return undefined;
+    }
+    let source = null;
+    let retryTimer = null;
+    let stopped = false;
+    let lastEventId = '';
+    let failures = 0;
+
+    const reconnect = () => {
+      if (!stopped) {
+        const delay = Math.min(EVENTS_RECONNECT_DELAY * 2 ** failures, EVENTS_MAX_RECONNECT_DELAY);
+        failures += 1;
+        retryTimer = setTimeout(connect, delay * (1 + Math.random() / 2));
+      }
+    };
+
+    const listen = (kind, handler) => {
+      source.addEventListener(kind, (event) => {
+        lastEventId = event.lastEventId || lastEventId;
+        handler(JSON.parse(event.data));
+      });
+    };
+
+    const connect = async () => {
+      let ticket;
+      try {
+        const response = await fetch(`${API_BASE_URL}/events/ticket/`, {
+          method: 'POST',
+          headers: { 'Authorization': `Token ${token}` }
+        });
+        if (!response.ok) {
+          throw new Error(`Event ticket request failed with ${response.status}`);
+        }
+        ({ ticket } = await response.json());
+      } catch (error) {
+        console.error('Error opening event stream:', error);
+        reconnect();
+        return;
+      }
+      if (stopped) {
+        return;
+      }
+
+      const params = new URLSearchParams({ ticket });
+      if (lastEventId) {
+        params.set('lastEventId', lastEventId);
+      } else if (source) {
+        // Events of the gap between two streams are not replayed
+        loadDatasets();
+      }
+      source = new EventSource(`${API_BASE_URL}/events/?${params}`);
+      source.onopen = () => {
+        failures = 0;
+      };
+      source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED) {
+          reconnect();
+        }
+      };
+
+      listen('dataset.created', (dataset) => {
+        setDatasets((previous) => [dataset, ...previous.filter((d) => d.id !== dataset.id)]);
+      });
+      listen('dataset.updated', (dataset) => {
+        setDatasets((previous) => previous.map((d) => (d.id === dataset.id ? dataset : d)));
+      });
+      listen('dataset.deleted', ({ id }) => {
+        setDatasets((previous) => previous.filter((d) => d.id !== id));
+        setCurrentDataset((current) => (current && current.id === id ? null : current));
+      });
+      listen('job.progress', ({ stage }) => {
+        setUploadStage(stage === 'done' || stage === 'failed' ? '' : stage);
+      });
+      listen('resync', () => loadDatasets());
+    };
+
+    connect();
+    return () => {
+      stopped = true;
+      clearTimeout(retryTimer);
+      if (source) {
+        source.close();
+      }
+    };
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [token]);
+
   const loadDatasets = async () => {
     try {
       const response = await fetch(`${API_BASE_URL}/datasets/`, {
@@ -145,7 +251,7 @@ function App() {
 
   const handleFileUpload = async (event) => {
     const file = event.target.files[0];
-    if (!file || !file.name.endsWith('.csv')) {
+    if (!file || !/\.csv(\.gz|\.zst)?$/i.test(file.name)) {
       alert('Please select a valid CSV file');
       return;
     }
@@ -153,11 +259,24 @@ function App() {
     try {
       const formData = new FormData();
       formData.append('file', file);
+      const headers = { 'Authorization': `Token ${token}` };
+      let body = formData;
+      // Plain CSVs are sent as a gzipped request body when supported. The
+      // server decompresses it before parsing the form, so the file keeps
+      // its name and content hash, exactly as if it was sent uncompressed
+      if (file.name.toLowerCase().endsWith('.csv') && typeof CompressionStream !== 'undefined') {
+        const multipart = new Response(formData);
+        headers['Content-Type'] = multipart.headers.get('Content-Type');
+        headers['Content-Encoding'] = 'gzip';
+        body = await new Response(
+          multipart.body.pipeThrough(new CompressionStream('gzip'))
+        ).blob();
+      }
 
       const response = await fetch(`${API_BASE_URL}/datasets/upload/`, {
         method: 'POST',
-        headers: { 'Authorization': `Token ${token}` },
-        body: formData,
+        headers,
+        body,
       });
 
       if (response.status === 401) {
@@ -168,7 +287,10 @@ function App() {
 
       if (response.ok) {
         const data = await response.json();
-        alert('✅ File uploaded successfully!');
+        const skipped = data.validation?.rows_dropped;
+        alert(skipped
+          ? `✅ File uploaded successfully!\n\n⚠️ ${skipped} invalid rows were skipped.`
+          : '✅ File uploaded successfully!');
         await loadDatasets();
         setCurrentDataset(data);
         setCurrentPage(1);
@@ -180,6 +302,7 @@ function App() {
       alert(`❌ Upload failed: ${error.message}`);
     } finally {
       setUploading(false);
+      setUploadStage('');
       event.target.value = '';
     }
   };
@@ -241,6 +364,35 @@ function App() {
     }
   };
 
+  const handleCompare = async () => {
+    if (!currentDataset) return;
+    const ids = [currentDataset.id, ...datasets.map(ds => ds.id).filter(id => id !== currentDataset.id)];
+    if (ids.length < 2) {
+      alert('Upload another dataset to compare against.');
+      return;
+    }
+    try {
+      const response = await fetch(`${API_BASE_URL}/datasets/compare/?ids=${ids.join(',')}`, {
+        headers: { 'Authorization': `Token ${token}` }
+      });
+
+      if (response.status === 401) {
+        handleLogout();
+        alert("Session expired. Please login again.");
+        return;
+      }
+
+      const data = await response.json();
+      if (response.ok) {
+        setComparison(data);
+      } else {
+        alert(`❌ Compare failed: ${data.error || response.status}`);
+      }
+    } catch (error) {
+      alert(`❌ Compare failed: ${error.message}`);
+    }
+  };
+
   // --- CHART LOGIC ---
 
   const getBarChartData = () => {
@@ -272,6 +424,19 @@ function App() {
     };
   };
 
+  const getCompareChartData = () => {
+    if (!comparison) return null;
+    const colors = ['#36A2EB', '#FF6384', '#FFCE56', '#4BC0C0', '#9966FF', '#FF9F40'];
+    return {
+      labels: comparison.by_type.labels,
+      datasets: comparison.datasets.map((ds, i) => ({
+        label: `${ds.filename} (#${ds.id})`,
+        data: comparison.by_type.series[i][compareField],
+        backgroundColor: colors[i % colors.length],
+      })),
+    };
+  };
+
   const baseChartOptions = {
     responsive: true,
     maintainAspectRatio: true,
@@ -317,6 +482,15 @@ function App() {
     }
   };
 
+  const compareOptions = {
+    ...baseChartOptions,
+    plugins: {
+      ...baseChartOptions.plugins,
+      title: { ...baseChartOptions.plugins.title, text: `Average ${compareField} by Equipment Type` },
+      datalabels: { display: false }
+    }
+  };
+
   // Login/Signup View logic
   if (!token) {
     return (
@@ -406,12 +580,12 @@ function App() {
             <div className="card">
               <h2 className="card-title">📁 Upload New Dataset</h2>
               <button className="upload-button" onClick={() => document.getElementById('file-input').click()}>
-                {uploading ? '⏳ Uploading...' : '📤 Choose CSV File'}
+                {uploading ? `⏳ ${uploadStage ? `${uploadStage[0].toUpperCase()}${uploadStage.slice(1)}` : 'Uploading'}...` : '📤 Choose CSV File'}
               </button>
               <input 
                 id="file-input"
                 type="file" 
-                accept=".csv" 
+                accept=".csv,.gz,.zst" 
                 onChange={handleFileUpload} 
                 disabled={uploading} 
                 style={{ display: 'none' }} 
@@ -463,6 +637,20 @@ function App() {
                     </div>
                   </div>
                 </div>
+                <div className="card">
+                  <div className="page-header">
+                    <h2 className="card-title">🔀 Dataset Comparison</h2>
+                    <div>
+                      <select className="dataset-select compare-select" value={compareField} onChange={(e) => setCompareField(e.target.value)}>
+                        <option value="flowrate">Flowrate</option>
+                        <option value="pressure">Pressure</option>
+                        <option value="temperature">Temperature</option>
+                      </select>
+                      <button className="download-button" onClick={handleCompare}>Compare with Previous Datasets</button>
+                    </div>
+                  </div>
+                  {getCompareChartData() && <Bar data={getCompareChartData()} options={compareOptions} />}
+                </div>
               </>
             ) : (
               <div className="card"><p className="empty-state">📊 No dataset selected.</p></div>